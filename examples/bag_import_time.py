@@ -0,0 +1,48 @@
+import logging
+import statistics
+import subprocess
+import sys
+
+from hyo2.abc2.lib.logging import set_logging
+
+logger = logging.getLogger(__name__)
+set_logging(ns_list=['hyo2.bag'])
+
+modules = [
+    "hyo2.bag.bag",
+    "hyo2.bag.tools.bag_bbox",
+    "hyo2.bag.tools.bag_elevation",
+    "hyo2.bag.tools.bag_metadata",
+    "hyo2.bag.tools.bag_tracklist",
+    "hyo2.bag.tools.bag_uncertainty",
+    "hyo2.bag.tools.bag_validate",
+]
+nr_of_runs = 5
+nr_of_heaviest = 10
+
+
+def import_times(module: str) -> dict[str, int]:
+    """ Import the module in a fresh interpreter, and return the cumulative import time (in us) of each module """
+    ret = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s" % module],
+                         capture_output=True, text=True, check=True)
+    times = dict()
+    for line in ret.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+for module in modules:
+    runs = [import_times(module) for _ in range(nr_of_runs)]
+    logger.debug("%s: %.1f ms (median of %d runs)"
+                 % (module, statistics.median(r[module] for r in runs) / 1000.0, nr_of_runs))
+
+    heaviest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[:nr_of_heaviest]
+    for name, cumulative in heaviest:
+        logger.debug("  %8.1f ms  %s" % (cumulative / 1000.0, name))
+
+    lazy = [name for name in ("osgeo", "lxml.isoschematron", "dateutil") if name in runs[-1]]
+    if len(lazy) > 0:
+        logger.warning("  eagerly imported: %s" % ", ".join(lazy))
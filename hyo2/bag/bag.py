@@ -1,11 +1,15 @@
+import copy
 import logging
 import os
+from typing import TYPE_CHECKING, Any, Callable, Iterator
 
-from lxml import etree, isoschematron
-from numpy import uint32, float32, nan, nanmin, nanmax, isnan, argwhere, isfinite, dtype
+import h5py
+from lxml import etree
+from numpy import uint32, float32, float64, nan, ceil, floor, isnan, isfinite, dtype, flatnonzero, \
+    asarray, array, ascontiguousarray, empty, column_stack, concatenate, frombuffer, fmin, fmax, int64, arange, \
+    bincount, clip, cumsum, searchsorted
 # noinspection PyUnresolvedReferences
 from numpy.typing import NDArray
-from osgeo import osr
 
 # noinspection PyUnresolvedReferences
 from hyo2.bag.bag_error import BAGError
@@ -14,9 +18,33 @@ from hyo2.bag.bag_paths import BAGPaths
 # noinspection PyUnresolvedReferences
 from hyo2.bag.base import File
 # noinspection PyUnresolvedReferences
+from hyo2.bag.cache import ResultCache
+# noinspection PyUnresolvedReferences
+from hyo2.bag.chunk_cache import ChunkCache
+# noinspection PyUnresolvedReferences
+from hyo2.bag.chunk_reader import ChunkReader
+# noinspection PyUnresolvedReferences
 from hyo2.bag.helper import Helper
 # noinspection PyUnresolvedReferences
+from hyo2.bag.inventory import BAGProbe, LayerInfo
+# noinspection PyUnresolvedReferences
 from hyo2.bag.meta import Meta
+# noinspection PyUnresolvedReferences
+from hyo2.bag.qc import QCCheck, FlagCheck, StatisticsCheck, MinMaxCheck, ElevationMinMax, UncertaintyMinMax, \
+    UncertaintyGreaterThan, UncertaintyHasDepth, DepthHasUncertainty
+# noinspection PyUnresolvedReferences
+from hyo2.bag.refinement_index import RefinementIndex
+# noinspection PyUnresolvedReferences
+from hyo2.bag.stats import Statistics
+# noinspection PyUnresolvedReferences
+from hyo2.bag.validators import ValidatorRegistry
+# noinspection PyUnresolvedReferences
+from hyo2.bag.vr_grid import VRGrid
+# noinspection PyUnresolvedReferences
+from hyo2.bag.vr_summary import VRSummary
+
+if TYPE_CHECKING:
+    from osgeo import osr
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +60,15 @@ class BAGFile(File):
 
     default_metadata_file = "BAG_metadata.xml"
 
+    grid_layers = ("elevation", "uncertainty", "density")
+    tile_memory = 256 * 1024 * 1024
+
+    vr_refinement_fields = ("depth", "depth_uncrt")
+    vr_block_size = 1024 * 1024
+    vr_candidate_fraction = 0.1
+
+    transform_chunk_size = 1000000
+
     official_versions = (
         b'1.0.0',
         b'1.0.1',
@@ -53,18 +90,50 @@ class BAGFile(File):
         b'2.0.5',
     )
 
-    def __init__(self, name: str, mode: str = 'r', driver: str | None = None, userblock_size=None, swmr=False, **kwds):
+    def __init__(self, name: str, mode: str = 'r', driver: str | None = None, userblock_size=None, swmr=False,
+                 cache: ResultCache | None = None, chunk_cache_access: str = "rows", **kwds):
+
+        if chunk_cache_access not in ChunkCache.access_patterns:
+            raise BAGError("Unknown chunk cache access pattern: %s" % chunk_cache_access)
+
+        # the files to be created are not checked, while the existing files are checked on the single open
+        check_bag = 'w' not in mode
+        if check_bag and not BAGFile.is_bag(bag_path=name, advanced=mode not in ('r', 'r+')):
+            raise BAGError("The passed file %s is not a BAG file" % name)
 
-        if 'w' not in mode and not BAGFile.is_bag(bag_path=name, advanced=True):
-            raise BAGError("The passed file %s is not a BAG file")
+        try:
+            super().__init__(name=name, mode=mode, driver=driver, userblock_size=userblock_size, swmr=swmr,
+                             **kwds)
+        except OSError as e:
+            if not check_bag:
+                raise
+            raise BAGError("The passed file %s is not a BAG file: %s" % (name, e))
 
-        super().__init__(name=name, mode=mode, driver=driver, userblock_size=userblock_size, swmr=swmr,
-                         **kwds)
+        if check_bag and (self.paths.bag_root not in self):
+            super().close()
+            raise BAGError("The passed file %s is not a BAG file: missing %s" % (name, self.paths.bag_root))
 
         self.bag_path = name
         self._meta: Meta | None = None
+        self._meta_tree: etree.ElementBase | None = None
         self.meta_errors: list[str] = list()
+        self.meta_xsd_errors: list[str] = list()
+        self.meta_schematron_errors: list[str] = list()
         self._str: str | None = None
+        self._vr_index: RefinementIndex | None = None
+        self._vr_metadata_fields: dict[str, NDArray] | None = None
+        self._vr_summary: VRSummary | None = None
+        self.cache = cache
+        self._cache_identity: str | None = None
+        # the chunk caches are sized per layer, unless the HDF5 settings are explicitly passed
+        self.chunk_cache_access = chunk_cache_access
+        self._explicit_chunk_cache = any(key in kwds for key in ("rdcc_nbytes", "rdcc_nslots", "rdcc_w0"))
+        self._datasets: dict[str, h5py.Dataset] = dict()
+        self._chunk_caches: dict[str, ChunkCache] = dict()
+
+    def close(self) -> None:
+        self._datasets.clear()
+        super().close()
 
     @property
     def meta(self) -> Meta:
@@ -86,7 +155,46 @@ class BAGFile(File):
 
     @classmethod
     def is_vr(cls, bag_path: str) -> bool:
-        return BAGFile(bag_path).has_varres_refinements()
+        with BAGFile(bag_path) as bf:
+            return bf.has_varres_refinements()
+
+    @classmethod
+    def probe(cls, bag_path: str) -> BAGProbe:
+        """ Return BAG-ness, version, SR/VR, and available layers of a file, from a single open """
+        try:
+            with BAGFile(bag_path) as bf:
+                version = bf.bag_version() if bf.has_bag_version() else None
+                if isinstance(version, bytes):
+                    version = version.decode(errors="replace")
+                return BAGProbe(path=bag_path, is_bag=True, version=version, is_vr=bf.has_varres_refinements(),
+                                layers=bf.layers())
+        except BAGError as e:
+            return BAGProbe(path=bag_path, is_bag=False, error=str(e))
+
+    def layers(self) -> tuple[str, ...]:
+        """ Return the names of the available layers """
+        available = {
+            "elevation": self.has_elevation(),
+            "uncertainty": self.has_uncertainty(),
+            "density": self.has_density(),
+            "tracking_list": self.has_tracking_list(),
+            "metadata": self.has_metadata(),
+            "varres_metadata": self.has_varres_metadata(),
+            "varres_refinements": self.has_varres_refinements(),
+            "varres_tracking_list": self.has_varres_tracking_list(),
+        }
+        return tuple(name for name, present in available.items() if present)
+
+    def inventory(self) -> dict[str, LayerInfo]:
+        """ Return the description of each dataset (by HDF5 path), without reading the grids """
+        datasets = dict()
+
+        def add_dataset(name: str, obj: h5py.HLObject) -> None:
+            if isinstance(obj, h5py.Dataset):
+                datasets[name] = LayerInfo.from_dataset(obj)
+
+        self.visititems(add_dataset)
+        return datasets
 
     @classmethod
     def create_template(cls, name: str) -> File:
@@ -148,7 +256,8 @@ class BAGFile(File):
     def elevation_shape(self) -> tuple[int, int]:
         return self[self.paths.bag_elevation].shape
 
-    def elevation(self, mask_nan: bool = True, row_range: slice | None = None) -> NDArray:
+    def elevation(self, mask_nan: bool = True, row_range: slice | None = None,
+                  col_range: slice | None = None, out: NDArray | None = None, workers: int = 1) -> NDArray:
         """
         Return the elevation as numpy array
 
@@ -156,64 +265,18 @@ class BAGFile(File):
             If True, apply a mask using the BAG nan value
         row_range
             If present, a slice of rows to read from
+        col_range
+            If present, a slice of columns to read from
+        out
+            If present, a float32 buffer to read into (the window fills its top-left corner, returned as a view)
+        workers
+            If greater than 1, the chunks of a compressed layer are read and decoded by this number of threads
         """
-        if row_range:
-            if not isinstance(row_range, slice):
-                raise BAGError("Invalid type of slice selector: %s" % type(row_range))
-            if (row_range.start < 0) or (row_range.start >= self.elevation_shape()[0]) \
-                    or (row_range.stop < 0) or (row_range.stop > self.elevation_shape()[0]) \
-                    or (row_range.start > row_range.stop):
-                raise BAGError("Invalid values for slice selector: %s" % row_range)
-
-        if mask_nan:
-            if row_range:
-                el = self[self.paths.bag_elevation][row_range]
-            else:
-                el = self[self.paths.bag_elevation][:]
-            mask = el == BAGFile.BAG_NAN
-            el[mask] = nan
-            return el
-
-        if row_range:
-            return self[self.paths.bag_elevation][row_range]
-        else:
-            return self[self.paths.bag_elevation][:]
+        sel = self._window_selection(shape=self.elevation_shape(), row_range=row_range, col_range=col_range)
+        return self._read_grid(ds_path=self.paths.bag_elevation, sel=sel, mask_nan=mask_nan, out=out, workers=workers)
 
     def elevation_min_max(self) -> tuple[float, float]:
-        rows, cols = self.elevation_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
-
-        mem_row = cols * 4 / 1024 / 1024
-        # mem = mem_row * rows
-        # logger.debug('estimated memory: %.1f MB' % mem)
-        chunk_size = 8096
-        chunk_rows = max(1, int(chunk_size // mem_row))
-        # logger.debug('nr of rows per chunk: %s' % chunk_rows)
-
-        elv_min = nan
-        elv_max = nan
-        for start in range(0, rows, chunk_rows):
-            stop = start + chunk_rows
-            if stop > rows:
-                stop = rows
-            # logger.debug('slice: %s-%s' % (start, stop))
-            chunk = self.elevation(row_range=slice(start, stop))
-            _min = nanmin(chunk)
-            # print("raw min:", nanmin(chunk))
-            # print("raw max:", nanmax(chunk))
-            if isnan(elv_min):
-                elv_min = _min
-            else:
-                if _min < elv_min:
-                    elv_min = _min
-            _max = nanmax(chunk)
-            if isnan(elv_max):
-                elv_max = _max
-            else:
-                if _max > elv_max:
-                    elv_max = _max
-
-        return elv_min, elv_max
+        return self._cached_result("elevation_min_max", lambda: self.run_qc([ElevationMinMax()])[0])
 
     def depth_min_max(self) -> tuple[float, float]:
         elv_min, elv_max = self.elevation_min_max()
@@ -235,12 +298,21 @@ class BAGFile(File):
         return self[self.paths.bag_varres_refinements].shape
 
     def vr_elevation_min_max(self) -> tuple[float, float]:
-
-        vr_el = self[self.paths.bag_varres_refinements][0]['depth']
-        mask = vr_el == BAGFile.BAG_NAN
-        vr_el[mask] = nan
-
-        return nanmin(vr_el), nanmax(vr_el)
+        return self._cached_result("vr_elevation_min_max", self._vr_elevation_min_max)
+
+    def _vr_elevation_min_max(self) -> tuple[float, float]:
+        return self._vr_min_max(field="depth")
+
+    def _vr_min_max(self, field: str) -> tuple[float, float]:
+        """ Return the min/max of a refinement field, streaming over the refinements by blocks """
+        vr_min, vr_max = float32(nan), float32(nan)
+        for _, values in self.iter_vr_refinements(field=field):
+            if values.size == 0:
+                continue
+            # fmin/fmax ignore the NaN values (returning NaN only if all the values are NaN)
+            vr_min = fmin(vr_min, fmin.reduce(values))
+            vr_max = fmax(vr_max, fmax.reduce(values))
+        return vr_min, vr_max
 
     def vr_depth_min_max(self) -> tuple[float, float]:
         elv_min, elv_max = self.vr_elevation_min_max()
@@ -255,65 +327,105 @@ class BAGFile(File):
             return True
         return False
 
-    def uncertainty(self, mask_nan: bool = True, row_range: slice | None = None) -> NDArray:
-        if row_range:
-            if not isinstance(row_range, slice):
-                raise BAGError("Invalid type of slice selector: %s" % type(row_range))
-            if (row_range.start < 0) or (row_range.start >= self.uncertainty_shape()[0]) \
-                    or (row_range.stop < 0) or (row_range.stop > self.uncertainty_shape()[0]) \
-                    or (row_range.start > row_range.stop):
-                raise BAGError("Invalid values for slice selector: %s" % row_range)
-
-        if mask_nan:
-            if row_range:
-                un = self[self.paths.bag_uncertainty][row_range]
-            else:
-                un = self[self.paths.bag_uncertainty][:]
-            mask = un == BAGFile.BAG_NAN
-            un[mask] = nan
-            return un
+    def uncertainty(self, mask_nan: bool = True, row_range: slice | None = None,
+                    col_range: slice | None = None, out: NDArray | None = None, workers: int = 1) -> NDArray:
+        """
+        Return the uncertainty as numpy array
 
-        if row_range:
-            return self[self.paths.bag_uncertainty][row_range]
-        else:
-            return self[self.paths.bag_uncertainty][:]
+        mask_nan
+            If True, apply a mask using the BAG nan value
+        row_range
+            If present, a slice of rows to read from
+        col_range
+            If present, a slice of columns to read from
+        out
+            If present, a float32 buffer to read into (the window fills its top-left corner, returned as a view)
+        workers
+            If greater than 1, the chunks of a compressed layer are read and decoded by this number of threads
+        """
+        sel = self._window_selection(shape=self.uncertainty_shape(), row_range=row_range, col_range=col_range)
+        return self._read_grid(ds_path=self.paths.bag_uncertainty, sel=sel, mask_nan=mask_nan, out=out, workers=workers)
 
     def uncertainty_shape(self) -> tuple[int, int]:
         return self[self.paths.bag_uncertainty].shape
 
-    def uncertainty_min_max(self) -> tuple[float, float]:
-        rows, cols = self.uncertainty_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
-
-        mem_row = cols * 4 / 1024 / 1024
-        # mem = mem_row * rows
-        # logger.debug('estimated memory: %.1f MB' % mem)
-        chunk_size = 8096
-        chunk_rows = max(1, int(chunk_size // mem_row))
-        # logger.debug('nr of rows per chunk: %s' % chunk_rows)
-
-        unc_min = nan
-        unc_max = nan
-        for start in range(0, rows, chunk_rows):
-            stop = start + chunk_rows
-            if stop > rows:
-                stop = rows
-            chunk = self.uncertainty(row_range=slice(start, stop))
-            # logger.debug('slice: %s-%s' % (start, stop))
-            _min = nanmin(chunk)
-            if isnan(unc_min):
-                unc_min = _min
-            else:
-                if _min < unc_min:
-                    unc_min = _min
-            _max = nanmax(chunk)
-            if isnan(unc_max):
-                unc_max = _max
-            else:
-                if _max > unc_max:
-                    unc_max = _max
+    def _read_grid(self, ds_path: str, sel: tuple[slice, slice], mask_nan: bool = True,
+                   out: NDArray | None = None, workers: int = 1) -> NDArray:
+        """ Read a window of a float SR layer, optionally into the passed buffer and masking the BAG nan in place """
+        ds = self._dataset(ds_path)
+        reader = ChunkReader(ds, workers=workers) if workers > 1 else None
+        if (reader is not None) and (not reader.supported):
+            reader = None
+        if reader is None:
+            self._record_read(ds_path, sel)
+
+        if out is None:
+            values = ds[sel] if reader is None else reader.read(sel)
+        else:
+            shape = tuple(len(range(*rng.indices(size))) for rng, size in zip(sel, ds.shape))
+            if (out.dtype != ds.dtype) or (out.ndim != 2) or (not out.flags.c_contiguous) \
+                    or (out.shape[0] < shape[0]) or (out.shape[1] < shape[1]):
+                raise BAGError("Invalid output buffer (%s, %s) for a %s window of %s"
+                               % (out.dtype, out.shape, shape, ds.dtype))
+            dest_sel = (slice(0, shape[0]), slice(0, shape[1]))
+            if reader is not None:
+                reader.read(sel, out=out[dest_sel])
+            elif (shape[0] > 0) and (shape[1] > 0):
+                ds.read_direct(out, source_sel=sel, dest_sel=dest_sel)
+            values = out[dest_sel]
+
+        if mask_nan:
+            values[values == BAGFile.BAG_NAN] = nan
+        return values
 
-        return unc_min, unc_max
+    @classmethod
+    def _window_selection(cls, shape: tuple[int, ...], row_range: slice | None = None,
+                          col_range: slice | None = None) -> tuple[slice, slice]:
+        """ Validate the passed row and column ranges, and return the selection for a 2D layer """
+        sel = list()
+        for rng, size in zip((row_range, col_range), shape):
+            if rng is None:
+                sel.append(slice(0, size))
+                continue
+            if not isinstance(rng, slice):
+                raise BAGError("Invalid type of slice selector: %s" % type(rng))
+            if (rng.start < 0) or (rng.start >= size) or (rng.stop < 0) or (rng.stop > size) \
+                    or (rng.start > rng.stop):
+                raise BAGError("Invalid values for slice selector: %s" % rng)
+            sel.append(rng)
+        return sel[0], sel[1]
+
+    def window_from_bbox(self, x_min: float, y_min: float, x_max: float, y_max: float,
+                         geographic: bool = False) -> tuple[slice, slice]:
+        """ Return the row and column ranges of the grid nodes whose cells intersect the passed bbox
+
+        x_min, y_min, x_max, y_max
+            The bounding box, in the BAG horizontal CRS (or as WGS84 longitudes and latitudes)
+        geographic
+            If True, the bounding box is in WGS84 and its corners are transformed to the BAG CRS
+        """
+        self.populate_metadata()
+
+        if geographic:
+            es, ns = self.transform_from_wgs84(lons=array([x_min, x_min, x_max, x_max]),
+                                               lats=array([y_min, y_max, y_min, y_max]))
+            x_min, x_max = float(es.min()), float(es.max())
+            y_min, y_max = float(ns.min()), float(ns.max())
+
+        rows, cols = self.elevation_shape()
+        x_sw, y_sw = self.meta.sw[0], self.meta.sw[1]
+        col_start = max(0, int(ceil((x_min - x_sw) / self.meta.res_x - 0.5)))
+        col_stop = min(cols, int(floor((x_max - x_sw) / self.meta.res_x + 0.5)) + 1)
+        row_start = max(0, int(ceil((y_min - y_sw) / self.meta.res_y - 0.5)))
+        row_stop = min(rows, int(floor((y_max - y_sw) / self.meta.res_y + 0.5)) + 1)
+        if (col_start >= col_stop) or (row_start >= row_stop):
+            raise BAGError("The passed bbox does not intersect the grid: %s, %s, %s, %s"
+                           % (x_min, y_min, x_max, y_max))
+
+        return slice(row_start, row_stop), slice(col_start, col_stop)
+
+    def uncertainty_min_max(self) -> tuple[float, float]:
+        return self._cached_result("uncertainty_min_max", lambda: self.run_qc([UncertaintyMinMax()])[0])
 
     def has_attr_uncertainty_max_value(self) -> bool:
         return self.paths.bag_uncertainty_max_value_tag in self[self.paths.bag_uncertainty].attrs
@@ -327,119 +439,227 @@ class BAGFile(File):
     def attr_uncertainty_min_value(self) -> float:
         return self[self.paths.bag_uncertainty].attrs[self.paths.bag_uncertainty_min_value_tag]
 
-    def uncertainty_greater_than(self, th: float) -> list[list[int | float]]:
-        rows, cols = self.uncertainty_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
+    def uncertainty_greater_than(self, th: float, as_array: bool = False) -> list[list[float]] | NDArray:
+        return self._cached_flags("uncertainty_greater_than(%r)" % th,
+                                  lambda: self.run_qc([UncertaintyGreaterThan(th=th)], as_array=True)[0],
+                                  as_array=as_array)
 
-        self.populate_metadata()
+    def uncertainty_has_depth(self, as_array: bool = False) -> list[list[float]] | NDArray:
+        return self._cached_flags("uncertainty_has_depth",
+                                  lambda: self.run_qc([UncertaintyHasDepth()], as_array=True)[0],
+                                  as_array=as_array)
 
-        x_min = self.meta.sw[0]
-        y_min = self.meta.sw[1]
-        x_res = self.meta.res_x
-        y_res = self.meta.res_y
-        # logger.debug("info: %f %f %f %f" % (x_min, y_min, x_res, y_res))
+    def depth_has_uncertainty(self, as_array: bool = False) -> list[list[float]] | NDArray:
+        return self._cached_flags("depth_has_uncertainty",
+                                  lambda: self.run_qc([DepthHasUncertainty()], as_array=True)[0],
+                                  as_array=as_array)
 
-        in_srs = osr.SpatialReference()
-        in_srs.ImportFromWkt(self.meta.wkt_srs)
-        if in_srs.IsCompound():
-            in_srs.StripVertical()
-        out_srs = osr.SpatialReference()
-        out_srs.ImportFromEPSG(4326)
-        out_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        ctr = osr.CoordinateTransformation(in_srs, out_srs)
-
-        mem_row = cols * 32 / 1024 / 1024
-        # mem = mem_row * rows
-        # logger.debug('estimated memory: %.1f MB' % mem)
-        chunk_size = 8096
-        chunk_rows = int(chunk_size / mem_row) + 1
-        # logger.debug('nr of rows per chunk: %s' % chunk_rows)
-
-        xyz = list()
-        for start in range(0, rows, chunk_rows):
-            stop = start + chunk_rows
-            if stop > rows:
-                stop = rows
-
-            unc = self.uncertainty(row_range=slice(start, stop))
-            ijs = argwhere(unc > th)
-            for ij in ijs:
-                i = ij[0]
-                j = ij[1]
-                e = x_min + j * x_res
-                n = y_min + (start + i) * y_res
-                lat, lon, _ = ctr.TransformPoint(e, n)
-                u = float(unc[i, j])
-                xyz.append([float(lat), float(lon), u])
-                # logger.info("%d,%d: %.7f %.7f %.3f" % ((start + i), j, xyz[-1][0], xyz[-1][1], xyz[-1][2]))
-
-        return xyz
-
-    def uncertainty_has_depth(self) -> list[list[int | float]]:
-        rows, cols = self.uncertainty_shape()
-        # logger.debug('shape: %s, %s (%d)' % (rows, cols, rows * cols))
+    def tile_shape(self, layers: tuple[str, ...] = ("elevation", "uncertainty"),
+                   max_memory: int | None = None) -> tuple[int, int]:
+        """ Return the shape of the tiles aligned to the on-disk chunks of the passed layers
 
-        self.populate_metadata()
+        The tiles span whole multiples of the chunk shape (or full rows for contiguous layers), and
+        use the full grid width when a band of chunk rows fits in the memory budget.
+
+        layers
+            The names of the layers read together
+        max_memory
+            The memory budget (in bytes) for a tile of all the layers. If None, use the class default.
+        """
+        if len(layers) == 0:
+            raise BAGError("At least a layer is required")
+        if max_memory is None:
+            max_memory = self.tile_memory
+
+        datasets = [self._layer_dataset(layer) for layer in layers]
+        rows, cols = datasets[0].shape
+        chunk_rows, chunk_cols = 1, cols
+        for ds in datasets:
+            if ds.chunks is not None:
+                chunk_rows, chunk_cols = ds.chunks[0], ds.chunks[1]
+                break
+        # the density is returned as float32
+        node_size = sum(4 if layer == "density" else ds.dtype.itemsize for layer, ds in zip(layers, datasets))
+
+        tile_cols = max(1, cols)
+        if chunk_rows * tile_cols * node_size > max_memory:
+            tile_cols = max(chunk_cols, max_memory // (chunk_rows * node_size) // chunk_cols * chunk_cols)
+        tile_rows = max(chunk_rows, max_memory // (tile_cols * node_size) // chunk_rows * chunk_rows)
+        return min(tile_rows, max(1, rows)), min(tile_cols, max(1, cols))
+
+    def iter_tiles(self, layers: tuple[str, ...] = ("elevation", "uncertainty"), max_memory: int | None = None,
+                   mask_nan: bool = True, reuse_buffers: bool = False) \
+            -> Iterator[tuple[slice, slice, dict[str, NDArray]]]:
+        """ Iterate over the SR grids by tiles aligned to the on-disk chunks
+
+        Each iteration returns the row range, the column range, and a dict with the arrays of the
+        passed layers, keyed by layer name.
+
+        layers
+            The names of the layers to read: "elevation", "uncertainty", and/or "density"
+        max_memory
+            The memory budget (in bytes) for a tile of all the layers. If None, use the class default.
+        mask_nan
+            If True, apply a mask using the BAG nan value
+        reuse_buffers
+            If True, the elevation and uncertainty are read into buffers allocated once and overwritten
+            at each iteration (copy the arrays to keep them beyond the iteration)
+        """
+        for layer in layers:
+            if layer not in self.grid_layers:
+                raise BAGError("Unknown layer: %s" % layer)
+
+        rows, cols = self._layer_dataset(layers[0]).shape
+        tile_rows, tile_cols = self.tile_shape(layers=layers, max_memory=max_memory)
+        buffers = dict()
+        if reuse_buffers:
+            for layer in layers:
+                if layer != "density":
+                    buffers[layer] = empty((tile_rows, tile_cols), dtype=self._layer_dataset(layer).dtype)
+        for row_start in range(0, rows, tile_rows):
+            row_range = slice(row_start, min(row_start + tile_rows, rows))
+            for col_start in range(0, cols, tile_cols):
+                col_range = slice(col_start, min(col_start + tile_cols, cols))
+                tile = dict()
+                for layer in layers:
+                    if layer in buffers:
+                        tile[layer] = getattr(self, layer)(mask_nan=mask_nan, row_range=row_range,
+                                                           col_range=col_range, out=buffers[layer])
+                    else:
+                        tile[layer] = getattr(self, layer)(mask_nan=mask_nan, row_range=row_range,
+                                                           col_range=col_range)
+                yield row_range, col_range, tile
+
+    def _layer_dataset(self, layer: str) -> h5py.Dataset:
+        """ Return the HDF5 dataset of the passed SR layer """
+        if layer == "elevation":
+            return self._dataset(self.paths.bag_elevation)
+        if layer == "uncertainty":
+            return self._dataset(self.paths.bag_uncertainty)
+        if layer == "density":
+            return self._dataset(self.paths.bag_elevation_solution)
+        raise BAGError("Unknown layer: %s" % layer)
+
+    def _dataset(self, ds_path: str, access: str | None = None) -> h5py.Dataset:
+        """ Return the dataset used to read a layer, opened once with a chunk cache sized on its chunks
+
+        access
+            The chunk cache access pattern. If None, the one passed at opening.
+        """
+        if self.mode != 'r':
+            return self[ds_path]
+
+        ds = self._datasets.get(ds_path)
+        if ds is not None:
+            return ds
+
+        ds = self[ds_path]
+        if ds.chunks is not None:
+            # the file settings, including the explicitly passed ones
+            _, nslots, nbytes, w0 = self.id.get_access_plist().get_cache()
+            if self._explicit_chunk_cache:
+                chunk_cache = ChunkCache(shape=ds.shape, chunks=ds.chunks, itemsize=ds.dtype.itemsize,
+                                         nbytes=nbytes, nslots=nslots, w0=w0)
+            else:
+                chunk_cache = ChunkCache.for_dataset(ds, access=access or self.chunk_cache_access,
+                                                     min_nbytes=nbytes)
+                chunk_cache.nslots = max(chunk_cache.nslots, nslots)
+                chunk_cache.w0 = w0
+                # an open dataset keeps the cache settings of its first opening, so it is released before reopening
+                del ds
+                ds = h5py.Dataset(h5py.h5d.open(self.id, ds_path.encode(), dapl=chunk_cache.dapl()))
+            self._chunk_caches[ds_path] = chunk_cache
+            logger.debug("%s: %s" % (ds_path, chunk_cache))
+        self._datasets[ds_path] = ds
+        return ds
+
+    def _record_read(self, ds_path: str, sel: tuple[slice, ...]) -> None:
+        chunk_cache = self._chunk_caches.get(ds_path)
+        if chunk_cache is not None:
+            chunk_cache.record(sel)
+
+    def chunk_cache(self, ds_path: str) -> ChunkCache | None:
+        """ Return the chunk cache of the passed dataset (None if not chunked, or not read yet) """
+        return self._chunk_caches.get(ds_path)
+
+    def chunk_cache_stats(self) -> dict[str, dict]:
+        """ Return the settings and the (estimated) hit statistics of the chunk caches, by dataset path """
+        return {ds_path: chunk_cache.stats() for ds_path, chunk_cache in self._chunk_caches.items()}
+
+    def statistics(self, layer: str = "elevation", bins: int = 0, hist_range: tuple[float, float] | None = None,
+                   sample_size: int = 100000) -> Statistics:
+        """ Return the statistics of an SR layer, computed in a single streaming pass
+
+        layer
+            The name of the layer: "elevation", "uncertainty", or "density"
+        bins
+            The number of histogram bins (0 to skip the histogram)
+        hist_range
+            The (min, max) range of the histogram. If None and bins is not 0, a preliminary min/max pass is run.
+        sample_size
+            The maximum number of values retained to estimate the quantiles (0 to skip them)
+        """
+        return self._cached_result("statistics(%s, %d, %r, %d)" % (layer, bins, hist_range, sample_size),
+                                   lambda: self._statistics(layer=layer, bins=bins, hist_range=hist_range,
+                                                            sample_size=sample_size))
 
-        x_min = self.meta.sw[0]
-        y_min = self.meta.sw[1]
-        x_res = self.meta.res_x
-        y_res = self.meta.res_y
-        # logger.debug("info: %f %f %f %f" % (x_min, y_min, x_res, y_res))
+    def _statistics(self, layer: str, bins: int, hist_range: tuple[float, float] | None,
+                    sample_size: int) -> Statistics:
+        if (bins > 0) and (hist_range is None):
+            hist_range = self._histogram_range(self.run_qc([MinMaxCheck(layer=layer)])[0])
+        check = StatisticsCheck(layer=layer, bins=bins, hist_range=hist_range, sample_size=sample_size)
+        return self.run_qc([check])[0]
 
-        in_srs = osr.SpatialReference()
-        in_srs.ImportFromWkt(self.meta.wkt_srs)
-        if in_srs.IsCompound():
-            in_srs.StripVertical()
-        out_srs = osr.SpatialReference()
-        out_srs.ImportFromEPSG(4326)
-        out_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        ctr = osr.CoordinateTransformation(in_srs, out_srs)
-
-        mem_row = cols * 32 / 1024 / 1024
-        # mem = mem_row * rows
-        # logger.debug('estimated memory: %.1f MB' % mem)
-        chunk_size = 8096
-        chunk_rows = int(chunk_size / mem_row) + 1
-        # logger.debug('nr of rows per chunk: %s' % chunk_rows)
-
-        xyz = list()
-        for start in range(0, rows, chunk_rows):
-            stop = start + chunk_rows
-            if stop > rows:
-                stop = rows
-
-            unc = self.uncertainty(row_range=slice(start, stop))
-            # logger.info("unc: %d, %d" % (np.isnan(unc).sum(), np.isfinite(unc).sum()))
-            dep = self.elevation(row_range=slice(start, stop))
-            # logger.info("dep: %d, %d" % (np.isnan(dep).sum(), np.isfinite(dep).sum()))
-            unc[isfinite(dep)] = nan
-            # logger.info(unc)
-            ijs = argwhere(isfinite(unc))
-            # logger.info(ijs)
-            for ij in ijs:
-                i = ij[0]
-                j = ij[1]
-                e = x_min + j * x_res
-                n = y_min + (start + i) * y_res
-                lat, lon, _ = ctr.TransformPoint(e, n)
-                u = float(unc[i, j])
-                xyz.append([float(lat), float(lon), u])
-                # logger.info("%d,%d: %.7f %.7f %.3f" % ((start + i), j, xyz[-1][0], xyz[-1][1], xyz[-1][2]))
-
-        return xyz
-
-    def depth_has_uncertainty(self) -> list[list[int | float]]:
-        rows, cols = self.uncertainty_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
+    @classmethod
+    def _histogram_range(cls, min_max: tuple[float, float]) -> tuple[float, float]:
+        """ Return a valid histogram range from the passed min/max (that are NaN for an empty layer) """
+        if isnan(min_max[0]) or isnan(min_max[1]):
+            return 0.0, 0.0
+        return float(min_max[0]), float(min_max[1])
 
-        self.populate_metadata()
+    def run_qc(self, checks: list[QCCheck], as_array: bool = False) -> list:
+        """ Run the passed checks in a single pass over the SR grids, and return their results
 
-        x_min = self.meta.sw[0]
-        y_min = self.meta.sw[1]
-        x_res = self.meta.res_x
-        y_res = self.meta.res_y
-        # logger.debug("info: %f %f %f %f" % (x_min, y_min, x_res, y_res))
+        Each tile of the required layers is read only once, and fed to all the checks.
+
+        checks
+            The list of checks to run
+        as_array
+            If True, the flags are returned as (N, 3) arrays rather than lists of lists
+        """
+        for check in checks:
+            check.reset()
+
+        layers = tuple(layer for layer in self.grid_layers if any(layer in check.layers for check in checks))
+        if len(layers) > 0:
+            for row_range, col_range, tile in self.iter_tiles(layers=layers, reuse_buffers=True):
+                # logger.debug('tile: %s, %s' % (row_range, col_range))
+                for check in checks:
+                    check.feed(row_range=row_range, col_range=col_range, tile=tile)
+
+        results = list()
+        for check in checks:
+            if not isinstance(check, FlagCheck):
+                results.append(check.result())
+                continue
+
+            self.populate_metadata()
+            flag_rows, flag_cols, flag_values = check.result()
+            es = self.meta.sw[0] + flag_cols * self.meta.res_x
+            ns = self.meta.sw[1] + flag_rows * self.meta.res_y
+            results.append(self._georeferenced_flags(es=es, ns=ns, zs=flag_values, as_array=as_array))
+
+        return results
+
+    def wgs84_transformation(self, inverse: bool = False) -> "osr.CoordinateTransformation":
+        """ Return the transformation from the BAG horizontal CRS to WGS84 (traditional GIS order)
+
+        inverse
+            If True, return the transformation from WGS84 to the BAG horizontal CRS
+        """
+        osr = Helper.import_osr()
+
+        self.populate_metadata()
 
         in_srs = osr.SpatialReference()
         in_srs.ImportFromWkt(self.meta.wkt_srs)
@@ -448,280 +668,377 @@ class BAGFile(File):
         out_srs = osr.SpatialReference()
         out_srs.ImportFromEPSG(4326)
         out_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        ctr = osr.CoordinateTransformation(in_srs, out_srs)
-
-        mem_row = cols * 32 / 1024 / 1024
-        # mem = mem_row * rows
-        # logger.debug('estimated memory: %.1f MB' % mem)
-        chunk_size = 8096
-        chunk_rows = int(chunk_size / mem_row) + 1
-        # logger.debug('nr of rows per chunk: %s' % chunk_rows)
-
-        xyz = list()
-        for start in range(0, rows, chunk_rows):
-            stop = start + chunk_rows
-            if stop > rows:
-                stop = rows
-
-            unc = self.uncertainty(row_range=slice(start, stop))
-            # logger.info(unc)
-            dep = self.elevation(row_range=slice(start, stop))
-            # logger.info(dep)
-            dep[isfinite(unc)] = nan
-            # logger.info(dep)
-            ijs = argwhere(isfinite(dep))
-            # logger.info(ijs)
-            for ij in ijs:
-                i = ij[0]
-                j = ij[1]
-                e = x_min + j * x_res
-                n = y_min + (start + i) * y_res
-                lat, lon, _ = ctr.TransformPoint(e, n)
-                z = -float(dep[i, j])
-                xyz.append([float(lat), float(lon), z])
-                # logger.info("%d,%d: %.7f %.7f %.3f" % ((start + i), j, xyz[-1][0], xyz[-1][1], xyz[-1][2]))
-
-        return xyz
+        if inverse:
+            return osr.CoordinateTransformation(out_srs, in_srs)
+        return osr.CoordinateTransformation(in_srs, out_srs)
+
+    def transform_to_wgs84(self, es: NDArray, ns: NDArray,
+                           chunk_size: int | None = None) -> tuple[NDArray, NDArray]:
+        """ Transform projected positions to WGS84, returning the longitude and latitude arrays
+
+        es, ns
+            The easting and northing arrays in the BAG horizontal CRS
+        chunk_size
+            The maximum number of positions passed to each batch transformation. If None, use the class default.
+        """
+        return self._transform_points(ctr=self.wgs84_transformation(), xs=es, ys=ns, chunk_size=chunk_size)
 
-    def vr_uncertainty_min_max(self) -> tuple[float, float]:
-        # rows, cols = self.vr_refinements_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
+    def transform_from_wgs84(self, lons: NDArray, lats: NDArray,
+                             chunk_size: int | None = None) -> tuple[NDArray, NDArray]:
+        """ Transform WGS84 positions to the BAG horizontal CRS, returning the easting and northing arrays
+
+        lons, lats
+            The longitude and latitude arrays
+        chunk_size
+            The maximum number of positions passed to each batch transformation. If None, use the class default.
+        """
+        return self._transform_points(ctr=self.wgs84_transformation(inverse=True), xs=lons, ys=lats,
+                                      chunk_size=chunk_size)
+
+    def _transform_points(self, ctr: "osr.CoordinateTransformation", xs: NDArray, ys: NDArray,
+                          chunk_size: int | None = None) -> tuple[NDArray, NDArray]:
+        """ Transform the passed positions in batches of chunk_size points """
+        if chunk_size is None:
+            chunk_size = self.transform_chunk_size
+        xs = asarray(xs, dtype=float64).ravel()
+        ys = asarray(ys, dtype=float64).ravel()
+        if xs.shape != ys.shape:
+            raise BAGError("Mismatch in the number of coordinates: %d vs %d" % (xs.size, ys.size))
+
+        out_xs = empty(xs.size, dtype=float64)
+        out_ys = empty(xs.size, dtype=float64)
+        for start in range(0, xs.size, chunk_size):
+            stop = min(start + chunk_size, xs.size)
+            pts = array(ctr.TransformPoints(list(zip(xs[start:stop].tolist(), ys[start:stop].tolist()))),
+                        dtype=float64)
+            out_xs[start:stop] = pts[:, 0]
+            out_ys[start:stop] = pts[:, 1]
+
+        return out_xs, out_ys
+
+    def _georeferenced_flags(self, es: NDArray, ns: NDArray, zs: NDArray,
+                             as_array: bool) -> list[list[float]] | NDArray:
+        """ Transform the flagged positions to WGS84 and pack them with their values """
+        lons, lats = self.transform_to_wgs84(es=es, ns=ns)
+        xyz = column_stack((lons, lats, zs.astype(float64)))
+        if as_array:
+            return xyz
+        return xyz.tolist()
+
+    def vr_statistics(self, field: str = "depth", bins: int = 0, hist_range: tuple[float, float] | None = None,
+                      sample_size: int = 100000) -> Statistics:
+        """ Return the statistics of a field of the VR refinements, computed in a single streaming pass
+
+        field
+            The name of the refinement field: "depth" or "depth_uncrt"
+        bins
+            The number of histogram bins (0 to skip the histogram)
+        hist_range
+            The (min, max) range of the histogram. If None and bins is not 0, a preliminary min/max pass is run.
+        sample_size
+            The maximum number of values retained to estimate the quantiles (0 to skip them)
+        """
+        return self._cached_result("vr_statistics(%s, %d, %r, %d)" % (field, bins, hist_range, sample_size),
+                                   lambda: self._vr_statistics(field=field, bins=bins, hist_range=hist_range,
+                                                               sample_size=sample_size))
+
+    def _vr_statistics(self, field: str, bins: int, hist_range: tuple[float, float] | None,
+                       sample_size: int) -> Statistics:
+        if (bins > 0) and (hist_range is None):
+            min_max = self._vr_statistics(field=field, bins=0, hist_range=None, sample_size=0)
+            hist_range = self._histogram_range((min_max.min, min_max.max))
+
+        stats = Statistics(bins=bins, hist_range=hist_range, sample_size=sample_size)
+        for _, values in self.iter_vr_refinements(field=field):
+            stats.update(values)
+        return stats
+
+    def iter_vr_refinements(self, field: str, mask_nan: bool = True, block_size: int | None = None,
+                            rfn_range: slice | None = None) -> Iterator[tuple[slice, NDArray]]:
+        """ Iterate over the VR refinements by blocks, returning the index range and the values of the passed field
+
+        Only the passed field is read, by blocks aligned to the on-disk chunks, so the memory is bounded by the
+        block size.
+
+        field
+            The name of the refinement field: "depth" or "depth_uncrt"
+        mask_nan
+            If True, apply a mask using the BAG nan value
+        block_size
+            The (maximum) number of refinements in a block. If None, use the class default.
+        rfn_range
+            The index range of the refinements to iterate over. If None, all the refinements.
+        """
+        if field not in self.vr_refinement_fields:
+            raise BAGError("Unknown refinement field: %s" % field)
+
+        values = self._dataset(self.paths.bag_varres_refinements, access="chunks").fields(field)
+        for block_range in self._vr_block_ranges(rfn_range=rfn_range, block_size=block_size):
+            self._record_read(self.paths.bag_varres_refinements, (slice(0, 1), block_range))
+            block = values[0, block_range]
+            if mask_nan:
+                block[block == BAGFile.BAG_NAN] = nan
+            yield block_range, block
+
+    def _vr_block_ranges(self, rfn_range: slice | None = None, block_size: int | None = None) -> Iterator[slice]:
+        """ Split a range of refinements (all, if None) in blocks aligned to the on-disk chunks """
+        if block_size is None:
+            block_size = self.vr_block_size
+        if block_size < 1:
+            raise BAGError("Invalid block size: %s" % block_size)
+
+        ds = self._dataset(self.paths.bag_varres_refinements, access="chunks")
+        if rfn_range is None:
+            rfn_range = slice(0, ds.shape[1])
+        if ds.chunks is None:
+            for start in range(rfn_range.start, rfn_range.stop, block_size):
+                yield slice(start, min(start + block_size, rfn_range.stop))
+            return
 
-        vr_unc = self[self.paths.bag_varres_refinements][0]['depth_uncrt']
-        mask = vr_unc == BAGFile.BAG_NAN
-        vr_unc[mask] = nan
+        chunk_size = ds.chunks[1]
+        block_size = max(chunk_size, block_size // chunk_size * chunk_size)
+        start = rfn_range.start
+        while start < rfn_range.stop:
+            # the first block ends at a block boundary, so the following ones are aligned
+            stop = min((start // block_size + 1) * block_size, rfn_range.stop)
+            yield slice(start, stop)
+            start = stop
+
+    def _iter_vr_records(self, rfn_range: slice | None = None, block_size: int | None = None) \
+            -> Iterator[tuple[slice, NDArray, NDArray]]:
+        """ Iterate over a range of refinements (all, if None) by blocks, returning the depth and uncertainty """
+        for block_range in self._vr_block_ranges(rfn_range=rfn_range, block_size=block_size):
+            depth, uncertainty = self._read_vr_records(block_range)
+            yield block_range, depth, uncertainty
+
+    def _read_vr_records(self, rfn_range: slice) -> tuple[NDArray, NDArray]:
+        """ Read a range of refinements with a single call, returning the (NaN-masked) depth and uncertainty """
+        ds = self._dataset(self.paths.bag_varres_refinements, access="chunks")
+        self._record_read(self.paths.bag_varres_refinements, (slice(0, 1), rfn_range))
+        block = ds[0, rfn_range]
+        depth = block['depth']
+        depth[depth == BAGFile.BAG_NAN] = nan
+        uncertainty = block['depth_uncrt']
+        uncertainty[uncertainty == BAGFile.BAG_NAN] = nan
+        return depth, uncertainty
+
+    def vr_summary(self) -> VRSummary:
+        """ Return the (cached) per-supergrid summary of the refinements, computed in a single streaming pass """
+        if self._vr_summary is None:
+            self._vr_summary = self._cached_result("vr_summary", self._compute_vr_summary)
+        return self._vr_summary
+
+    def _compute_vr_summary(self) -> VRSummary:
+        summary = VRSummary(self.vr_refinement_index())
+        for rfn_range, depth, uncertainty in self._iter_vr_records(rfn_range=slice(0, summary.nr_of_refinements)):
+            summary.update(rfn_range=rfn_range, depth=depth, uncertainty=uncertainty)
+        return summary
+
+    def vr_grid(self, res_x: float, res_y: float | None = None, method: str = "mean", field: str = "depth",
+                row_range: slice | None = None, col_range: slice | None = None, out: NDArray | None = None) -> VRGrid:
+        """ Resample the VR refinements to a uniform grid, binning the refinement nodes in the grid cells
+
+        The supergrids are streamed by tiles of supergrid rows, and only the passed field of the refinements in the
+        window is read, so the memory is bounded by the block size and the output grid.
+        The grid covers the extent of the window of supergrids, starting at its south-west corner.
+
+        res_x, res_y
+            The resolution of the output grid. If res_y is None, the same as res_x.
+        method
+            The method used to combine the nodes in a cell: "min", "max", "mean", or "nearest"
+        field
+            The name of the refinement field: "depth" or "depth_uncrt"
+        row_range, col_range
+            The window of the VR grid (in supergrids) to resample. If None, the whole grid.
+        out
+            If present, the floating point array to use for the output grid (with the shape of the grid)
+        """
+        if field not in self.vr_refinement_fields:
+            raise BAGError("Unknown refinement field: %s" % field)
+        if res_y is None:
+            res_y = res_x
+        self.populate_metadata()
 
-        # logger.debug(vr_el)
+        vr_idx = self.vr_refinement_index()
+        sg_rows = range(*(row_range if row_range is not None else slice(None)).indices(vr_idx.shape[0]))
+        sg_cols = range(*(col_range if col_range is not None else slice(None)).indices(vr_idx.shape[1]))
+        if (sg_rows.step != 1) or (sg_cols.step != 1):
+            raise BAGError("Invalid step for slice selector: %s, %s" % (row_range, col_range))
+
+        x_min, y_min = self._vr_supergrid_corners(sg_rows=sg_rows.start, sg_cols=sg_cols.start)
+        shape = (max(1, int(ceil(len(sg_rows) * self.meta.res_y / res_y - 1e-9))),
+                 max(1, int(ceil(len(sg_cols) * self.meta.res_x / res_x - 1e-9))))
+        grid = VRGrid(x_min=x_min + res_x / 2.0, y_min=y_min + res_y / 2.0, res_x=res_x, res_y=res_y,
+                      shape=shape, method=method, out=out)
+
+        # each tile is a band of supergrid rows with (about) a block of refinements in the window
+        positions = vr_idx.window(row_range=slice(sg_rows.start, sg_rows.stop),
+                                  col_range=slice(sg_cols.start, sg_cols.stop))
+        rows = vr_idx.sg_rows[positions]
+        counts = cumsum(vr_idx.stops[positions] - vr_idx.starts[positions])
+        tile_start = 0
+        while tile_start < positions.size:
+            # the tile ends with the supergrid row reached by a block of refinements
+            budget = (counts[tile_start - 1] if tile_start > 0 else 0) + self.vr_block_size
+            last = max(tile_start, searchsorted(counts, budget, side='right') - 1)
+            tile_stop = searchsorted(rows, rows[last], side='right')
+            for rfn_range in vr_idx.refinement_ranges(positions[tile_start:tile_stop]):
+                for block_range, values in self.iter_vr_refinements(field=field, rfn_range=rfn_range):
+                    es, ns = self.vr_refinement_positions(arange(block_range.start, block_range.stop))
+                    grid.update(es=es, ns=ns, values=values)
+            tile_start = tile_stop
+
+        grid.finalize()
+        return grid
+
+    def _vr_flagged_refinements(self, candidates: NDArray, flag: Callable[[NDArray, NDArray], NDArray]) \
+            -> tuple[NDArray, NDArray, NDArray]:
+        """ Return the indices, depths and uncertainties of the flagged refinements
+
+        Only the blocks with refinements of the candidate supergrids are read, once each, and the flags are masked
+        to the candidate ranges. When the candidates cover more than vr_candidate_fraction of the refinements,
+        the whole blocks are streamed.
+
+        candidates
+            The boolean mask of the supergrids (in the summary order) that may have flagged refinements
+        flag
+            The function returning the boolean mask of the flagged nodes, from their depth and uncertainty
+        """
+        summary = self.vr_summary()
+        rfn_idx, depths, uncertainties = [empty(0, dtype=int64)], [empty(0, dtype=float32)], [empty(0, dtype=float32)]
+        ranges = summary.refinement_ranges(flatnonzero(candidates))
+        if len(ranges) == 0:
+            return concatenate(rfn_idx), concatenate(depths), concatenate(uncertainties)
+        # with many candidates, the whole blocks are streamed rather than the spans of the candidates in them
+        streaming = sum(rng.stop - rng.start for rng in ranges) > \
+            self.vr_candidate_fraction * summary.nr_of_refinements
+
+        starts = array([rng.start for rng in ranges], dtype=int64)
+        stops = array([rng.stop for rng in ranges], dtype=int64)
+        for block_range in self._vr_block_ranges(rfn_range=slice(int(starts[0]), int(stops[-1]))):
+            # the candidate ranges overlapping the block
+            first = searchsorted(stops, block_range.start, side='right')
+            last = searchsorted(starts, block_range.stop, side='left')
+            if first >= last:
+                continue
+            if streaming:
+                span = block_range
+            else:
+                span = slice(max(int(starts[first]), block_range.start), min(int(stops[last - 1]), block_range.stop))
+            depth, uncertainty = self._read_vr_records(span)
+
+            # the nodes within the candidate ranges, from the range boundaries
+            size = span.stop - span.start
+            bounds = bincount(clip(starts[first:last] - span.start, 0, size), minlength=size + 1) \
+                - bincount(clip(stops[first:last] - span.start, 0, size), minlength=size + 1)
+            flagged = flatnonzero(flag(depth, uncertainty) & (cumsum(bounds[:-1]) > 0))
+            rfn_idx.append(flagged + span.start)
+            depths.append(depth[flagged])
+            uncertainties.append(uncertainty[flagged])
+        return concatenate(rfn_idx), concatenate(depths), concatenate(uncertainties)
 
-        return nanmin(vr_unc), nanmax(vr_unc)
+    def vr_uncertainty_min_max(self) -> tuple[float, float]:
+        return self._cached_result("vr_uncertainty_min_max", self._vr_uncertainty_min_max)
+
+    def _vr_uncertainty_min_max(self) -> tuple[float, float]:
+        return self._vr_min_max(field="depth_uncrt")
 
-    def vr_uncertainty_greater_than(self, th: float) -> list[list[int | float]]:
-        # rows, cols = self.vr_refinements_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
+    def vr_uncertainty_greater_than(self, th: float, as_array: bool = False) -> list[list[float]] | NDArray:
+        return self._cached_flags("vr_uncertainty_greater_than(%r)" % th,
+                                  lambda: self._vr_uncertainty_greater_than(th=th), as_array=as_array)
 
+    def _vr_uncertainty_greater_than(self, th: float) -> NDArray:
         self.populate_metadata()
 
-        x_min = self.meta.sw[0]
-        y_min = self.meta.sw[1]
-        x_res = self.meta.res_x
-        y_res = self.meta.res_y
-        # logger.debug("info: %f %f %f %f" % (x_min, y_min, x_res, y_res))
+        # the supergrids with all the uncertainties not greater than the threshold are skipped
+        summary = self.vr_summary()
+        rfn_idx, _, vr_unc = self._vr_flagged_refinements(candidates=summary.uncertainty_max > th,
+                                                          flag=lambda depth, uncertainty: uncertainty > th)
+        # logger.info("Located %d outliers" % len(rfn_idx))
+        es, ns = self.vr_refinement_positions(rfn_idx)
 
-        in_srs = osr.SpatialReference()
-        in_srs.ImportFromWkt(self.meta.wkt_srs)
-        if in_srs.IsCompound():
-            in_srs.StripVertical()
-        out_srs = osr.SpatialReference()
-        out_srs.ImportFromEPSG(4326)
-        out_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        ctr = osr.CoordinateTransformation(in_srs, out_srs)
-
-        vr_unc = self[self.paths.bag_varres_refinements][0]['depth_uncrt']
-        mask = vr_unc == BAGFile.BAG_NAN
-        vr_unc[mask] = nan
-
-        xyz_dict = dict()
-        for idx, unc in enumerate(vr_unc):
-            if unc > th:
-                xyz_dict[idx] = unc
-
-        # logger.info("Located %d outliers" % len(xyz_dict))
-
-        xyz = list()
-        vr_ixs = self[self.paths.bag_varres_metadata][:]
-        rows, cols = vr_ixs.shape
-        i = 0
-        for sg_r in range(rows):
-            for sg_c in range(cols):
-                if vr_ixs[sg_r, sg_c][1] == 0:
-                    continue
-                ir = vr_ixs[sg_r, sg_c][1] * vr_ixs[sg_r, sg_c][2]
-                for ir_idx in range(ir):
-                    j = i + ir_idx
-                    if j not in xyz_dict:
-                        continue
-                    unc = float(xyz_dict[j])
-                    # logger.debug("Located outliers: %d %f in %d,%d: %s" % (j, unc, sg_r, sg_c, vr_ixs[sg_r, sg_c]))
-                    # vr_ixs[r, c]
-                    rfn_r = ir_idx // vr_ixs[sg_r, sg_c][1]
-                    rfn_c = ir_idx % vr_ixs[sg_r, sg_c][1]
-                    # logger.debug("%d > %d,%d" % (ir_idx, rfn_r, rfn_c))
-                    e = x_min + (sg_c - 0.5) * x_res + vr_ixs[sg_r, sg_c][5] + rfn_c * vr_ixs[sg_r, sg_c][3]
-                    n = y_min + (sg_r - 0.5) * y_res + vr_ixs[sg_r, sg_c][6] + rfn_r * vr_ixs[sg_r, sg_c][4]
-                    lat, lon, _ = ctr.TransformPoint(e, n)
-                    xyz.append([float(lat), float(lon), unc])
-                i += ir
-
-        return xyz
-
-    def vr_depth_has_uncertainty(self) -> list[list[int | float]]:
-        # rows, cols = self.vr_refinements_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
+        return self._georeferenced_flags(es=es, ns=ns, zs=vr_unc, as_array=True)
 
+    def vr_depth_has_uncertainty(self, as_array: bool = False) -> list[list[float]] | NDArray:
+        return self._cached_flags("vr_depth_has_uncertainty", self._vr_depth_has_uncertainty, as_array=as_array)
+
+    def _vr_depth_has_uncertainty(self) -> NDArray:
         self.populate_metadata()
 
-        x_min = self.meta.sw[0]
-        y_min = self.meta.sw[1]
-        x_res = self.meta.res_x
-        y_res = self.meta.res_y
-        # logger.debug("info: %f %f %f %f" % (x_min, y_min, x_res, y_res))
+        # only the supergrids with some valid depths without uncertainty are read
+        summary = self.vr_summary()
+        rfn_idx, vr_dep, _ = self._vr_flagged_refinements(
+            candidates=summary.nr_of_depths > summary.nr_of_both,
+            flag=lambda depth, uncertainty: isfinite(depth) & isnan(uncertainty))
+        # logger.info("Located %d outliers" % len(rfn_idx))
+        es, ns = self.vr_refinement_positions(rfn_idx)
 
-        in_srs = osr.SpatialReference()
-        in_srs.ImportFromWkt(self.meta.wkt_srs)
-        if in_srs.IsCompound():
-            in_srs.StripVertical()
-        out_srs = osr.SpatialReference()
-        out_srs.ImportFromEPSG(4326)
-        out_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        ctr = osr.CoordinateTransformation(in_srs, out_srs)
-
-        vr_unc = self[self.paths.bag_varres_refinements][0]['depth_uncrt']
-        mask = vr_unc == BAGFile.BAG_NAN
-        vr_unc[mask] = nan
-        vr_dep = self[self.paths.bag_varres_refinements][0]['depth']
-        mask = vr_dep == BAGFile.BAG_NAN
-        vr_dep[mask] = nan
-
-        xyz_dict = dict()
-        for idx, unc in enumerate(vr_unc):
-            dep = vr_dep[idx]
-            if isfinite(dep) and isnan(unc):
-                xyz_dict[idx] = dep
-
-        # logger.info("Located %d outliers" % len(xyz_dict))
-
-        xyz = list()
-        vr_ixs = self[self.paths.bag_varres_metadata][:]
-        rows, cols = vr_ixs.shape
-        i = 0
-        for sg_r in range(rows):
-            for sg_c in range(cols):
-                if vr_ixs[sg_r, sg_c][1] == 0:
-                    continue
-                ir = vr_ixs[sg_r, sg_c][1] * vr_ixs[sg_r, sg_c][2]
-                for ir_idx in range(ir):
-                    j = i + ir_idx
-                    if j not in xyz_dict:
-                        continue
-                    dep = float(xyz_dict[j])
-                    # logger.debug("Located outliers: %d %f in %d,%d: %s" % (j, unc, sg_r, sg_c, vr_ixs[sg_r, sg_c]))
-                    # vr_ixs[r, c]
-                    rfn_r = ir_idx // vr_ixs[sg_r, sg_c][1]
-                    rfn_c = ir_idx % vr_ixs[sg_r, sg_c][1]
-                    # logger.debug("%d > %d,%d" % (ir_idx, rfn_r, rfn_c))
-                    e = x_min + (sg_c - 0.5) * x_res + vr_ixs[sg_r, sg_c][5] + rfn_c * vr_ixs[sg_r, sg_c][3]
-                    n = y_min + (sg_r - 0.5) * y_res + vr_ixs[sg_r, sg_c][6] + rfn_r * vr_ixs[sg_r, sg_c][4]
-                    lat, lon, _ = ctr.TransformPoint(e, n)
-                    xyz.append([float(lat), float(lon), dep])
-                i += ir
-
-        return xyz
-
-    def vr_uncertainty_has_depth(self) -> list[list[int | float]]:
-        # rows, cols = self.vr_refinements_shape()
-        # logger.debug('shape: %s, %s' % (rows, cols))
+        return self._georeferenced_flags(es=es, ns=ns, zs=vr_dep, as_array=True)
+
+    def vr_uncertainty_has_depth(self, as_array: bool = False) -> list[list[float]] | NDArray:
+        return self._cached_flags("vr_uncertainty_has_depth", self._vr_uncertainty_has_depth, as_array=as_array)
 
+    def _vr_uncertainty_has_depth(self) -> NDArray:
         self.populate_metadata()
 
-        x_min = self.meta.sw[0]
-        y_min = self.meta.sw[1]
-        x_res = self.meta.res_x
-        y_res = self.meta.res_y
-        # logger.debug("info: %f %f %f %f" % (x_min, y_min, x_res, y_res))
+        # only the supergrids with some valid uncertainties without depth are read
+        summary = self.vr_summary()
+        rfn_idx, _, vr_unc = self._vr_flagged_refinements(
+            candidates=summary.nr_of_uncertainties > summary.nr_of_both,
+            flag=lambda depth, uncertainty: isfinite(uncertainty) & isnan(depth))
+        # logger.info("Located %d outliers" % len(rfn_idx))
+        es, ns = self.vr_refinement_positions(rfn_idx)
 
-        in_srs = osr.SpatialReference()
-        in_srs.ImportFromWkt(self.meta.wkt_srs)
-        if in_srs.IsCompound():
-            in_srs.StripVertical()
-        out_srs = osr.SpatialReference()
-        out_srs.ImportFromEPSG(4326)
-        out_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        ctr = osr.CoordinateTransformation(in_srs, out_srs)
-
-        vr_unc = self[self.paths.bag_varres_refinements][0]['depth_uncrt']
-        mask = vr_unc == BAGFile.BAG_NAN
-        vr_unc[mask] = nan
-        vr_dep = self[self.paths.bag_varres_refinements][0]['depth']
-        mask = vr_dep == BAGFile.BAG_NAN
-        vr_dep[mask] = nan
-
-        xyz_dict = dict()
-        for idx, unc in enumerate(vr_unc):
-            dep = vr_dep[idx]
-            if isfinite(unc) and isnan(dep):
-                xyz_dict[idx] = unc
-
-        # logger.info("Located %d outliers" % len(xyz_dict))
-
-        xyz = list()
-        vr_ixs = self[self.paths.bag_varres_metadata][:]
-        rows, cols = vr_ixs.shape
-        i = 0
-        for sg_r in range(rows):
-            for sg_c in range(cols):
-                if vr_ixs[sg_r, sg_c][1] == 0:
-                    continue
-                ir = vr_ixs[sg_r, sg_c][1] * vr_ixs[sg_r, sg_c][2]
-                for ir_idx in range(ir):
-                    j = i + ir_idx
-                    if j not in xyz_dict:
-                        continue
-                    unc = float(xyz_dict[j])
-                    # logger.debug("Located outliers: %d %f in %d,%d: %s" % (j, unc, sg_r, sg_c, vr_ixs[sg_r, sg_c]))
-                    # vr_ixs[r, c]
-                    rfn_r = ir_idx // vr_ixs[sg_r, sg_c][1]
-                    rfn_c = ir_idx % vr_ixs[sg_r, sg_c][1]
-                    # logger.debug("%d > %d,%d" % (ir_idx, rfn_r, rfn_c))
-                    e = x_min + (sg_c - 0.5) * x_res + vr_ixs[sg_r, sg_c][5] + rfn_c * vr_ixs[sg_r, sg_c][3]
-                    n = y_min + (sg_r - 0.5) * y_res + vr_ixs[sg_r, sg_c][6] + rfn_r * vr_ixs[sg_r, sg_c][4]
-                    lat, lon, _ = ctr.TransformPoint(e, n)
-                    xyz.append([float(lat), float(lon), unc])
-                i += ir
-
-        return xyz
+        return self._georeferenced_flags(es=es, ns=ns, zs=vr_unc, as_array=True)
 
     def has_density(self) -> bool:
-        # noinspection PyBroadException
-        try:
-            self[self.paths.bag_elevation_solution]['num_soundings']
-        except Exception:
+        """ Check the presence of the density field, using only the HDF5 object metadata """
+        if self.paths.bag_elevation_solution not in self:
             return False
-        return True
+        names = self[self.paths.bag_elevation_solution].dtype.names
+        return (names is not None) and (self.paths.bag_density_field in names)
 
-    def density(self, mask_nan: bool = True, row_range: slice | None = None) -> NDArray:
+    def density(self, mask_nan: bool = True, row_range: slice | None = None,
+                col_range: slice | None = None, workers: int = 1) -> NDArray:
         """
-        Return the density as numpy array
+        Return the density as float32 numpy array
 
         mask_nan
             If True, apply a mask using the BAG nan value
         row_range
             If present, a slice of rows to read from
+        col_range
+            If present, a slice of columns to read from
+        workers
+            If greater than 1, the chunks of a compressed layer are read and decoded by this number of threads
         """
-        if row_range:
-            if not isinstance(row_range, slice):
-                raise BAGError("Invalid type of slice selector: %s" % type(row_range))
-            if (row_range.start < 0) or (row_range.start >= self.density_shape()[0]) \
-                    or (row_range.stop < 0) or (row_range.stop > self.density_shape()[0]) \
-                    or (row_range.start > row_range.stop):
-                raise BAGError("Invalid values for slice selector: %s" % row_range)
-
+        de, valid = self.density_native(row_range=row_range, col_range=col_range, workers=workers)
+        de = de.astype(float32)
         if mask_nan:
-            if row_range:
-                de = self[self.paths.bag_elevation_solution]['num_soundings'][row_range]
-            else:
-                de = self[self.paths.bag_elevation_solution]['num_soundings'][:]
-            de = de.astype(float)
-            mask = de == BAGFile.BAG_NAN
-            de[mask] = nan
-            return de
-
-        if row_range:
-            de = self[self.paths.bag_elevation_solution]['num_soundings'][row_range]
-        else:
-            de = self[self.paths.bag_elevation_solution]['num_soundings'][:]
-        de = de.astype(float)
+            de[~valid] = nan
         return de
 
+    def density_native(self, row_range: slice | None = None,
+                       col_range: slice | None = None, workers: int = 1) -> tuple[NDArray, NDArray]:
+        """
+        Return the density in its native dtype, together with the boolean mask of the valid nodes
+
+        row_range
+            If present, a slice of rows to read from
+        col_range
+            If present, a slice of columns to read from
+        workers
+            If greater than 1, the chunks of a compressed layer are read and decoded by this number of threads
+        """
+        sel = self._window_selection(shape=self.density_shape(), row_range=row_range, col_range=col_range)
+        ds = self._dataset(self.paths.bag_elevation_solution)
+        if workers > 1:
+            de = ChunkReader(ds, workers=workers).read(sel, field=self.paths.bag_density_field)
+        else:
+            self._record_read(self.paths.bag_elevation_solution, sel)
+            de = ds.fields(self.paths.bag_density_field)[sel]
+        return de, de != BAGFile.BAG_NAN
+
     def density_shape(self) -> tuple[int, int]:
         return self[self.paths.bag_elevation_solution].shape
 
@@ -778,21 +1095,32 @@ class BAGFile(File):
         as_pretty_xml
             If True, return the xml in a pretty format as bytes
         """
-        xml_bytes = self[self.paths.bag_metadata][:].tostring().strip(b'\x00')
-
         if as_pretty_xml:
             # noinspection PyUnresolvedReferences
-            xml_tree = etree.fromstring(xml_bytes)
-            # noinspection PyUnresolvedReferences
-            pretty_bytes = etree.tostring(xml_tree, pretty_print=True)
+            pretty_bytes = etree.tostring(self.metadata_tree(), pretty_print=True)
             if as_string:
                 return pretty_bytes.decode()
             return pretty_bytes
         else:
+            xml_bytes = self._read_metadata_bytes()
             if as_string:
                 return xml_bytes.decode()
             return xml_bytes
 
+    def _read_metadata_bytes(self) -> bytes:
+        """ Read the metadata dataset of characters as a single contiguous buffer """
+        return self[self.paths.bag_metadata][()].tobytes().strip(b'\x00')
+
+    def metadata_tree(self) -> etree.ElementBase:
+        """ Return the (memoized) parsed metadata, shared by Meta, the validation and the metadata editors
+
+        The returned tree must not be modified: the metadata editors edit a copy, and share it once written.
+        """
+        if self._meta_tree is None:
+            # noinspection PyUnresolvedReferences
+            self._meta_tree = etree.fromstring(self._read_metadata_bytes())
+        return self._meta_tree
+
     def extract_metadata(self, name: str = None) -> None:
         """ Save metadata on disk
 
@@ -800,7 +1128,7 @@ class BAGFile(File):
             The file path where the metadata will be saved. If None, use a default name.
         """
 
-        meta_xml = self.metadata(as_pretty_xml=True)
+        meta_xml = self.metadata(as_string=False, as_pretty_xml=True)
         if meta_xml is None:
             logger.info("unable to access the metadata")
             return
@@ -833,90 +1161,73 @@ class BAGFile(File):
             logger.info("the passed metadata file is not valid")
             return
 
+        self._write_metadata(xml_string)
+
+    def _write_metadata(self, xml_bytes: bytes, xml_tree: etree.ElementBase | None = None) -> None:
+        """ Replace the metadata dataset, writing the whole XML buffer as an array of characters in a single call
+
+        xml_bytes
+            The XML metadata
+        xml_tree
+            If present, the already parsed XML metadata (shared once the write succeeds)
+        """
         del self[self.paths.bag_metadata]
-        xml_sz = len(xml_string)
-        ds = self.create_dataset(self.paths.bag_metadata, (xml_sz,), dtype="S1")
-        for i, bt in enumerate(xml_string):
-            ds[i] = bytes([bt])
+        self.create_dataset(self.paths.bag_metadata, data=frombuffer(xml_bytes, dtype="S1"))
+        self._meta = None
+        self._meta_tree = xml_tree
 
     def validate_metadata(self, xml_string: None | bytes = None) -> bool:
         """ Validate metadata based on XML Schemas and schematron. """
-        # clean metadata error list
+        # clean metadata error lists
         self.meta_errors = list()
+        self.meta_xsd_errors = list()
+        self.meta_schematron_errors = list()
         # assuming a valid BAG
         is_valid = True
 
-        if xml_string is None:
-            xml_string = self.ensure_bytes(self.metadata(as_pretty_xml=True))
-
         # noinspection PyUnresolvedReferences
         try:
-            # noinspection PyUnresolvedReferences
-            xml_tree = etree.fromstring(xml_string)
+            if xml_string is None:
+                xml_tree = self.metadata_tree()
+            else:
+                # noinspection PyUnresolvedReferences
+                xml_tree = etree.fromstring(xml_string)
         except etree.Error as e:
             logger.warning("unable to parse XML metadata: %s" % e)
             self.meta_errors.append(e)
             return False
 
-        # noinspection PyUnresolvedReferences
         try:
-            schema_path = os.path.join(Helper.iso19139_folder(), 'bag', 'bag.xsd')
-            # noinspection PyUnresolvedReferences
-            schema_doc = etree.parse(schema_path)
-            # noinspection PyUnresolvedReferences
-            schema = etree.XMLSchema(schema_doc)
-        except etree.Error as e:
-            logger.warning("unable to parse XML schema: %s" % e)
+            xsd_errors = ValidatorRegistry.xsd_errors(xml_tree)
+        except BAGError as e:
+            logger.warning(e)
             self.meta_errors.append(e)
             return False
 
-        # noinspection PyUnresolvedReferences
-        try:
-            schema.assertValid(xml_tree)
-        except etree.DocumentInvalid as e:
-            logger.warning("invalid metadata based on XML schema: %s" % e)
-            self.meta_errors.append(e)
-            for i in schema.error_log:
-                self.meta_errors.append(i)
-            is_valid = False
-
-        if is_valid:
+        if len(xsd_errors) == 0:
             logger.debug("xsd validated")
+        else:
+            logger.warning("invalid metadata based on XML schema: %s" % xsd_errors[0])
+            self.meta_errors.extend(xsd_errors)
+            self.meta_xsd_errors = [str(err) for err in xsd_errors]
+            is_valid = False
 
-        # noinspection PyUnresolvedReferences
-        try:
-            schematron_path = os.path.join(Helper.iso19757_3_folder(), 'bag_metadata_profile.sch')
-            # noinspection PyUnresolvedReferences
-            schematron_doc = etree.parse(schematron_path)
-        except etree.DocumentInvalid as e:
-            logger.warning("unable to parse BAG schematron: %s" % e)
-            self.meta_errors.append(e)
-            return False
-
-        # noinspection PyUnresolvedReferences
         try:
-            schematron = isoschematron.Schematron(schematron_doc, store_report=True)
-        except etree.DocumentInvalid as e:
-            logger.warning("unable to load BAG schematron: %s" % e)
+            schematron_errors = ValidatorRegistry.schematron_errors(xml_tree)
+        except BAGError as e:
+            logger.warning(e)
             self.meta_errors.append(e)
             return False
 
-        if schematron.validate(xml_tree):
+        if len(schematron_errors) == 0:
             logger.debug("schematron validated")
         else:
             logger.warning("invalid metadata based on Schematron")
             is_valid = False
-            # noinspection HttpUrlsUsage
-            ns = {
-                'svrl': 'http://purl.oclc.org/dsdl/svrl',
-            }
-            for i in schematron.error_log:
-                # noinspection PyUnresolvedReferences
-                err_tree = etree.fromstring(i.message)
-                # print(etree.tostring(err_tree, pretty_print=True))
-                err_msg = err_tree.xpath('/svrl:failed-assert/svrl:text', namespaces=ns)[0].text.strip()
+            for err_msg in schematron_errors:
                 logger.warning(err_msg)
                 self.meta_errors.append(err_msg)
+            self.meta_schematron_errors = schematron_errors
 
         return is_valid
 
@@ -940,9 +1251,46 @@ class BAGFile(File):
             # log.debug("metadata already populated")
             return self.meta
 
-        self._meta = Meta(meta_xml=self.metadata(as_pretty_xml=True))
+        self._meta = self._cached_result("meta", lambda: Meta(meta_xml=self.metadata_tree()))
         return self.meta
 
+    def _cached_result(self, name: str, compute: Callable[[], Any]) -> Any:
+        """ Return the named result from the cache (if any), otherwise compute and store it
+
+        The cache is bypassed when the file is opened in a writable mode, since its content may change.
+        A cache that cannot be read or written (e.g., locked or corrupted) is ignored, and the result computed.
+        """
+        if (self.cache is None) or (self.mode != 'r'):
+            return compute()
+
+        import pickle
+        import sqlite3
+
+        if self._cache_identity is None:
+            self._cache_identity = self.cache.file_identity(self.bag_path)
+        try:
+            result = self.cache.get(file_path=self.bag_path, identity=self._cache_identity, name=name)
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError) as e:
+            logger.debug("unable to read %s from the result cache: %s" % (name, e))
+            result = None
+        if result is not None:
+            return result
+
+        result = compute()
+        try:
+            self.cache.put(file_path=self.bag_path, identity=self._cache_identity, name=name, value=result)
+        except sqlite3.Error as e:
+            logger.debug("unable to store %s in the result cache: %s" % (name, e))
+        return result
+
+    def _cached_flags(self, name: str, compute: Callable[[], NDArray],
+                      as_array: bool = False) -> list[list[float]] | NDArray:
+        """ Return the named flags (cached as an array) as an array or a list of lists """
+        flags = self._cached_result(name, compute)
+        if as_array:
+            return flags
+        return flags.tolist()
+
     def modify_wkt_prj(self, wkt_hor: str, wkt_ver: str | None = None) -> None:
         """ Modify the wkt prj in the metadata content
 
@@ -959,9 +1307,9 @@ class BAGFile(File):
             'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
         }
 
-        # print(self[self.paths.bag_metadata][:])
-        # noinspection PyUnresolvedReferences
-        xml_tree = etree.fromstring(self[self.paths.bag_metadata][:].tostring())
+        # the editor works on a copy, since the shared tree may be still in use by a Meta
+        self._meta = None
+        xml_tree = copy.deepcopy(self.metadata_tree())
 
         # noinspection PyUnresolvedReferences
         try:
@@ -977,11 +1325,7 @@ class BAGFile(File):
             return
 
         # noinspection PyUnresolvedReferences
-        new_xml = etree.tostring(xml_tree, pretty_print=True)
-        del self[self.paths.bag_metadata]
-        ds = self.create_dataset(self.paths.bag_metadata, shape=(len(new_xml),), dtype="S1")
-        for i, x in enumerate(new_xml):
-            ds[i] = bytes([x])
+        self._write_metadata(etree.tostring(xml_tree, pretty_print=True), xml_tree=xml_tree)
 
     def modify_bbox(self, west: float, east: float, south: float, north: float) -> None:
         """ attempts to modify the bounding box values """
@@ -995,8 +1339,9 @@ class BAGFile(File):
             'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
         }
 
-        # noinspection PyUnresolvedReferences
-        xml_tree = etree.fromstring(self[self.paths.bag_metadata][:].tostring())
+        # the editor works on a copy, since the shared tree may be still in use by a Meta
+        self._meta = None
+        xml_tree = copy.deepcopy(self.metadata_tree())
 
         # noinspection PyUnresolvedReferences
         try:
@@ -1033,35 +1378,104 @@ class BAGFile(File):
             return
 
         # noinspection PyUnresolvedReferences
-        new_xml = etree.tostring(xml_tree, pretty_print=True)
-        del self[self.paths.bag_metadata]
-        ds = self.create_dataset(self.paths.bag_metadata, shape=(len(new_xml),), dtype="S1")
-        for i, x in enumerate(new_xml):
-            ds[i] = bytes([x])
+        self._write_metadata(etree.tostring(xml_tree, pretty_print=True), xml_tree=xml_tree)
 
     def varres_metadata(self) -> NDArray:
         return self[self.paths.bag_varres_metadata][:]
 
+    def varres_metadata_field(self, field: str) -> NDArray:
+        """ Return a field of the supergrid table as 2D array
+
+        In read mode, the table is read once and kept by field, and a copy of the field is returned.
+        In write mode, only the requested field is read from the file at each call.
+
+        field
+            The name of the field (e.g., "dimensions_x", "resolution_y", "sw_corner_x")
+        """
+        if self.mode != 'r':
+            ds = self[self.paths.bag_varres_metadata]
+            if field not in ds.dtype.names:
+                raise BAGError("Unknown varres metadata field: %s" % field)
+            return ds.fields(field)[:]
+
+        fields = self._varres_metadata_fields()
+        if field not in fields:
+            raise BAGError("Unknown varres metadata field: %s" % field)
+        return fields[field].copy()
+
+    def _varres_metadata_fields(self) -> dict[str, NDArray]:
+        """ Return the (cached) fields of the supergrid table, shared within the class and read-only """
+        if self._vr_metadata_fields is None:
+            table = self[self.paths.bag_varres_metadata][:]
+            fields = dict()
+            for name in table.dtype.names:
+                fields[name] = ascontiguousarray(table[name])
+                fields[name].flags.writeable = False
+            self._vr_metadata_fields = fields
+        return self._vr_metadata_fields
+
+    def invalidate_varres_metadata(self) -> None:
+        """ Drop the cached supergrid table, refinement index and summary (to be called after modifying them) """
+        self._vr_metadata_fields = None
+        self._vr_index = None
+        self._vr_summary = None
+
+    def vr_refinement_index(self) -> RefinementIndex:
+        """ Return the (cached) index to locate the refinements within the supergrids """
+        if self._vr_index is None:
+            if self.mode == 'r':
+                self._vr_index = RefinementIndex(self._varres_metadata_fields())
+            else:
+                self._vr_index = RefinementIndex(self.varres_metadata())
+        return self._vr_index
+
+    def vr_refinement_positions(self, rfn_idx: NDArray | None = None,
+                                wgs84: bool = False) -> tuple[NDArray, NDArray]:
+        """ Return the positions of the passed refinement nodes, computed by broadcasting the supergrid table
+
+        The node positions are the SW corner of their supergrid cell, plus the supergrid SW corner offset,
+        plus the node row/column times the refinement resolution.
+
+        rfn_idx
+            The indices of the refinements in the varres_refinements dataset. If None, all the refinements.
+        wgs84
+            If True, return the longitude and latitude arrays instead of the projected easting and northing
+        """
+        self.populate_metadata()
+
+        vr_idx = self.vr_refinement_index()
+        sg_pos, rfn_r, rfn_c = vr_idx.locate(rfn_idx)
+        x_min, y_min = self._vr_supergrid_corners(sg_rows=vr_idx.sg_rows[sg_pos], sg_cols=vr_idx.sg_cols[sg_pos])
+        es = x_min + vr_idx.sw_x[sg_pos] + rfn_c * vr_idx.res_x[sg_pos]
+        ns = y_min + vr_idx.sw_y[sg_pos] + rfn_r * vr_idx.res_y[sg_pos]
+        if wgs84:
+            return self.transform_to_wgs84(es=es, ns=ns)
+        return es, ns
+
+    def _vr_supergrid_corners(self, sg_rows: NDArray | int, sg_cols: NDArray | int) -> tuple[NDArray, NDArray]:
+        """ Return the projected SW corner of the passed supergrid cells (the supergrid nodes are at their center) """
+        return self.meta.sw[0] + (sg_cols - 0.5) * self.meta.res_x, self.meta.sw[1] + (sg_rows - 0.5) * self.meta.res_y
+
     def has_varres_metadata(self) -> bool:
         return self.paths.bag_varres_metadata in self
 
     def varres_metadata_dim_x(self) -> NDArray:
-        return self.varres_metadata()['dimensions_x']
+        return self.varres_metadata_field('dimensions_x')
 
     def varres_metadata_dim_y(self) -> NDArray:
-        return self.varres_metadata()['dimensions_y']
+        return self.varres_metadata_field('dimensions_y')
 
     def varres_metadata_res_x(self) -> NDArray:
-        return self.varres_metadata()['resolution_x']
+        return self.varres_metadata_field('resolution_x')
 
     def varres_metadata_res_y(self) -> NDArray:
-        return self.varres_metadata()['resolution_y']
+        return self.varres_metadata_field('resolution_y')
 
     def varres_metadata_sw_x(self) -> NDArray:
-        return self.varres_metadata()['sw_corner_x']
+        return self.varres_metadata_field('sw_corner_x')
 
     def varres_metadata_sw_y(self) -> NDArray:
-        return self.varres_metadata()['sw_corner_y']
+        return self.varres_metadata_field('sw_corner_y')
 
     def has_attr_varres_metadata_max_dim_x(self) -> bool:
         return self.paths.bag_varres_meta_max_dim_x_tag in self[self.paths.bag_varres_metadata].attrs
@@ -1156,31 +1570,34 @@ class BAGFile(File):
     def attr_varres_tracking_list_length(self) -> int:
         return self[self.paths.bag_varres_tracking_list].attrs[self.paths.bag_varres_tracking_list_len_tag]
 
-    def _str_group_info(self, grp: str) -> None:
+    def _str_group_info(self, grp: str, obj: h5py.HLObject) -> None:
         if grp == self.paths.bag_root:
             self._str += "  <root>\n"
-        elif grp == self.paths.bag_elevation:
-            self._str += "  <elevation shape=%s>\n" % str(self.elevation().shape)
-        elif grp == self.paths.bag_uncertainty:
-            self._str += "  <uncertainty shape=%s>\n" % str(self.uncertainty().shape)
-        elif grp == self.paths.bag_tracking_list:
-            self._str += "  <tracking list shape=%s>\n" % str(self.tracking_list().shape)
         elif grp == self.paths.bag_metadata:
-            if self.meta is not None:
-                self._str += "  %s\n" % str(self.meta)
+            if self._meta is not None:
+                self._str += "  %s\n" % str(self._meta)
             else:
                 self._str += "  <%s>\n" % grp
+            return
+        elif isinstance(obj, h5py.Dataset):
+            info = LayerInfo.from_dataset(obj)
+            names = {
+                self.paths.bag_elevation: "elevation",
+                self.paths.bag_uncertainty: "uncertainty",
+                self.paths.bag_tracking_list: "tracking list",
+            }
+            self._str += "  <%s shape=%s, dtype=%s, chunks=%s, compression=%s>\n" \
+                % (names.get(grp, grp), info.shape, info.dtype, info.chunks, info.compression)
         else:
             self._str += "  <%s>\n" % grp
 
-        if grp != self.paths.bag_metadata:
-            for atr in self[grp].attrs:
-                atr_val = self[grp].attrs[atr]
-                self._str += "    <%s: %s (%s, %s)>\n" % (atr, atr_val, atr_val.shape, atr_val.dtype)
+        for atr in obj.attrs:
+            atr_val = obj.attrs[atr]
+            self._str += "    <%s: %s (%s, %s)>\n" % (atr, atr_val, atr_val.shape, atr_val.dtype)
 
     def __str__(self) -> str:
         self._str = super(BAGFile, self).__str__()
-        self.visit(self._str_group_info)
+        self.visititems(self._str_group_info)
         if self._str is None:
             return "[EMPTY]"
         return self._str
@@ -25,6 +25,7 @@ class BAGPaths:
     bag_uncertainty_max_value_tag = "Maximum Uncertainty Value"
     
     bag_elevation_solution = "BAG_root/elevation_solution"
+    bag_density_field = "num_soundings"
 
     bag_tracking_list = "BAG_root/tracking_list"
     bag_tracking_list_len_tag = "Tracking List Length"
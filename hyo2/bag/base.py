@@ -18,18 +18,15 @@ class File(h5py.File):
     def is_bag(cls, file_name: str) -> bool:
         """ Determine if a file is valid BAG (False if it doesn't exist). """
 
-        # we first check if the file is a valid hdf5 (it also checks if the file exists)
-        if not h5py.is_hdf5(file_name):
-            logger.info("The passed file is not a valid hdf")
-            return False
-
-        fid = h5py.File(file_name, 'r')
-
+        # a single open checks that the file exists and it is a valid hdf5
         try:
-            fid[BAGPaths().bag_root]
+            with h5py.File(file_name, 'r') as fid:
+                if BAGPaths().bag_root not in fid:
+                    logger.info("The passed file does not have a BAG root")
+                    return False
 
-        except KeyError:
-            logger.info("The passed file does not have a BAG root")
+        except OSError:
+            logger.info("The passed file is not a valid hdf")
             return False
 
         return True
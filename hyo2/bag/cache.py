@@ -0,0 +1,142 @@
+import logging
+import os
+import pickle
+import time
+from contextlib import closing
+from hashlib import blake2b
+from typing import TYPE_CHECKING, Any
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag import __version__
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """ Persistent cache of the results computed on BAG files, stored in a local SQLite database.
+
+    The results are keyed on the file identity (path, size, modification time, and a hash of the
+    head and tail of the file), so any change to a file invalidates its results. The least recently
+    used results are evicted once the total size of the stored results exceeds the size cap.
+    """
+
+    hash_block_size = 64 * 1024
+
+    def __init__(self, path: str | None = None, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+        path
+            The path of the SQLite database (if None, the default path in the user home folder)
+        max_bytes
+            The cap on the total size of the stored results
+        """
+        if path is None:
+            path = self.default_path()
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+
+        # sqlite3 is only imported when a cache is used
+        import sqlite3
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                             "path TEXT NOT NULL, identity TEXT NOT NULL, name TEXT NOT NULL, value BLOB NOT NULL, "
+                             "size INTEGER NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (path, name))")
+                conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        except (OSError, sqlite3.Error) as e:
+            raise BAGError("Unable to open the result cache %s: %s" % (self.path, e))
+
+    @classmethod
+    def default_path(cls) -> str:
+        return os.path.join(os.path.expanduser("~"), ".hyo2", "bag", "results.sqlite")
+
+    def _connect(self) -> "sqlite3.Connection":
+        import sqlite3
+
+        return sqlite3.connect(self.path, timeout=10.0)
+
+    @classmethod
+    def file_identity(cls, file_path: str) -> str:
+        """ Return a cheap identity of the file content: size, modification time, and a hash of its head and tail """
+        try:
+            st = os.stat(file_path)
+            digest = blake2b(digest_size=16)
+            with open(file_path, "rb") as fod:
+                digest.update(fod.read(cls.hash_block_size))
+                if st.st_size > cls.hash_block_size:
+                    fod.seek(max(cls.hash_block_size, st.st_size - cls.hash_block_size))
+                    digest.update(fod.read(cls.hash_block_size))
+        except OSError as e:
+            raise BAGError("Unable to identify the file %s: %s" % (file_path, e))
+
+        # the library version is part of the identity, so that results from older releases are not reused
+        return "%s:%d:%d:%s" % (__version__, st.st_size, st.st_mtime_ns, digest.hexdigest())
+
+    def get(self, file_path: str, identity: str, name: str) -> Any | None:
+        """ Return the named result for the file with the passed identity, or None if not cached """
+        file_path = os.path.abspath(file_path)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT value FROM results WHERE path = ? AND identity = ? AND name = ?",
+                               (file_path, identity, name)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE results SET accessed = ? WHERE path = ? AND name = ?",
+                         (time.time(), file_path, name))
+
+        return pickle.loads(row[0])
+
+    def put(self, file_path: str, identity: str, name: str, value: Any) -> None:
+        """ Store the named result for the file with the passed identity """
+        file_path = os.path.abspath(file_path)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            logger.debug("skipping result larger than the cache: %s (%d bytes)" % (name, len(blob)))
+            return
+
+        with closing(self._connect()) as conn, conn:
+            # the results for a previous version of the same file are stale
+            conn.execute("DELETE FROM results WHERE path = ? AND identity <> ?", (file_path, identity))
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                         (file_path, identity, name, blob, len(blob), time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn: "sqlite3.Connection") -> None:
+        """ Remove the least recently used results exceeding the size cap """
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = list()
+        for path, name, size in conn.execute("SELECT path, name, size FROM results ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((path, name))
+            total -= size
+        conn.executemany("DELETE FROM results WHERE path = ? AND name = ?", evicted)
+        logger.debug("evicted %d results" % len(evicted))
+
+    def invalidate(self, file_path: str | None = None) -> None:
+        """ Remove the results for the passed file (or all of them, if None) """
+        with closing(self._connect()) as conn, conn:
+            if file_path is None:
+                conn.execute("DELETE FROM results")
+            else:
+                conn.execute("DELETE FROM results WHERE path = ?", (os.path.abspath(file_path),))
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def size(self) -> int:
+        """ Return the total size of the stored results """
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def __str__(self) -> str:
+        return "<ResultCache path=%s, results=%d, size=%d/%d>" % (self.path, len(self), self.size(), self.max_bytes)
@@ -0,0 +1,177 @@
+import logging
+from collections import OrderedDict
+from math import ceil
+from typing import Iterator
+
+import h5py
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkCache:
+    """ Raw data chunk cache of a chunked layer: the HDF5 settings and the statistics of the chunk accesses.
+
+    The cache is sized to hold the chunks that are read again by the access pattern:
+    - "rows": a band of chunk rows (e.g., row by row loops over a row-chunked layer)
+    - "columns": a band of chunk columns
+    - "chunks": a single chunk (chunk-aligned or sequential access)
+
+    HDF5 does not expose the hits of the raw data chunk cache, so they are estimated by replaying the
+    chunk accesses on an LRU cache of the same size.
+    """
+
+    access_patterns = ("rows", "columns", "chunks")
+
+    # the HDF5 1.x defaults
+    default_nbytes = 1024 * 1024
+    default_nslots = 521
+    default_w0 = 0.75
+
+    max_nbytes = 256 * 1024 * 1024
+
+    def __init__(self, shape: tuple[int, ...], chunks: tuple[int, ...], itemsize: int,
+                 nbytes: int | None = None, nslots: int | None = None, w0: float | None = None) -> None:
+        """
+        shape, chunks, itemsize
+            The shape, the chunk shape, and the item size of the dataset
+        nbytes, nslots, w0
+            The HDF5 chunk cache settings. If None, the HDF5 defaults.
+        """
+        self.shape = shape
+        self.chunks = chunks
+        self.chunk_nbytes = itemsize
+        for dim in chunks:
+            self.chunk_nbytes *= dim
+        self.nbytes = nbytes if nbytes is not None else self.default_nbytes
+        self.nslots = nslots if nslots is not None else self.default_nslots
+        self.w0 = w0 if w0 is not None else self.default_w0
+
+        self._lru = OrderedDict()
+        self.nr_of_reads = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_dataset(cls, ds: h5py.Dataset, access: str = "rows", min_nbytes: int | None = None,
+                    max_nbytes: int | None = None) -> "ChunkCache":
+        """ Return a chunk cache sized on the chunk shape of the passed dataset and on the access pattern
+
+        min_nbytes, max_nbytes
+            The bounds of the cache size. If None, the HDF5 default size and the class maximum.
+        """
+        if ds.chunks is None:
+            raise BAGError("The dataset %s is not chunked" % ds.name)
+        if access not in cls.access_patterns:
+            raise BAGError("Unknown access pattern: %s" % access)
+        if min_nbytes is None:
+            min_nbytes = cls.default_nbytes
+        if max_nbytes is None:
+            max_nbytes = cls.max_nbytes
+
+        grid = [ceil(size / chunk) for size, chunk in zip(ds.shape, ds.chunks)]
+        if access == "rows":
+            nr_of_chunks = 1
+            for dim in grid[1:]:
+                nr_of_chunks *= dim
+        elif access == "columns":
+            nr_of_chunks = grid[0]
+        else:
+            nr_of_chunks = 1
+
+        cache = cls(shape=ds.shape, chunks=ds.chunks, itemsize=ds.dtype.itemsize)
+        # chunks larger than the cache are never cached, so at least one chunk must fit
+        cache.nbytes = max(min_nbytes, cache.chunk_nbytes,
+                           min(max_nbytes, max(1, nr_of_chunks) * cache.chunk_nbytes))
+        # HDF5 suggests a prime number of slots, about 10-100 times the number of chunks that fit in the cache
+        cache.nslots = cls._next_prime(max(cls.default_nslots, 10 * (cache.nbytes // cache.chunk_nbytes)))
+        return cache
+
+    @classmethod
+    def _next_prime(cls, value: int) -> int:
+        def is_prime(n: int) -> bool:
+            if n < 4:
+                return n > 1
+            if n % 2 == 0:
+                return False
+            i = 3
+            while i * i <= n:
+                if n % i == 0:
+                    return False
+                i += 2
+            return True
+
+        while not is_prime(value):
+            value += 1
+        return value
+
+    def dapl(self) -> h5py.h5p.PropDAID:
+        """ Return a dataset access property list with the cache settings """
+        dapl = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+        dapl.set_chunk_cache(self.nslots, self.nbytes, self.w0)
+        return dapl
+
+    @property
+    def capacity(self) -> int:
+        """ The number of chunks that fit in the cache """
+        if self.chunk_nbytes > self.nbytes:
+            return 0
+        return self.nbytes // self.chunk_nbytes
+
+    def record(self, sel: tuple[slice, ...]) -> None:
+        """ Record the chunks accessed by the read of the passed selection """
+        self.nr_of_reads += 1
+        ranges = list()
+        for rng, size, chunk in zip(sel, self.shape, self.chunks):
+            start, stop, _ = rng.indices(size)
+            if stop <= start:
+                return
+            ranges.append(range(start // chunk, (stop - 1) // chunk + 1))
+
+        capacity = self.capacity
+        for idx in self._chunk_indices(ranges):
+            if idx in self._lru:
+                self.hits += 1
+                self._lru.move_to_end(idx)
+                continue
+            self.misses += 1
+            if capacity > 0:
+                self._lru[idx] = None
+                if len(self._lru) > capacity:
+                    self._lru.popitem(last=False)
+
+    @classmethod
+    def _chunk_indices(cls, ranges: list[range]) -> Iterator[tuple[int, ...]]:
+        if len(ranges) == 1:
+            for i in ranges[0]:
+                yield i,
+            return
+        for i in ranges[0]:
+            for idx in cls._chunk_indices(ranges[1:]):
+                yield (i,) + idx
+
+    @property
+    def hit_rate(self) -> float:
+        accesses = self.hits + self.misses
+        if accesses == 0:
+            return 0.0
+        return self.hits / accesses
+
+    def stats(self) -> dict:
+        return {
+            "nbytes": self.nbytes,
+            "nslots": self.nslots,
+            "w0": self.w0,
+            "chunk_nbytes": self.chunk_nbytes,
+            "nr_of_reads": self.nr_of_reads,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def __str__(self) -> str:
+        return "<ChunkCache nbytes=%d, nslots=%d, w0=%.2f, chunk=%d bytes, reads=%d, hits=%d, misses=%d (%.1f%%)>" \
+            % (self.nbytes, self.nslots, self.w0, self.chunk_nbytes, self.nr_of_reads, self.hits, self.misses,
+               100.0 * self.hit_rate)
@@ -0,0 +1,139 @@
+import logging
+import os
+import zlib
+
+import h5py
+from numpy import concatenate, empty, frombuffer, uint8
+from numpy.typing import NDArray
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkReader:
+    """ Parallel reader of a window of a chunked 2D dataset.
+
+    The raw chunks are read with read_direct_chunk (serialized by the HDF5 library), while their decoding
+    (deflate, shuffle) and the copy into the output array run in a thread pool: zlib and numpy release the GIL,
+    so the decompression of a large layer uses several cores.
+    Datasets that are not chunked or that use other filters are read with h5py.
+    """
+
+    supported_filters = (h5py.h5z.FILTER_DEFLATE, h5py.h5z.FILTER_SHUFFLE)
+
+    def __init__(self, ds: h5py.Dataset, workers: int | None = None) -> None:
+        """
+        ds
+            The 2D dataset to read
+        workers
+            The number of threads used to decode the chunks. If None, the number of CPUs.
+        """
+        self.ds = ds
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.filters = self._filter_pipeline()
+
+    def _filter_pipeline(self) -> tuple[int, ...] | None:
+        """ Return the filter codes in pipeline order, or None if the dataset cannot be read by chunks """
+        if (self.ds.chunks is None) or (self.ds.ndim != 2):
+            return None
+        if self.ds.id.get_type().get_size() != self.ds.dtype.itemsize:
+            return None
+
+        dcpl = self.ds.id.get_create_plist()
+        filters = tuple(dcpl.get_filter(i)[0] for i in range(dcpl.get_nfilters()))
+        if any(code not in self.supported_filters for code in filters):
+            return None
+        return filters
+
+    @property
+    def supported(self) -> bool:
+        return self.filters is not None
+
+    def read(self, sel: tuple[slice, slice], field: str | None = None, out: NDArray | None = None) -> NDArray:
+        """ Read the passed window, optionally of a single field of a compound dataset
+
+        out
+            If present, the array to read into (with the same shape of the window)
+        """
+        rows = range(*sel[0].indices(self.ds.shape[0]))
+        cols = range(*sel[1].indices(self.ds.shape[1]))
+
+        dt = self.ds.dtype if field is None else self.ds.dtype[field]
+        if out is None:
+            out = empty((len(rows), len(cols)), dtype=dt)
+        elif out.shape != (len(rows), len(cols)):
+            raise BAGError("Invalid output shape %s for a %s window" % (out.shape, (len(rows), len(cols))))
+
+        if out.size == 0:
+            return out
+        # strided windows are left to h5py
+        if (not self.supported) or (rows.step != 1) or (cols.step != 1):
+            out[...] = self.ds[sel] if field is None else self.ds.fields(field)[sel]
+            return out
+
+        chunk_rows, chunk_cols = self.ds.chunks
+        offsets = [(r, c)
+                   for r in range(rows.start - rows.start % chunk_rows, rows.stop, chunk_rows)
+                   for c in range(cols.start - cols.start % chunk_cols, cols.stop, chunk_cols)]
+
+        def read_chunk(offset: tuple[int, int]) -> None:
+            chunk = self._read_chunk(offset)
+            if field is not None:
+                chunk = chunk[field]
+            r0, c0 = max(offset[0], rows.start), max(offset[1], cols.start)
+            r1, c1 = min(offset[0] + chunk_rows, rows.stop), min(offset[1] + chunk_cols, cols.stop)
+            out[r0 - rows.start:r1 - rows.start, c0 - cols.start:c1 - cols.start] = \
+                chunk[r0 - offset[0]:r1 - offset[0], c0 - offset[1]:c1 - offset[1]]
+
+        if (self.workers < 2) or (len(offsets) < 2):
+            for offset in offsets:
+                read_chunk(offset)
+        else:
+            # the thread pool is only imported when a parallel read is requested
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # consume the results to propagate the exceptions
+                for _ in executor.map(read_chunk, offsets):
+                    pass
+
+        return out
+
+    def _read_chunk(self, offset: tuple[int, int]) -> NDArray:
+        """ Read and decode the chunk at the passed offset (filled with the fill value, if not allocated) """
+        try:
+            filter_mask, raw = self.ds.id.read_direct_chunk(offset)
+        except RuntimeError:
+            if self.ds.id.get_chunk_info_by_coord(offset).byte_offset is not None:
+                raise
+            chunk = empty(self.ds.chunks, dtype=self.ds.dtype)
+            chunk[...] = self.ds.fillvalue
+            return chunk
+
+        # the filters are undone in reverse order, skipping those flagged in the mask
+        itemsize = self.ds.dtype.itemsize
+        for i in reversed(range(len(self.filters))):
+            if filter_mask & (1 << i):
+                continue
+            if self.filters[i] == h5py.h5z.FILTER_DEFLATE:
+                raw = zlib.decompress(raw)
+            elif (self.filters[i] == h5py.h5z.FILTER_SHUFFLE) and (itemsize > 1):
+                raw = self._unshuffle(raw, itemsize=itemsize)
+
+        return frombuffer(raw, dtype=self.ds.dtype).reshape(self.ds.chunks)
+
+    @classmethod
+    def _unshuffle(cls, raw: bytes | NDArray, itemsize: int) -> NDArray:
+        """ Undo the HDF5 shuffle filter, which stores the k-th byte of all the items as the k-th plane """
+        planes = frombuffer(raw, dtype=uint8)
+        nr_of_items = planes.size // itemsize
+        # copying one plane at a time is much faster than a transpose of the whole buffer
+        items = empty((nr_of_items, itemsize), dtype=uint8)
+        for k in range(itemsize):
+            items[:, k] = planes[k * nr_of_items:(k + 1) * nr_of_items]
+        if planes.size == items.size:
+            return items.reshape(-1)
+        # the bytes not filling a whole item are left unshuffled at the end
+        return concatenate((items.reshape(-1), planes[nr_of_items * itemsize:]))
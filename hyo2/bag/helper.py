@@ -1,13 +1,33 @@
 import logging
 import os
+from typing import TYPE_CHECKING
 
 # noinspection PyUnresolvedReferences
 from hyo2.bag.bag_error import BAGError
 
+if TYPE_CHECKING:
+    from osgeo import osr
+
 logger = logging.getLogger(__name__)
 
 
 class Helper:
+
+    _gdal_error_handler_pushed = False
+
+    @classmethod
+    def import_osr(cls) -> "osr":
+        """ Import and return the GDAL osr module, pushing the GDAL error handler at the first import """
+        from osgeo import osr
+
+        if not cls._gdal_error_handler_pushed:
+            # noinspection PyUnresolvedReferences
+            from hyo2.abc2.lib.gdal_aux import GdalAux
+
+            GdalAux.push_gdal_error_handler()
+            cls._gdal_error_handler_pushed = True
+        return osr
+
     @classmethod
     def samples_folder(cls) -> str:
         samples_dir = os.path.abspath(os.path.join(str(os.path.dirname(__file__)), "samples"))
@@ -0,0 +1,59 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+import h5py
+from numpy import dtype, prod
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BAGProbe:
+    """ Summary of a file, as returned by BAGFile.probe() """
+
+    path: str
+    is_bag: bool
+    version: str | None = None
+    is_vr: bool = False
+    layers: tuple[str, ...] = tuple()
+    error: str | None = None
+
+    def __str__(self) -> str:
+        if not self.is_bag:
+            return "<BAGProbe path=%s, not a BAG: %s>" % (self.path, self.error)
+        return "<BAGProbe path=%s, version=%s, %s, layers=%s>" \
+            % (self.path, self.version, "VR" if self.is_vr else "SR", ", ".join(self.layers))
+
+
+@dataclass(frozen=True)
+class LayerInfo:
+    """ Description of a BAG dataset, built from the HDF5 object metadata only (no grid data is read) """
+
+    name: str
+    path: str
+    shape: tuple[int, ...]
+    dtype: str
+    chunks: tuple[int, ...] | None = None
+    compression: str | None = None
+    compression_opts: Any = None
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dataset(cls, ds: h5py.Dataset) -> "LayerInfo":
+        return cls(name=ds.name.split('/')[-1], path=ds.name.lstrip('/'), shape=tuple(ds.shape),
+                   dtype=ds.dtype.str, chunks=ds.chunks, compression=ds.compression,
+                   compression_opts=ds.compression_opts, attrs={k: v for k, v in ds.attrs.items()})
+
+    @property
+    def size(self) -> int:
+        return int(prod(self.shape, dtype=int))
+
+    @property
+    def nbytes(self) -> int:
+        """ Uncompressed size of the dataset """
+        return self.size * dtype(self.dtype).itemsize
+
+    def __str__(self) -> str:
+        return "<%s shape=%s, dtype=%s, chunks=%s, compression=%s>" \
+            % (self.name, self.shape, self.dtype, self.chunks, self.compression)
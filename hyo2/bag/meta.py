@@ -1,18 +1,35 @@
 import logging
 from datetime import datetime
+from typing import Callable
 
-import dateutil.parser
 from lxml import etree
-from osgeo import osr
 
-# noinspection PyUnresolvedReferences
-from hyo2.abc2.lib.gdal_aux import GdalAux
 # noinspection PyUnresolvedReferences
 from hyo2.bag.helper import Helper
 
 logger = logging.getLogger(__name__)
 
 
+def _xpaths(namespaces: dict[str, str], *paths: str) -> tuple[etree.XPath, ...]:
+    """ Compile the passed paths, to be evaluated in order until one of them returns some nodes """
+    # noinspection PyUnresolvedReferences
+    return tuple(etree.XPath(path, namespaces=namespaces) for path in paths)
+
+
+def _parse_date(text_date: str) -> datetime:
+    """ Parse a date string (dateutil is only imported when a date is actually read) """
+    import dateutil.parser
+    return dateutil.parser.parse(text_date)
+
+
+def _epsg_to_wkt(epsg_code: int) -> str:
+    """ Return the WKT of the passed EPSG code (GDAL is only imported when a CRS is actually resolved) """
+    osr = Helper.import_osr()
+    sr = osr.SpatialReference()
+    sr.ImportFromEPSG(epsg_code)
+    return sr.ExportToWkt()
+
+
 class Meta:
     """ Helper class to manage BAG XML metadata. """
 
@@ -33,207 +50,319 @@ class Meta:
         'smXML': 'http://metadata.dgiwg.org/smXML',
     }
 
-    def __init__(self, meta_xml: bytes | str) -> None:
-        GdalAux.push_gdal_error_handler()
+    # Precompiled queries. As the descendant paths ('//*/...') return the nodes in document order, the first
+    # node is the same for any layout of the metadata. The ISO queries are followed by the smXML ones for
+    # the old BAG metadata format.
+    _xp_dimension_size = \
+        _xpaths(ns, '//*/gmd:spatialRepresentationInfo/gmd:MD_Georectified/gmd:axisDimensionProperties/'
+                    'gmd:MD_Dimension/gmd:dimensionSize/gco:Integer') + \
+        _xpaths(ns2, '//*/spatialRepresentationInfo/smXML:MD_Georectified/axisDimensionProperties/'
+                     'smXML:MD_Dimension/dimensionSize')
+    _xp_resolution = \
+        _xpaths(ns, '//*/gmd:spatialRepresentationInfo/gmd:MD_Georectified/gmd:axisDimensionProperties/'
+                    'gmd:MD_Dimension/gmd:resolution/gco:Measure') + \
+        _xpaths(ns2, '//*/spatialRepresentationInfo/smXML:MD_Georectified/axisDimensionProperties/'
+                     'smXML:MD_Dimension/resolution/smXML:Measure/smXML:value')
+    _xp_corner_points = \
+        _xpaths(ns, '//*/gmd:spatialRepresentationInfo/gmd:MD_Georectified/gmd:cornerPoints/'
+                    'gml:Point/gml:coordinates') + \
+        _xpaths(ns2, '//*/spatialRepresentationInfo/smXML:MD_Georectified/cornerPoints/gml:Point/gml:coordinates')
+    _xp_rs_code = \
+        _xpaths(ns, '//*/gmd:referenceSystemInfo/gmd:MD_ReferenceSystem/gmd:referenceSystemIdentifier/'
+                    'gmd:RS_Identifier/gmd:code/gco:CharacterString')
+    _xp_rs_code_space = \
+        _xpaths(ns, '//*/gmd:referenceSystemInfo/gmd:MD_ReferenceSystem/gmd:referenceSystemIdentifier/'
+                    'gmd:RS_Identifier/gmd:codeSpace/gco:CharacterString')
+    _xp_rs_crs = \
+        _xpaths(ns2, '//*/referenceSystemInfo/smXML:MD_CRS')
+    _xp_west = \
+        _xpaths(ns, '//*/gmd:EX_GeographicBoundingBox/gmd:westBoundLongitude/gco:Decimal') + \
+        _xpaths(ns2, '//*/smXML:EX_GeographicBoundingBox/westBoundLongitude')
+    _xp_east = \
+        _xpaths(ns, '//*/gmd:EX_GeographicBoundingBox/gmd:eastBoundLongitude/gco:Decimal') + \
+        _xpaths(ns2, '//*/smXML:EX_GeographicBoundingBox/eastBoundLongitude')
+    _xp_south = \
+        _xpaths(ns, '//*/gmd:EX_GeographicBoundingBox/gmd:southBoundLatitude/gco:Decimal') + \
+        _xpaths(ns2, '//*/smXML:EX_GeographicBoundingBox/southBoundLatitude')
+    _xp_north = \
+        _xpaths(ns, '//*/gmd:EX_GeographicBoundingBox/gmd:northBoundLatitude/gco:Decimal') + \
+        _xpaths(ns2, '//*/smXML:EX_GeographicBoundingBox/northBoundLatitude')
+    _xp_abstract = \
+        _xpaths(ns, '//*/gmd:abstract/gco:CharacterString') + \
+        _xpaths(ns2, '//*/abstract')
+    _xp_date = \
+        _xpaths(ns, '//*/gmd:CI_Date/gmd:date/gco:Date') + \
+        _xpaths(ns2, '//*/smXML:CI_Date/date') + \
+        _xpaths(ns, '//*/gmd:dateStamp/gco:Date')
+    _xp_survey_start = \
+        _xpaths(ns, '//*/gmd:identificationInfo/bag:BAG_DataIdentification/gmd:extent/gmd:EX_Extent/'
+                    'gmd:temporalElement/gmd:EX_TemporalExtent/gmd:extent/gml:TimePeriod/gml:beginPosition') + \
+        _xpaths(ns2, '//*/identificationInfo/smXML:BAG_DataIdentification/extent/smXML:EX_Extent/'
+                     'temporalElement/smXML:EX_TemporalExtent/extent/TimePeriod/beginPosition')
+    _xp_survey_end = \
+        _xpaths(ns, '//*/gmd:identificationInfo/bag:BAG_DataIdentification/gmd:extent/gmd:EX_Extent/'
+                    'gmd:temporalElement/gmd:EX_TemporalExtent/gmd:extent/gml:TimePeriod/gml:endPosition') + \
+        _xpaths(ns2, '//*/identificationInfo/smXML:BAG_DataIdentification/extent/smXML:EX_Extent/'
+                     'temporalElement/smXML:EX_TemporalExtent/extent/TimePeriod/endPosition')
+    _xp_unc_type = \
+        _xpaths(ns, '//*/bag:verticalUncertaintyType/bag:BAG_VertUncertCode/@codeListValue')
+    _xp_unc_type_legacy = \
+        _xpaths(ns2, '//*/verticalUncertaintyType')
+    _xp_sec_constr = \
+        _xpaths(ns, '//*/gmd:MD_SecurityConstraints/gmd:classification/gmd:MD_ClassificationCode/@codeListValue')
+    _xp_sec_constr_legacy = \
+        _xpaths(ns2, '//*/smXML:MD_SecurityConstraints/classification')
+
+    def __init__(self, meta_xml: bytes | str | etree.ElementBase) -> None:
+        """
+        meta_xml
+            The XML metadata, or the already parsed tree (shared, and never modified)
+        """
+        if isinstance(meta_xml, (bytes, str)):
+            # noinspection PyUnresolvedReferences
+            self.xml_tree = etree.fromstring(meta_xml)
+        else:
+            self.xml_tree = meta_xml
+        self._rs_codes: tuple[list, list] | None = None
 
-        # noinspection PyUnresolvedReferences
-        self.xml_tree = etree.fromstring(meta_xml)
+        # the fields are parsed on first access, and each reader is run only once
+        self._populated: set[str] = set()
 
         # rows and cols
         self._rows: int | None = None
         self._cols: int | None = None
-        self._read_rows_and_cols()
 
         # resolution along x and y axes
         self._res_x: float | None = None
         self._res_y: float | None = None
-        self._read_res_x_and_y()
 
         # corner SW and NE
         self._sw: list[float] | None = None
         self._ne: list[float] | None = None
-        self._read_corners_sw_and_ne()
 
         # wkt projection
         self._wkt_srs: str | None = None
         self._xml_srs: str | None = None
         self._wkt_srs_epsg_code: int | None = None
-        self._read_wkt_prj()
 
         # wkt vertical datum
         self._wkt_vertical_datum: str | None = None
         self._xml_vertical_datum: str | None = None
         self._wkt_vertical_datum_epsg_code: int | None = None
-        self._read_wkt_vertical_datum()
 
         # bbox
         self._lon_min: float | None = None
         self._lon_max: float | None = None
         self._lat_min: float | None = None
         self._lat_max: float | None = None
-        self._read_bbox()
 
         # abstract
         self._abstract: str | None = None
-        self._read_abstract()
 
         # date
         self._date: datetime | str | None = None
-        self._read_date()
 
         # survey dates
         self._survey_start_date: datetime | str | None = None
-        self._read_survey_start_date()
         self._survey_end_date: datetime | str | None = None
-        self._read_survey_end_date()
 
         # uncertainty type
         self._unc_type: str | None = None
-        self._read_uncertainty_type()
 
         # security constraints
         self._sec_constr: str | None = None
-        self._read_security_constraints()
+
+    def __getstate__(self) -> dict:
+        """ The XML tree is serialized, and only the fields already parsed are pickled (the others stay lazy) """
+        state = self.__dict__.copy()
+        state["xml_tree"] = etree.tostring(self.xml_tree)
+        state["_rs_codes"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        # noinspection PyUnresolvedReferences
+        self.xml_tree = etree.fromstring(state["xml_tree"])
+
+    def _populate(self, reader: Callable[[], None]) -> None:
+        """ Run the passed field reader, unless already run """
+        if reader.__name__ in self._populated:
+            return
+        self._populated.add(reader.__name__)
+        reader()
+
+    def populate_all(self) -> None:
+        """ Parse all the fields """
+        for reader in (self._read_rows_and_cols, self._read_res_x_and_y, self._read_corners_sw_and_ne,
+                       self._read_wkt_prj, self._read_wkt_vertical_datum, self._read_bbox, self._read_abstract,
+                       self._read_date, self._read_survey_start_date, self._read_survey_end_date,
+                       self._read_uncertainty_type, self._read_security_constraints):
+            self._populate(reader)
 
     @property
     def rows(self) -> int:
+        self._populate(self._read_rows_and_cols)
         if self._rows is None:
             raise RuntimeError("Unpopulated _rows")
         return self._rows
 
     @property
     def cols(self) -> int:
+        self._populate(self._read_rows_and_cols)
         if self._cols is None:
             raise RuntimeError("Unpopulated _cols")
         return self._cols
 
     @property
     def res_x(self) -> float:
+        self._populate(self._read_res_x_and_y)
         if self._res_x is None:
             raise RuntimeError("Unpopulated _res_x")
         return self._res_x
 
     @property
     def res_y(self) -> float:
+        self._populate(self._read_res_x_and_y)
         if self._res_y is None:
             raise RuntimeError("Unpopulated _res_y")
         return self._res_y
 
     @property
     def sw(self) -> list[float]:
+        self._populate(self._read_corners_sw_and_ne)
         if self._sw is None:
             raise RuntimeError("Unpopulated _sw")
         return self._sw
 
     @property
     def ne(self) -> list[float]:
+        self._populate(self._read_corners_sw_and_ne)
         if self._ne is None:
             raise RuntimeError("Unpopulated _ne")
         return self._ne
 
     @property
     def wkt_srs(self) -> str:
+        self._populate(self._read_wkt_prj)
         if self._wkt_srs is None:
             raise RuntimeError("Unpopulated _wrk_srs")
         return self._wkt_srs
 
     @property
     def xml_srs(self) -> str:
+        self._populate(self._read_wkt_prj)
         if self._xml_srs is None:
             raise RuntimeError("Unpopulated _xml_srs")
         return self._xml_srs
 
     def has_wkt_srs_epsg_code(self) -> bool:
+        self._populate(self._read_wkt_prj)
         return self._wkt_srs_epsg_code is not None
 
     @property
     def wkt_srs_epsg_code(self) -> int:
+        self._populate(self._read_wkt_prj)
         if self._wkt_srs_epsg_code is None:
             raise RuntimeError("Unpopulated _xml_srs_epsg_code")
         return self._wkt_srs_epsg_code
 
     @property
     def wkt_vertical_datum(self) -> str:
+        self._populate(self._read_wkt_vertical_datum)
         if self._wkt_vertical_datum is None:
             raise RuntimeError("Unpopulated _wkt_vertical_datum")
         return self._wkt_vertical_datum
 
     @property
     def xml_vertical_datum(self) -> str:
+        self._populate(self._read_wkt_vertical_datum)
         if self._xml_vertical_datum is None:
             raise RuntimeError("Unpopulated _xml_vertical_datum")
         return self._xml_vertical_datum
 
     def has_wkt_vertical_datum_epsg_code(self) -> bool:
+        self._populate(self._read_wkt_vertical_datum)
         return self._wkt_vertical_datum_epsg_code is not None
 
     @property
     def wkt_vertical_datum_epsg_code(self) -> int:
+        self._populate(self._read_wkt_vertical_datum)
         if self._wkt_vertical_datum_epsg_code is None:
             raise RuntimeError("Unpopulated _wkt_vertical_datum_epsg_code")
         return self._wkt_vertical_datum_epsg_code
 
     @property
     def lon_min(self) -> float:
+        self._populate(self._read_bbox)
         if self._lon_min is None:
             raise RuntimeError("Unpopulated _lon_min")
         return self._lon_min
 
     @property
     def lon_max(self) -> float:
+        self._populate(self._read_bbox)
         if self._lon_max is None:
             raise RuntimeError("Unpopulated _lon_max")
         return self._lon_max
 
     @property
     def lat_min(self) -> float:
+        self._populate(self._read_bbox)
         if self._lat_min is None:
             raise RuntimeError("Unpopulated _lat_min")
         return self._lat_min
 
     @property
     def lat_max(self) -> float:
+        self._populate(self._read_bbox)
         if self._lat_max is None:
             raise RuntimeError("Unpopulated _lat_max")
         return self._lat_max
 
     @property
     def abstract(self) -> str:
+        self._populate(self._read_abstract)
         if self._abstract is None:
             raise RuntimeError("Unpopulated _abstract")
         return self._abstract
 
     @property
     def date(self) -> datetime | str:
+        self._populate(self._read_date)
         if self._date is None:
             raise RuntimeError("Unpopulated _date")
         return self._date
 
     @property
     def survey_start_date(self) -> datetime | str:
+        self._populate(self._read_survey_start_date)
         if self._survey_start_date is None:
             raise RuntimeError("Unpopulated _survey_start_date")
         return self._survey_start_date
 
     @property
     def survey_end_date(self) -> datetime | str:
+        self._populate(self._read_survey_end_date)
         if self._survey_end_date is None:
             raise RuntimeError("Unpopulated _survey_end_date")
         return self._survey_end_date
 
     @property
     def unc_type(self) -> str:
+        self._populate(self._read_uncertainty_type)
         if self._unc_type is None:
             raise RuntimeError("Unpopulated _unc_type")
         return self._unc_type
 
     @property
     def sec_constr(self) -> str:
+        self._populate(self._read_security_constraints)
         if self._sec_constr is None:
             raise RuntimeError("Unpopulated _sec_constr")
         return self._sec_constr
 
     def __str__(self) -> str:
+        self.populate_all()
         output = "<metadata>"
 
         if (self._rows is not None) and (self._cols is not None):
@@ -281,29 +410,30 @@ class Meta:
             % (self.lon_min, self.lat_min, self.lon_min, self.lat_max, self.lon_max, self.lat_max, self.lon_max,
                self.lat_min, self.lon_min, self.lat_min)
 
+    def _query(self, xpaths: tuple[etree.XPath, ...]) -> list:
+        """ Evaluate the passed compiled queries in order, and return the first non-empty result """
+        for xpath in xpaths:
+            ret = xpath(self.xml_tree)
+            if len(ret) > 0:
+                return ret
+        return list()
+
+    def _reference_system(self) -> tuple[list, list]:
+        """ Return the (memoized) code and codeSpace nodes of the reference systems """
+        if self._rs_codes is None:
+            self._rs_codes = self._query(self._xp_rs_code), self._query(self._xp_rs_code_space)
+        return self._rs_codes
+
     def _read_rows_and_cols(self) -> None:
         """ attempts to read rows and cols info """
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath('//*/gmd:spatialRepresentationInfo/gmd:MD_Georectified/'
-                                      'gmd:axisDimensionProperties/gmd:MD_Dimension/gmd:dimensionSize/gco:Integer',
-                                      namespaces=self.ns)
+            ret = self._query(self._xp_dimension_size)
         except etree.Error as e:
             logger.warning("unable to read rows and cols: %s" % e)
             return
 
-        if len(ret) == 0:
-
-            # noinspection PyUnresolvedReferences
-            try:
-                ret = self.xml_tree.xpath('//*/spatialRepresentationInfo/smXML:MD_Georectified/'
-                                          'axisDimensionProperties/smXML:MD_Dimension/dimensionSize',
-                                          namespaces=self.ns2)
-            except etree.Error as e:
-                logger.warning("unable to read rows and cols: %s" % e)
-                return
-
         try:
             self._rows = int(ret[0].text)
             self._cols = int(ret[1].text)
@@ -317,25 +447,11 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath('//*/gmd:spatialRepresentationInfo/gmd:MD_Georectified/'
-                                      'gmd:axisDimensionProperties/gmd:MD_Dimension/gmd:resolution/gco:Measure',
-                                      namespaces=self.ns)
+            ret = self._query(self._xp_resolution)
         except etree.Error as e:
             logger.warning("unable to read res x and y: %s" % e)
             return
 
-        if len(ret) == 0:
-
-            # noinspection PyUnresolvedReferences
-            try:
-                ret = self.xml_tree.xpath('//*/spatialRepresentationInfo/smXML:MD_Georectified/'
-                                          'axisDimensionProperties/smXML:MD_Dimension/resolution/'
-                                          'smXML:Measure/smXML:value',
-                                          namespaces=self.ns2)
-            except etree.Error as e:
-                logger.warning("unable to read res x and y: %s" % e)
-                return
-
         try:
             self._res_x = float(ret[0].text)
             self._res_y = float(ret[1].text)
@@ -349,18 +465,10 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath('//*/gmd:spatialRepresentationInfo/gmd:MD_Georectified/'
-                                      'gmd:cornerPoints/gml:Point/gml:coordinates',
-                                      namespaces=self.ns)[0].text.split()
-        except (etree.Error, IndexError):
-            # noinspection PyUnresolvedReferences
-            try:
-                ret = self.xml_tree.xpath('//*/spatialRepresentationInfo/smXML:MD_Georectified/'
-                                          'cornerPoints/gml:Point/gml:coordinates',
-                                          namespaces=self.ns2)[0].text.split()
-            except (etree.Error, IndexError) as e:
-                logger.warning("unable to read corners SW and NE: %s" % e)
-                return
+            ret = self._query(self._xp_corner_points)[0].text.split()
+        except (etree.Error, IndexError) as e:
+            logger.warning("unable to read corners SW and NE: %s" % e)
+            return
 
         try:
             self._sw = [float(c) for c in ret[0].split(',')]
@@ -375,9 +483,7 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath('//*/gmd:referenceSystemInfo/gmd:MD_ReferenceSystem/'
-                                      'gmd:referenceSystemIdentifier/gmd:RS_Identifier/gmd:code/gco:CharacterString',
-                                      namespaces=self.ns)
+            ret, space = self._reference_system()
         except etree.Error as e:
             logger.warning("unable to read the WKT projection string: %s" % e)
             return
@@ -385,8 +491,7 @@ class Meta:
         if len(ret) == 0:
             # noinspection PyUnresolvedReferences
             try:
-                ret = self.xml_tree.xpath('//*/referenceSystemInfo/smXML:MD_CRS',
-                                          namespaces=self.ns2)
+                ret = self._query(self._xp_rs_crs)
             except etree.Error as e:
                 logger.warning("unable to read the WKT projection string: %s" % e)
                 return
@@ -399,17 +504,11 @@ class Meta:
                 return
 
         try:
-            space = self.xml_tree.xpath(
-                '//*/gmd:referenceSystemInfo/gmd:MD_ReferenceSystem/'
-                'gmd:referenceSystemIdentifier/gmd:RS_Identifier/gmd:codeSpace/gco:CharacterString',
-                namespaces=self.ns)
             # logger.info("codeSpace: %s" % space[0].text)
 
             if space[0].text == "EPSG":
                 self._wkt_srs_epsg_code = int(ret[0].text)
-                sr = osr.SpatialReference()
-                sr.ImportFromEPSG(self.wkt_srs_epsg_code)
-                self._wkt_srs = sr.ExportToWkt()
+                self._wkt_srs = _epsg_to_wkt(self.wkt_srs_epsg_code)
             else:
                 self._wkt_srs_epsg_code = None
                 self._wkt_srs = ret[0].text
@@ -423,9 +522,7 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath('//*/gmd:referenceSystemInfo/gmd:MD_ReferenceSystem/'
-                                      'gmd:referenceSystemIdentifier/gmd:RS_Identifier/gmd:code/gco:CharacterString',
-                                      namespaces=self.ns)
+            ret, space = self._reference_system()
         except etree.Error as e:
             logger.warning("unable to read the WKT vertical datum string: %s" % e)
             return
@@ -433,8 +530,7 @@ class Meta:
         if len(ret) == 0:
             # noinspection PyUnresolvedReferences
             try:
-                ret = self.xml_tree.xpath('//*/referenceSystemInfo/smXML:MD_CRS',
-                                          namespaces=self.ns2)
+                ret = self._query(self._xp_rs_crs)
             except etree.Error as e:
                 logger.warning("unable to read the WKT vertical datum string: %s" % e)
                 return
@@ -447,17 +543,11 @@ class Meta:
                 return
 
         try:
-            space = self.xml_tree.xpath(
-                '//*/gmd:referenceSystemInfo/gmd:MD_ReferenceSystem/'
-                'gmd:referenceSystemIdentifier/gmd:RS_Identifier/gmd:codeSpace/gco:CharacterString',
-                namespaces=self.ns)
             # logger.info("codeSpace: %s" % space[0].text)
 
             if space[1].text == "EPSG":
                 self._wkt_vertical_datum_epsg_code = int(ret[1].text)
-                sr = osr.SpatialReference()
-                sr.ImportFromEPSG(self.wkt_vertical_datum_epsg_code)
-                self._wkt_vertical_datum = sr.ExportToWkt()
+                self._wkt_vertical_datum = _epsg_to_wkt(self.wkt_vertical_datum_epsg_code)
             else:
                 self._wkt_vertical_datum_epsg_code = None
                 self._wkt_vertical_datum = ret[1].text
@@ -471,25 +561,12 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret_x_min = self.xml_tree.xpath('//*/gmd:EX_GeographicBoundingBox/gmd:westBoundLongitude/gco:Decimal',
-                                            namespaces=self.ns)
-            ret_x_max = self.xml_tree.xpath('//*/gmd:EX_GeographicBoundingBox/gmd:eastBoundLongitude/gco:Decimal',
-                                            namespaces=self.ns)
+            ret_x_min = self._query(self._xp_west)
+            ret_x_max = self._query(self._xp_east)
         except etree.Error as e:
             logger.warning("unable to read the bbox's longitude values: %s" % e)
             return
 
-        if len(ret_x_min) == 0:
-            # noinspection PyUnresolvedReferences
-            try:
-                ret_x_min = self.xml_tree.xpath('//*/smXML:EX_GeographicBoundingBox/westBoundLongitude',
-                                                namespaces=self.ns2)
-                ret_x_max = self.xml_tree.xpath('//*/smXML:EX_GeographicBoundingBox/eastBoundLongitude',
-                                                namespaces=self.ns2)
-            except etree.Error as e:
-                logger.warning("unable to read the bbox's longitude values: %s" % e)
-                return
-
         try:
             self._lon_min = float(ret_x_min[0].text)
             self._lon_max = float(ret_x_max[0].text)
@@ -499,26 +576,12 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret_y_min = self.xml_tree.xpath('//*/gmd:EX_GeographicBoundingBox/gmd:southBoundLatitude/gco:Decimal',
-                                            namespaces=self.ns)
-            ret_y_max = self.xml_tree.xpath('//*/gmd:EX_GeographicBoundingBox/gmd:northBoundLatitude/gco:Decimal',
-                                            namespaces=self.ns)
+            ret_y_min = self._query(self._xp_south)
+            ret_y_max = self._query(self._xp_north)
         except etree.Error as e:
             logger.warning("unable to read the bbox's latitude values: %s" % e)
             return
 
-        if len(ret_y_min) == 0:
-
-            # noinspection PyUnresolvedReferences
-            try:
-                ret_y_min = self.xml_tree.xpath('//*/smXML:EX_GeographicBoundingBox/southBoundLatitude',
-                                                namespaces=self.ns2)
-                ret_y_max = self.xml_tree.xpath('//*/smXML:EX_GeographicBoundingBox/northBoundLatitude',
-                                                namespaces=self.ns2)
-            except etree.Error as e:
-                logger.warning("unable to read the bbox's latitude values: %s" % e)
-                return
-
         try:
             self._lat_min = float(ret_y_min[0].text)
             self._lat_max = float(ret_y_max[0].text)
@@ -531,21 +594,11 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath('//*/gmd:abstract/gco:CharacterString',
-                                      namespaces=self.ns)
+            ret = self._query(self._xp_abstract)
         except etree.Error as e:
             logger.warning("unable to read the abstract string: %s" % e)
             return
 
-        if len(ret) == 0:
-            # noinspection PyUnresolvedReferences
-            try:
-                ret = self.xml_tree.xpath('//*/abstract',
-                                          namespaces=self.ns2)
-            except etree.Error as e:
-                logger.warning("unable to read the abstract string: %s" % e)
-                return
-
         try:
             self._abstract = ret[0].text
         except (ValueError, IndexError) as e:
@@ -555,16 +608,7 @@ class Meta:
     def _read_date(self) -> None:
         """ attempts to read the date string """
 
-        ret = self.xml_tree.xpath('//*/gmd:CI_Date/gmd:date/gco:Date',
-                                  namespaces=self.ns)
-
-        if len(ret) == 0:
-            ret = self.xml_tree.xpath('//*/smXML:CI_Date/date',
-                                      namespaces=self.ns2)
-
-        if len(ret) == 0:
-            ret = self.xml_tree.xpath('//*/gmd:dateStamp/gco:Date',
-                                      namespaces=self.ns)
+        ret = self._query(self._xp_date)
 
         if len(ret) == 0:
             logger.warning("unable to read the date string")
@@ -578,7 +622,7 @@ class Meta:
         tm_date = None
         # noinspection PyBroadException
         try:
-            parsed_date = dateutil.parser.parse(text_date)
+            parsed_date = _parse_date(text_date)
             tm_date = parsed_date.strftime('%Y-%m-%dT%H:%M:%SZ')
         except Exception as e:
             logger.warning("unable to handle the date string: %s (%s)" % (text_date, e), exc_info=True)
@@ -592,17 +636,7 @@ class Meta:
         """ attempts to read the survey date strings """
 
         try:
-            ret_begin = self.xml_tree.xpath(
-                '//*/gmd:identificationInfo/bag:BAG_DataIdentification/gmd:extent/gmd:EX_Extent/'
-                'gmd:temporalElement/gmd:EX_TemporalExtent/gmd:extent/gml:TimePeriod/gml:beginPosition',
-                namespaces=self.ns)
-
-            if len(ret_begin) == 0:
-                ret_begin = self.xml_tree.xpath(
-                    '//*/identificationInfo/smXML:BAG_DataIdentification/extent/smXML:EX_Extent/'
-                    'temporalElement/smXML:EX_TemporalExtent/extent/TimePeriod/beginPosition',
-                    namespaces=self.ns2)
-
+            ret_begin = self._query(self._xp_survey_start)
         except Exception as e:
             logger.warning(e, exc_info=True)
             return
@@ -620,7 +654,7 @@ class Meta:
         tm_begin_date = None
         # noinspection PyBroadException
         try:
-            parsed_date = dateutil.parser.parse(text_begin_date)
+            parsed_date = _parse_date(text_begin_date)
             tm_begin_date = parsed_date.strftime('%Y-%m-%dT%H:%M:%SZ')
         except Exception as e:
             logger.warning("unable to handle the survey begin date string: %s (%s)" % (text_begin_date, e),
@@ -637,16 +671,7 @@ class Meta:
         """ attempts to read the survey date strings """
 
         try:
-            ret_end = self.xml_tree.xpath(
-                '//*/gmd:identificationInfo/bag:BAG_DataIdentification/gmd:extent/gmd:EX_Extent/'
-                'gmd:temporalElement/gmd:EX_TemporalExtent/gmd:extent/gml:TimePeriod/gml:endPosition',
-                namespaces=self.ns)
-
-            if len(ret_end) == 0:
-                ret_end = self.xml_tree.xpath(
-                    '//*/identificationInfo/smXML:BAG_DataIdentification/extent/smXML:EX_Extent/'
-                    'temporalElement/smXML:EX_TemporalExtent/extent/TimePeriod/endPosition',
-                    namespaces=self.ns2)
+            ret_end = self._query(self._xp_survey_end)
         except Exception as e:
             logger.warning(e, exc_info=True)
             return
@@ -664,7 +689,7 @@ class Meta:
         tm_end_date = None
         # noinspection PyBroadException
         try:
-            parsed_date = dateutil.parser.parse(text_end_date)
+            parsed_date = _parse_date(text_end_date)
             tm_end_date = parsed_date.strftime('%Y-%m-%dT%H:%M:%SZ')
         except Exception as e:
             logger.warning("unable to handle the survey end date string: %s (%s)" % (text_end_date, e), exc_info=True)
@@ -682,8 +707,7 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath('//*/bag:verticalUncertaintyType/bag:BAG_VertUncertCode/@codeListValue',
-                                      namespaces=self.ns)
+            ret = self._query(self._xp_unc_type)
         except etree.Error as e:
             logger.warning("unable to read the uncertainty type string: %s" % e)
             return
@@ -692,8 +716,7 @@ class Meta:
 
             # noinspection PyUnresolvedReferences
             try:
-                ret = self.xml_tree.xpath('//*/verticalUncertaintyType',
-                                          namespaces=self.ns2)
+                ret = self._query(self._xp_unc_type_legacy)
                 old_format = True
             except etree.Error as e:
                 logger.warning("unable to read the uncertainty type string: %s" % e)
@@ -714,9 +737,7 @@ class Meta:
 
         # noinspection PyUnresolvedReferences
         try:
-            ret = self.xml_tree.xpath(
-                '//*/gmd:MD_SecurityConstraints/gmd:classification/gmd:MD_ClassificationCode/@codeListValue',
-                namespaces=self.ns)
+            ret = self._query(self._xp_sec_constr)
         except etree.Error as e:
             logger.warning("unable to read the uncertainty type string: %s" % e)
             return
@@ -725,8 +746,7 @@ class Meta:
 
             # noinspection PyUnresolvedReferences
             try:
-                ret = self.xml_tree.xpath('//*/smXML:MD_SecurityConstraints/classification',
-                                          namespaces=self.ns2)
+                ret = self._query(self._xp_sec_constr_legacy)
                 old_format = True
             except etree.Error as e:
                 logger.warning("unable to read the uncertainty type string: %s" % e)
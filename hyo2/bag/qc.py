@@ -0,0 +1,190 @@
+import logging
+from abc import ABC, abstractmethod
+
+from numpy import concatenate, empty, int64, float32, fmax, fmin, isfinite, lexsort, nan, nonzero
+# noinspection PyUnresolvedReferences
+from numpy.typing import NDArray
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.stats import Statistics
+
+logger = logging.getLogger(__name__)
+
+
+class QCCheck(ABC):
+    """ Base class for the checks run in a single pass over the SR grids by BAGFile.run_qc().
+
+    Each check declares the layers that it needs. The tiles passed to feed() are shared among
+    all the checks and their buffers are reused for the next tile, so they must not be modified
+    in place nor retained. The subclasses must implement feed() and result().
+    """
+
+    layers: tuple[str, ...] = tuple()
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """ Clear the accumulated results """
+        pass
+
+    @abstractmethod
+    def feed(self, row_range: slice, col_range: slice, tile: dict[str, NDArray]) -> None:
+        """ Accumulate the results for a tile of the grids
+
+        row_range, col_range
+            The window covered by the tile
+        tile
+            The NaN-masked arrays of the required layers, keyed by layer name
+        """
+
+    @abstractmethod
+    def result(self):
+        """ Return the accumulated results """
+
+    def __str__(self) -> str:
+        return "<%s layers=%s>" % (self.__class__.__name__, ", ".join(self.layers))
+
+
+class StatisticsCheck(QCCheck):
+    """ Streaming statistics of a layer (see hyo2.bag.stats.Statistics) """
+
+    def __init__(self, layer: str, bins: int = 0, hist_range: tuple[float, float] | None = None,
+                 sample_size: int = 100000) -> None:
+        self.layers = (layer,)
+        self.bins = bins
+        self.hist_range = hist_range
+        self.sample_size = sample_size
+        self.stats: Statistics | None = None
+        super().__init__()
+
+    def reset(self) -> None:
+        self.stats = Statistics(bins=self.bins, hist_range=self.hist_range, sample_size=self.sample_size)
+
+    def feed(self, row_range: slice, col_range: slice, tile: dict[str, NDArray]) -> None:
+        self.stats.update(tile[self.layers[0]])
+
+    def result(self) -> Statistics:
+        return self.stats
+
+
+class MinMaxCheck(QCCheck):
+    """ Min and max values of a layer, ignoring the NaN nodes (NaN if there are no valid nodes)
+
+    The values keep the type of the layer. The moments of the layer are left to StatisticsCheck.
+    """
+
+    def __init__(self, layer: str) -> None:
+        self.layers = (layer,)
+        self.min = nan
+        self.max = nan
+        super().__init__()
+
+    def reset(self) -> None:
+        self.min = nan
+        self.max = nan
+
+    def feed(self, row_range: slice, col_range: slice, tile: dict[str, NDArray]) -> None:
+        values = tile[self.layers[0]]
+        if values.size == 0:
+            return
+        # fmin/fmax ignore the NaN values, without the copy and the warnings of nanmin/nanmax
+        self.min = fmin(self.min, fmin.reduce(values, axis=None))
+        self.max = fmax(self.max, fmax.reduce(values, axis=None))
+
+    def result(self) -> tuple[float, float]:
+        return self.min, self.max
+
+
+class ElevationMinMax(MinMaxCheck):
+
+    def __init__(self) -> None:
+        super().__init__(layer="elevation")
+
+
+class UncertaintyMinMax(MinMaxCheck):
+
+    def __init__(self) -> None:
+        super().__init__(layer="uncertainty")
+
+
+class FlagCheck(QCCheck):
+    """ Base class for the checks that flag grid nodes.
+
+    The result is a tuple with the rows, the columns, and the flagged values. BAGFile.run_qc()
+    converts them to georeferenced flags. The subclasses must implement mask() and values().
+    """
+
+    def __init__(self) -> None:
+        self._rows: list[NDArray] = list()
+        self._cols: list[NDArray] = list()
+        self._values: list[NDArray] = list()
+        super().__init__()
+
+    def reset(self) -> None:
+        self._rows = list()
+        self._cols = list()
+        self._values = list()
+
+    @abstractmethod
+    def mask(self, tile: dict[str, NDArray]) -> NDArray:
+        """ Return the boolean mask of the flagged nodes in the tile """
+
+    @abstractmethod
+    def values(self, tile: dict[str, NDArray], ii: NDArray, jj: NDArray) -> NDArray:
+        """ Return the values of the flagged nodes in the tile """
+
+    def feed(self, row_range: slice, col_range: slice, tile: dict[str, NDArray]) -> None:
+        ii, jj = nonzero(self.mask(tile))
+        self._rows.append(ii + row_range.start)
+        self._cols.append(jj + col_range.start)
+        self._values.append(self.values(tile, ii, jj))
+
+    def result(self) -> tuple[NDArray, NDArray, NDArray]:
+        """ Return the flagged nodes in row-major order """
+        if len(self._rows) == 0:
+            return empty(0, dtype=int64), empty(0, dtype=int64), empty(0, dtype=float32)
+        rows = concatenate(self._rows)
+        cols = concatenate(self._cols)
+        order = lexsort((cols, rows))
+        return rows[order], cols[order], concatenate(self._values)[order]
+
+
+class UncertaintyGreaterThan(FlagCheck):
+    """ Flag the nodes with uncertainty greater than a threshold """
+
+    layers = ("uncertainty",)
+
+    def __init__(self, th: float) -> None:
+        self.th = th
+        super().__init__()
+
+    def mask(self, tile: dict[str, NDArray]) -> NDArray:
+        return tile["uncertainty"] > self.th
+
+    def values(self, tile: dict[str, NDArray], ii: NDArray, jj: NDArray) -> NDArray:
+        return tile["uncertainty"][ii, jj]
+
+
+class UncertaintyHasDepth(FlagCheck):
+    """ Flag the nodes with uncertainty but without depth """
+
+    layers = ("elevation", "uncertainty")
+
+    def mask(self, tile: dict[str, NDArray]) -> NDArray:
+        return isfinite(tile["uncertainty"]) & ~isfinite(tile["elevation"])
+
+    def values(self, tile: dict[str, NDArray], ii: NDArray, jj: NDArray) -> NDArray:
+        return tile["uncertainty"][ii, jj]
+
+
+class DepthHasUncertainty(FlagCheck):
+    """ Flag the nodes with depth but without uncertainty (the values are returned as depths) """
+
+    layers = ("elevation", "uncertainty")
+
+    def mask(self, tile: dict[str, NDArray]) -> NDArray:
+        return isfinite(tile["elevation"]) & ~isfinite(tile["uncertainty"])
+
+    def values(self, tile: dict[str, NDArray], ii: NDArray, jj: NDArray) -> NDArray:
+        return -tile["elevation"][ii, jj]
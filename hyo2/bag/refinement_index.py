@@ -0,0 +1,102 @@
+import logging
+
+from numpy import arange, asarray, concatenate, cumsum, flatnonzero, float64, full, int64, repeat, searchsorted, sort
+# noinspection PyUnresolvedReferences
+from numpy.typing import NDArray
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+
+logger = logging.getLogger(__name__)
+
+
+class RefinementIndex:
+    """ Flat lookup table to locate the VR refinements within their supergrids.
+
+    Only the supergrids with refinements are stored, in the same row-major order used to
+    pack the refinements in the varres_refinements dataset.
+    """
+
+    def __init__(self, varres_metadata: NDArray | dict[str, NDArray]) -> None:
+        """
+        varres_metadata
+            The 2D compound array stored in the varres_metadata dataset, or its fields as 2D arrays by name
+        """
+        shape = varres_metadata['dimensions_x'].shape
+        if len(shape) != 2:
+            raise BAGError("Invalid shape for varres metadata: %s" % (shape,))
+
+        self.shape = shape
+        dims_x = varres_metadata['dimensions_x'].ravel().astype(int64)
+        dims_y = varres_metadata['dimensions_y'].ravel().astype(int64)
+        sg_idx = flatnonzero(dims_x * dims_y > 0)
+
+        self.sg_rows = sg_idx // self.shape[1]
+        self.sg_cols = sg_idx % self.shape[1]
+        self.dims_x = dims_x[sg_idx]
+        self.dims_y = dims_y[sg_idx]
+        self.res_x = varres_metadata['resolution_x'].ravel()[sg_idx].astype(float64)
+        self.res_y = varres_metadata['resolution_y'].ravel()[sg_idx].astype(float64)
+        self.sw_x = varres_metadata['sw_corner_x'].ravel()[sg_idx].astype(float64)
+        self.sw_y = varres_metadata['sw_corner_y'].ravel()[sg_idx].astype(float64)
+
+        counts = self.dims_x * self.dims_y
+        self.starts = cumsum(counts) - counts
+        self.stops = self.starts + counts
+        self.nr_of_refinements = int(counts.sum())
+
+    def __len__(self) -> int:
+        """ Return the number of supergrids with refinements """
+        return len(self.starts)
+
+    def locate(self, rfn_idx: NDArray | None = None) -> tuple[NDArray, NDArray, NDArray]:
+        """ Return the supergrid positions in the index, and the refinement rows and cols within them
+
+        rfn_idx
+            The indices of the refinements in the varres_refinements dataset. If None, all the refinements.
+        """
+        if rfn_idx is None:
+            # the refinements are packed by supergrid, so their positions are repeated without any search
+            counts = self.stops - self.starts
+            sg_pos = repeat(arange(len(self)), counts)
+            offset = arange(self.nr_of_refinements) - repeat(self.starts, counts)
+        else:
+            rfn_idx = asarray(rfn_idx, dtype=int64)
+            if rfn_idx.size and ((rfn_idx.min() < 0) or (rfn_idx.max() >= self.nr_of_refinements)):
+                raise BAGError("Refinement indices out of range: [0, %d)" % self.nr_of_refinements)
+            sg_pos = searchsorted(self.starts, rfn_idx, side='right') - 1
+            offset = rfn_idx - self.starts[sg_pos]
+        rfn_r = offset // self.dims_x[sg_pos]
+        rfn_c = offset % self.dims_x[sg_pos]
+        return sg_pos, rfn_r, rfn_c
+
+    def window(self, row_range: slice | None = None, col_range: slice | None = None) -> NDArray:
+        """ Return the positions of the supergrids with refinements in the passed window of the VR grid """
+        mask = full(len(self), True)
+        for rng, sg_idx in ((row_range, self.sg_rows), (col_range, self.sg_cols)):
+            if rng is None:
+                continue
+            if (rng.step is not None) and (rng.step != 1):
+                raise BAGError("Invalid step for slice selector: %s" % rng)
+            if rng.start is not None:
+                mask &= sg_idx >= rng.start
+            if rng.stop is not None:
+                mask &= sg_idx < rng.stop
+        return flatnonzero(mask)
+
+    def refinement_ranges(self, positions: NDArray) -> list[slice]:
+        """ Return the refinement index ranges of the passed supergrid positions, merging the contiguous ones """
+        positions = sort(asarray(positions, dtype=int64))
+        if positions.size == 0:
+            return list()
+        starts = self.starts[positions]
+        stops = self.stops[positions]
+        # a new range begins where a supergrid does not start at the end of the previous one
+        breaks = flatnonzero(starts[1:] != stops[:-1]) + 1
+        firsts = concatenate(([0], breaks))
+        lasts = concatenate((breaks, [positions.size])) - 1
+        return [slice(int(start), int(stop)) for start, stop in zip(starts[firsts], stops[lasts])]
+
+    def __str__(self) -> str:
+        return "<RefinementIndex supergrids=%d/%d, refinements=%d>" \
+            % (len(self), self.shape[0] * self.shape[1], self.nr_of_refinements)
@@ -0,0 +1,137 @@
+import logging
+
+from numpy import argpartition, concatenate, empty, float32, float64, fmax, fmin, histogram, int64, isfinite, nan, \
+    quantile, sqrt, zeros
+from numpy.random import default_rng
+# noinspection PyUnresolvedReferences
+from numpy.typing import NDArray
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+
+logger = logging.getLogger(__name__)
+
+
+class Statistics:
+    """ Streaming statistics of a layer, updated one block of values at a time.
+
+    Count, min, max, mean, and standard deviation are exact. The histogram is exact for the
+    passed bins and range, while the quantiles are estimated from a uniform random sample of
+    the valid values (exact when all the values fit in the sample).
+    """
+
+    def __init__(self, bins: int = 0, hist_range: tuple[float, float] | None = None,
+                 sample_size: int = 100000, seed: int = 0) -> None:
+        """
+        bins
+            The number of histogram bins (0 to skip the histogram)
+        hist_range
+            The (min, max) range of the histogram, required when bins is not 0
+        sample_size
+            The maximum number of values retained to estimate the quantiles (0 to skip them)
+        seed
+            The seed of the random generator used to sample the values
+        """
+        if (bins > 0) and (hist_range is None):
+            raise BAGError("A histogram range is required for %d bins" % bins)
+
+        self.bins = bins
+        self.hist_range = hist_range
+        self.sample_size = sample_size
+
+        self.count = 0
+        self.min = nan
+        self.max = nan
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.hist_counts = zeros(bins, dtype=int64) if bins > 0 else None
+        self.hist_edges = None
+
+        self._rng = default_rng(seed)
+        self._sample = empty(0, dtype=float32)
+        self._keys = empty(0, dtype=float64)
+
+    def update(self, values: NDArray) -> None:
+        """ Accumulate a block of values, ignoring the NaN ones """
+        valid = values[isfinite(values)]
+        nr = valid.size
+        if nr == 0:
+            return
+
+        # exact moments, merged with the Chan et al. parallel algorithm
+        block_mean = valid.mean(dtype=float64)
+        block_m2 = float(((valid - block_mean) ** 2).sum(dtype=float64))
+        total = self.count + nr
+        delta = block_mean - self._mean
+        self._mean += delta * nr / total
+        self._m2 += block_m2 + delta ** 2 * self.count * nr / total
+        self.count = total
+
+        self.min = float(fmin(self.min, valid.min()))
+        self.max = float(fmax(self.max, valid.max()))
+
+        if self.hist_counts is not None:
+            counts, self.hist_edges = histogram(valid, bins=self.bins, range=self.hist_range)
+            self.hist_counts += counts
+
+        if self.sample_size > 0:
+            self._update_sample(valid)
+
+    def _update_sample(self, valid: NDArray) -> None:
+        """ Bottom-k sampling: each value gets a uniform random key, and the k smallest keys are retained """
+        nr_free = self.sample_size - self._sample.size
+        if nr_free > 0:
+            fill = valid[:nr_free]
+            self._sample = concatenate((self._sample, fill.astype(float32)))
+            self._keys = concatenate((self._keys, self._rng.random(fill.size)))
+            valid = valid[nr_free:]
+            if valid.size == 0:
+                return
+
+        # only the values with a key below the current threshold may enter the sample
+        threshold = self._keys.max()
+        nr_candidates = self._rng.binomial(valid.size, threshold)
+        if nr_candidates == 0:
+            return
+        candidates = self._rng.choice(valid.size, size=nr_candidates, replace=False)
+        keys = concatenate((self._keys, self._rng.random(nr_candidates) * threshold))
+        sample = concatenate((self._sample, valid[candidates].astype(float32)))
+        kept = argpartition(keys, self.sample_size - 1)[:self.sample_size]
+        self._keys = keys[kept]
+        self._sample = sample[kept]
+
+    @property
+    def mean(self) -> float:
+        if self.count == 0:
+            return nan
+        return float(self._mean)
+
+    @property
+    def std(self) -> float:
+        """ The population standard deviation """
+        if self.count == 0:
+            return nan
+        return float(sqrt(self._m2 / self.count))
+
+    @property
+    def histogram(self) -> tuple[NDArray, NDArray] | None:
+        """ The histogram as a tuple with the bin counts and edges """
+        if self.hist_counts is None:
+            return None
+        if self.hist_edges is None:
+            _, self.hist_edges = histogram(empty(0), bins=self.bins, range=self.hist_range)
+        return self.hist_counts, self.hist_edges
+
+    def quantiles(self, qs: list[float] | NDArray) -> NDArray:
+        """ Return the (approximate) quantiles for the passed probabilities in [0, 1] """
+        if self._sample.size == 0:
+            raise BAGError("No sampled values to estimate the quantiles")
+        return quantile(self._sample.astype(float64), qs)
+
+    def __str__(self) -> str:
+        output = "<Statistics count=%d>" % self.count
+        output += "\n    <min=%s, max=%s>" % (self.min, self.max)
+        output += "\n    <mean=%s, std=%s>" % (self.mean, self.std)
+        if self.hist_counts is not None:
+            output += "\n    <histogram bins=%d, range=%s>" % (self.bins, self.hist_range)
+        return output
@@ -1,6 +1,12 @@
 import argparse
+import csv
+import glob
+import json
 import logging
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 # noinspection PyUnresolvedReferences
 from hyo2.abc2.lib.logging import set_logging
@@ -8,16 +14,114 @@ from hyo2.abc2.lib.logging import set_logging
 from hyo2.bag import __version__
 # noinspection PyUnresolvedReferences
 from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.validators import ValidatorRegistry
 
 logger = logging.getLogger(__name__)
 
 
+def collect_bag_files(inputs: list[str]) -> list[str]:
+    """ Expand the passed files, directories (searched recursively) and glob patterns into a sorted list of BAGs """
+    bag_files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                bag_files.update(os.path.join(root, f) for f in files if f.lower().endswith(".bag"))
+        elif os.path.isfile(item):
+            bag_files.add(item)
+        else:
+            bag_files.update(f for f in glob.glob(item, recursive=True)
+                             if os.path.isfile(f) and f.lower().endswith(".bag"))
+
+    return sorted(os.path.abspath(f) for f in bag_files)
+
+
+def init_worker(cache_dir: str | None = None) -> None:
+    """ Compile the validators once per worker process """
+    ValidatorRegistry.cache_dir = cache_dir
+    ValidatorRegistry.xsd()
+    ValidatorRegistry.schematron()
+
+
+def validate_bag(bag_path: str) -> dict:
+    """ Validate the metadata of a BAG file, and return a dict with the separate XSD and Schematron errors """
+    result = {
+        "path": bag_path,
+        "valid": False,
+        "xsd_errors": list(),
+        "schematron_errors": list(),
+        "error": None,
+        "seconds": 0.0,
+    }
+
+    start = time.perf_counter()
+    try:
+        with BAGFile(bag_path, mode='r') as bf:
+            result["valid"] = bf.validate_metadata()
+            result["xsd_errors"] = bf.meta_xsd_errors
+            result["schematron_errors"] = bf.meta_schematron_errors
+            # errors that prevented the validation (e.g., unparsable metadata)
+            if not result["valid"] and (len(bf.meta_xsd_errors) + len(bf.meta_schematron_errors) == 0):
+                result["error"] = "; ".join(str(err) for err in bf.meta_errors)
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+
+    return result
+
+
+def validate_batch(bag_paths: list[str], jobs: int | None = None, cache_dir: str | None = None) -> list[dict]:
+    """ Validate the passed BAG files in a process pool, and return the results in the same order """
+    if (jobs == 1) or (len(bag_paths) < 2):
+        init_worker(cache_dir=cache_dir)
+        return [validate_bag(bag_path) for bag_path in bag_paths]
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(cache_dir,)) as executor:
+        return list(executor.map(validate_bag, bag_paths, chunksize=8))
+
+
+def write_report(results: list[dict], report_path: str, elapsed: float) -> None:
+    """ Write the validation results as a JSON or CSV report (based on the file extension) """
+    nr_of_files = len(results)
+    summary = {
+        "tool": "bag_validate",
+        "version": __version__,
+        "nr_of_files": nr_of_files,
+        "nr_of_valid": sum(1 for r in results if r["valid"]),
+        "elapsed_seconds": elapsed,
+        "files_per_second": nr_of_files / elapsed if elapsed > 0 else 0.0,
+    }
+
+    if os.path.splitext(report_path)[-1].lower() == ".csv":
+        with open(report_path, 'w', newline='') as fod:
+            writer = csv.writer(fod)
+            writer.writerow(["path", "valid", "nr_of_xsd_errors", "nr_of_schematron_errors", "seconds",
+                             "xsd_errors", "schematron_errors", "error"])
+            for r in results:
+                writer.writerow([r["path"], r["valid"], len(r["xsd_errors"]), len(r["schematron_errors"]),
+                                 "%.6f" % r["seconds"], " | ".join(r["xsd_errors"]),
+                                 " | ".join(r["schematron_errors"]), r["error"] or ""])
+            writer.writerow([])
+            for key, value in summary.items():
+                writer.writerow(["# %s" % key, value])
+        return
+
+    with open(report_path, 'w') as fod:
+        json.dump({"summary": summary, "files": results}, fod, indent=2)
+
+
 def main():
     app_name = "bag_validate"
-    app_info = "Validation of an OpenNS BAG file, using hyo2.bag r%s" % __version__
+    app_info = "Validation of OpenNS BAG files, using hyo2.bag r%s" % __version__
 
     parser = argparse.ArgumentParser(prog=app_name, description=app_info)
-    parser.add_argument("bag_file", type=str, help="a valid BAG file to validate")
+    parser.add_argument("bag_file", type=str, nargs="+",
+                        help="the BAG files to validate (also as directories or glob patterns for a batch)")
+    parser.add_argument("-r", "--report", type=str, help="the output JSON or CSV report (batch mode)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="the number of worker processes (batch mode, default: the number of CPUs)")
+    parser.add_argument("-c", "--cache_dir", type=str, default=None,
+                        help="a folder where to persist the compiled Schematron")
     parser.add_argument("-v", "--verbose", help="increase output verbosity", action="store_true")
     args = parser.parse_args()
 
@@ -25,17 +129,43 @@ def main():
         set_logging(ns_list=['hyo2.bag'])
         logger.debug("> verbosity: ON")
 
-        logger.debug("> input: %s" % args.bag_file)
+        logger.debug("> input: %s" % ", ".join(args.bag_file))
+
+    # single file, as in the original tool
+    if (len(args.bag_file) == 1) and os.path.isfile(args.bag_file[0]) and (args.report is None):
+        bag_file = args.bag_file[0]
+        if not BAGFile.is_bag(bag_file):
+            parser.exit(1, "ERROR: the input valid does not seem a BAG file: %s" % bag_file)
+
+        ValidatorRegistry.cache_dir = args.cache_dir
+        bf = BAGFile(bag_file, mode='r')
+        logger.debug(bf.validation_info())
+        return
+
+    bag_paths = collect_bag_files(args.bag_file)
+    if len(bag_paths) == 0:
+        parser.exit(1, "ERROR: no BAG files in the input: %s" % ", ".join(args.bag_file))
+    logger.debug("> BAG files: %d" % len(bag_paths))
+
+    start = time.perf_counter()
+    results = validate_batch(bag_paths, jobs=args.jobs, cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - start
 
-    if not os.path.exists(args.bag_file):
-        parser.exit(1, "ERROR: the input valid does not exist: %s" % args.bag_file)
+    nr_of_valid = sum(1 for r in results if r["valid"])
+    nr_of_errors = sum(1 for r in results if r["error"] is not None)
+    print("validated %d BAG files in %.2f s (%.1f files/s): %d valid, %d invalid, %d not validated"
+          % (len(results), elapsed, len(results) / elapsed if elapsed > 0 else 0.0, nr_of_valid,
+             len(results) - nr_of_valid, nr_of_errors))
 
-    if not BAGFile.is_bag(args.bag_file):
-        parser.exit(1, "ERROR: the input valid does not seem a BAG file: %s" % args.bag_file)
+    if args.report is not None:
+        write_report(results, report_path=os.path.abspath(args.report), elapsed=elapsed)
+        logger.debug("> report: %s" % args.report)
 
-    bf = BAGFile(args.bag_file, mode='r')
-    logger.debug(bf.validation_info())
+    if (nr_of_valid < len(results)) or (nr_of_errors > 0):
+        parser.exit(1)
 
 
 if __name__ == "__main__":
+    # the frozen executable must not re-run the tool in the worker processes of the batch validation
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+from hashlib import blake2b
+
+from lxml import etree
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+
+logger = logging.getLogger(__name__)
+
+
+class ValidatorRegistry:
+    """ Process-wide registry of the compiled BAG metadata validators (XML Schema and Schematron).
+
+    Each validator is lazily compiled on first use, and then reused by all the BAG files.
+    If cache_dir is set, the Schematron compiled to XSLT is persisted there, so that the following
+    processes only need to load it.
+    """
+
+    cache_dir: str | None = None
+
+    # noinspection HttpUrlsUsage
+    svrl_ns = {
+        'svrl': 'http://purl.oclc.org/dsdl/svrl',
+    }
+
+    _lock = threading.Lock()
+    _xsd_lock = threading.Lock()
+    _xsd: etree.XMLSchema | None = None
+    _schematron: etree.XSLT | None = None
+
+    @classmethod
+    def xsd_path(cls) -> str:
+        return os.path.join(Helper.iso19139_folder(), 'bag', 'bag.xsd')
+
+    @classmethod
+    def schematron_path(cls) -> str:
+        return os.path.join(Helper.iso19757_3_folder(), 'bag_metadata_profile.sch')
+
+    @classmethod
+    def xsd(cls) -> etree.XMLSchema:
+        """ Return the compiled BAG XML Schema """
+        if cls._xsd is None:
+            with cls._lock:
+                if cls._xsd is None:
+                    # noinspection PyUnresolvedReferences
+                    try:
+                        # noinspection PyUnresolvedReferences
+                        cls._xsd = etree.XMLSchema(etree.parse(cls.xsd_path()))
+                    except etree.Error as e:
+                        raise BAGError("unable to parse XML schema: %s" % e)
+                    logger.debug("compiled XML schema")
+        return cls._xsd
+
+    @classmethod
+    def schematron(cls) -> etree.XSLT:
+        """ Return the BAG Schematron, compiled to an XSLT validator """
+        if cls._schematron is None:
+            with cls._lock:
+                if cls._schematron is None:
+                    cls._schematron = cls._load_schematron()
+        return cls._schematron
+
+    @classmethod
+    def _load_schematron(cls) -> etree.XSLT:
+        with open(cls.schematron_path(), 'rb') as fid:
+            sch_bytes = fid.read()
+
+        xsl_path = None
+        if cls.cache_dir is not None:
+            # the compiled XSLT depends on both the Schematron content and the lxml version
+            digest = blake2b(sch_bytes + etree.__version__.encode(), digest_size=8).hexdigest()
+            xsl_path = os.path.join(cls.cache_dir, "bag_metadata_profile_%s.xsl" % digest)
+            if os.path.exists(xsl_path):
+                # noinspection PyUnresolvedReferences
+                try:
+                    # noinspection PyUnresolvedReferences
+                    validator = etree.XSLT(etree.parse(xsl_path))
+                    logger.debug("loaded compiled schematron: %s" % xsl_path)
+                    return validator
+                except etree.Error as e:
+                    logger.warning("unable to load compiled schematron %s: %s" % (xsl_path, e))
+
+        # the schematron module is slow to import, and only needed when there is no persisted XSLT
+        from lxml import isoschematron
+
+        # noinspection PyUnresolvedReferences
+        try:
+            # noinspection PyUnresolvedReferences
+            schematron = isoschematron.Schematron(etree.parse(cls.schematron_path()), store_xslt=True)
+        except etree.Error as e:
+            raise BAGError("unable to load BAG schematron: %s" % e)
+        logger.debug("compiled schematron")
+
+        if xsl_path is not None:
+            try:
+                os.makedirs(cls.cache_dir, exist_ok=True)
+                tmp_path = "%s.%d.tmp" % (xsl_path, os.getpid())
+                schematron.validator_xslt.write(tmp_path)
+                os.replace(tmp_path, xsl_path)
+            except OSError as e:
+                logger.warning("unable to persist compiled schematron %s: %s" % (xsl_path, e))
+
+        # noinspection PyUnresolvedReferences
+        return etree.XSLT(schematron.validator_xslt)
+
+    @classmethod
+    def xsd_errors(cls, xml_tree: etree.ElementBase) -> list:
+        """ Return the XML Schema errors for the passed metadata (an empty list if valid) """
+        schema = cls.xsd()
+        # the error log belongs to the shared schema, so validation and log reading are serialized
+        with cls._xsd_lock:
+            if schema.validate(xml_tree):
+                return list()
+            return list(schema.error_log)
+
+    @classmethod
+    def schematron_errors(cls, xml_tree: etree.ElementBase) -> list[str]:
+        """ Return the messages of the failed Schematron asserts for the passed metadata """
+        report = cls.schematron()(xml_tree)
+        return [text.text.strip() for text in
+                report.xpath('//svrl:failed-assert/svrl:text', namespaces=cls.svrl_ns)]
+
+    @classmethod
+    def clear(cls) -> None:
+        """ Drop the compiled validators (they are compiled again on next use) """
+        with cls._lock:
+            cls._xsd = None
+            cls._schematron = None
@@ -0,0 +1,133 @@
+import logging
+
+from numpy import asarray, bincount, concatenate, empty, flatnonzero, float32, float64, floor, fmax, fmin, full, inf, \
+    int64, isfinite, lexsort, nan, uint32, unique
+# noinspection PyUnresolvedReferences
+from numpy.typing import NDArray
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+
+logger = logging.getLogger(__name__)
+
+
+class VRGrid:
+    """ Uniform grid of binned VR refinement nodes.
+
+    Each node of the VR refinements is binned in the grid cell that contains it, and the values in a cell
+    are combined with one of the methods:
+    - "min", "max": the minimum/maximum value
+    - "mean": the average value
+    - "nearest": the value of the node nearest to the cell center (the first one read, in case of ties)
+
+    The grid is updated one block of nodes at a time, so the memory is bounded by the output arrays.
+    For the mean, the sums are accumulated in double precision, and finalize() sets the values.
+    As for the BAG grids, the rows go from south to north, and the cells are centered on the nodes.
+    """
+
+    methods = ("min", "max", "mean", "nearest")
+
+    def __init__(self, x_min: float, y_min: float, res_x: float, res_y: float, shape: tuple[int, int],
+                 method: str = "mean", out: NDArray | None = None) -> None:
+        """
+        x_min, y_min
+            The projected position of the center of the south-west node
+        res_x, res_y
+            The grid resolution
+        shape
+            The number of rows and columns of the grid
+        method
+            The method used to combine the values in a cell
+        out
+            If present, the floating point array to use for the values (with the passed shape)
+        """
+        if method not in self.methods:
+            raise BAGError("Unknown binning method: %s" % method)
+        if (res_x <= 0) or (res_y <= 0):
+            raise BAGError("Invalid grid resolution: %s, %s" % (res_x, res_y))
+
+        self.x_min = x_min
+        self.y_min = y_min
+        self.res_x = res_x
+        self.res_y = res_y
+        self.shape = tuple(shape)
+        self.method = method
+
+        if out is None:
+            out = empty(self.shape, dtype=float32)
+        elif out.shape != self.shape:
+            raise BAGError("Invalid output shape %s for a %s grid" % (out.shape, self.shape))
+        elif out.dtype.kind != 'f':
+            raise BAGError("Invalid output type: %s" % out.dtype)
+        out[...] = nan
+        self.values = out
+
+        # the sum and the number of nodes in each cell (for the mean), and the squared distance of the nearest node
+        self._sums = full(self.shape, 0.0, dtype=float64) if method == "mean" else None
+        self.counts = full(self.shape, 0, dtype=uint32) if method == "mean" else None
+        self._dist2 = full(self.shape, inf, dtype=float64) if method == "nearest" else None
+
+    def update(self, es: NDArray, ns: NDArray, values: NDArray) -> None:
+        """ Bin a block of nodes (the NaN values and the nodes outside the grid are ignored)
+
+        es, ns
+            The projected positions of the nodes
+        values
+            The values of the nodes
+        """
+        es = asarray(es, dtype=float64)
+        ns = asarray(ns, dtype=float64)
+        values = asarray(values)
+
+        cols = floor((es - self.x_min) / self.res_x + 0.5).astype(int64)
+        rows = floor((ns - self.y_min) / self.res_y + 0.5).astype(int64)
+        valid = isfinite(values) & (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        idx = flatnonzero(valid)
+        if idx.size == 0:
+            return
+        rows, cols, values = rows[idx], cols[idx], values[idx].astype(float64)
+        cells = rows * self.shape[1] + cols
+
+        if self.method == "nearest":
+            dist2 = (es[idx] - (self.x_min + cols * self.res_x)) ** 2 \
+                + (ns[idx] - (self.y_min + rows * self.res_y)) ** 2
+            # sorted by cell and distance, the first node of each cell is the nearest (lexsort is stable)
+            order = lexsort((dist2, cells))
+            cells, dist2, values = cells[order], dist2[order], values[order]
+            firsts = concatenate(([0], flatnonzero(cells[1:] != cells[:-1]) + 1))
+            r, c = cells[firsts] // self.shape[1], cells[firsts] % self.shape[1]
+            nearer = dist2[firsts] < self._dist2[r, c]
+            r, c = r[nearer], c[nearer]
+            self._dist2[r, c] = dist2[firsts][nearer]
+            self.values[r, c] = values[firsts][nearer]
+            return
+
+        cells, inverse = unique(cells, return_inverse=True)
+        r, c = cells // self.shape[1], cells % self.shape[1]
+        if self.method == "mean":
+            # the cells are unique, so the accumulation can use fancy indexing
+            self._sums[r, c] += bincount(inverse, weights=values)
+            self.counts[r, c] += bincount(inverse).astype(uint32)
+            return
+
+        reduce = fmin if self.method == "min" else fmax
+        order = inverse.argsort(kind='stable')
+        firsts = concatenate(([0], flatnonzero(inverse[order][1:] != inverse[order][:-1]) + 1))
+        # fmin/fmax ignore the NaN of the empty cells
+        self.values[r, c] = reduce(self.values[r, c], reduce.reduceat(values[order], firsts))
+
+    def finalize(self) -> NDArray:
+        """ Set the mean values from the accumulated sums (a no-op for the other methods), and return the values """
+        if self.method == "mean":
+            valid = self.counts > 0
+            self.values[valid] = self._sums[valid] / self.counts[valid]
+        return self.values
+
+    def geotransform(self) -> tuple[float, float, float, float, float, float]:
+        """ Return the GDAL geotransform of the grid, once flipped north-up (i.e., values[::-1]) """
+        return (self.x_min - self.res_x / 2.0, self.res_x, 0.0,
+                self.y_min + (self.shape[0] - 0.5) * self.res_y, 0.0, -self.res_y)
+
+    def __str__(self) -> str:
+        return "<VRGrid %s, shape=%s, res=(%s, %s), sw=(%s, %s), valid cells=%d>" \
+            % (self.method, self.shape, self.res_x, self.res_y, self.x_min, self.y_min, isfinite(self.values).sum())
@@ -0,0 +1,106 @@
+import logging
+
+from numpy import add, arange, empty, float32, fmax, fmin, full, int64, isfinite, maximum, nan, searchsorted, zeros
+# noinspection PyUnresolvedReferences
+from numpy.typing import NDArray
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+# noinspection PyUnresolvedReferences
+from hyo2.bag.refinement_index import RefinementIndex
+
+logger = logging.getLogger(__name__)
+
+
+class VRSummary:
+    """ Per-supergrid summary of the VR refinements.
+
+    The summary is stored for the supergrids with refinements, in the order of the refinement index:
+    the number of valid depths, of valid uncertainties, and of nodes with both, the depth and uncertainty
+    min/max (NaN if no valid values), and the refinement resolution.
+    It is built by feeding the refinements in increasing index order, by blocks.
+    """
+
+    def __init__(self, vr_index: RefinementIndex) -> None:
+        """
+        vr_index
+            The index of the supergrids with refinements
+        """
+        self._index = vr_index
+        self.shape = vr_index.shape
+        self.sg_rows = vr_index.sg_rows
+        self.sg_cols = vr_index.sg_cols
+        self.res_x = vr_index.res_x
+        self.res_y = vr_index.res_y
+        self.starts = vr_index.starts
+        self.stops = vr_index.stops
+        self.nr_of_refinements = vr_index.nr_of_refinements
+
+        nr_of_supergrids = len(vr_index)
+        self.nr_of_depths = zeros(nr_of_supergrids, dtype=int64)
+        self.nr_of_uncertainties = zeros(nr_of_supergrids, dtype=int64)
+        self.nr_of_both = zeros(nr_of_supergrids, dtype=int64)
+        self.depth_min = full(nr_of_supergrids, nan, dtype=float32)
+        self.depth_max = full(nr_of_supergrids, nan, dtype=float32)
+        self.uncertainty_min = full(nr_of_supergrids, nan, dtype=float32)
+        self.uncertainty_max = full(nr_of_supergrids, nan, dtype=float32)
+
+    def __len__(self) -> int:
+        """ Return the number of supergrids with refinements """
+        return len(self.starts)
+
+    def update(self, rfn_range: slice, depth: NDArray, uncertainty: NDArray) -> None:
+        """ Add a block of refinements (with the BAG nan already masked as NaN)
+
+        rfn_range
+            The index range of the refinements in the block
+        depth, uncertainty
+            The values of the refinements in the block
+        """
+        start = rfn_range.start
+        stop = min(rfn_range.stop, self.nr_of_refinements)
+        if stop <= start:
+            return
+        depth = depth[:stop - start]
+        uncertainty = uncertainty[:stop - start]
+
+        # the refinements of a supergrid are contiguous, so each one is reduced as a segment of the block
+        first = searchsorted(self.starts, start, side='right') - 1
+        last = searchsorted(self.starts, stop - 1, side='right') - 1
+        positions = arange(first, last + 1)
+        offsets = maximum(self.starts[positions], start) - start
+
+        valid_depth = isfinite(depth)
+        valid_uncertainty = isfinite(uncertainty)
+        self.nr_of_depths[positions] += add.reduceat(valid_depth.astype(int64), offsets)
+        self.nr_of_uncertainties[positions] += add.reduceat(valid_uncertainty.astype(int64), offsets)
+        self.nr_of_both[positions] += add.reduceat((valid_depth & valid_uncertainty).astype(int64), offsets)
+        # fmin/fmax ignore the NaN values
+        self.depth_min[positions] = fmin(self.depth_min[positions], fmin.reduceat(depth, offsets))
+        self.depth_max[positions] = fmax(self.depth_max[positions], fmax.reduceat(depth, offsets))
+        self.uncertainty_min[positions] = fmin(self.uncertainty_min[positions], fmin.reduceat(uncertainty, offsets))
+        self.uncertainty_max[positions] = fmax(self.uncertainty_max[positions], fmax.reduceat(uncertainty, offsets))
+
+    def window(self, row_range: slice | None = None, col_range: slice | None = None) -> NDArray:
+        """ Return the positions of the supergrids with refinements in the passed window of the VR grid """
+        return self._index.window(row_range=row_range, col_range=col_range)
+
+    def grid(self, name: str) -> NDArray:
+        """ Return a summary field as an array with the shape of the VR grid (NaN or 0 where no refinements) """
+        if name not in ("nr_of_depths", "nr_of_uncertainties", "nr_of_both", "depth_min", "depth_max",
+                        "uncertainty_min", "uncertainty_max", "res_x", "res_y"):
+            raise BAGError("Unknown summary field: %s" % name)
+        values = getattr(self, name)
+        out = empty(self.shape, dtype=values.dtype)
+        out[...] = 0 if values.dtype.kind == 'i' else nan
+        out[self.sg_rows, self.sg_cols] = values
+        return out
+
+    def refinement_ranges(self, positions: NDArray) -> list[slice]:
+        """ Return the refinement index ranges of the passed supergrid positions, merging the contiguous ones """
+        return self._index.refinement_ranges(positions)
+
+    def __str__(self) -> str:
+        return "<VRSummary supergrids=%d/%d, refinements=%d, valid depths=%d, valid uncertainties=%d>" \
+            % (len(self), self.shape[0] * self.shape[1], self.nr_of_refinements, self.nr_of_depths.sum(),
+               self.nr_of_uncertainties.sum())
@@ -1,5 +1,11 @@
 import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
+
+import h5py
+from numpy import arange, array_equal, empty, float32, float64, isnan, uint32, zeros
 
 # noinspection PyUnresolvedReferences
 from hyo2.bag.bag import BAGFile
@@ -38,6 +44,157 @@ class TestBagBase(unittest.TestCase):
         bag_1 = BAGFile(self.file_bag_1)
         self.assertEqual(os.path.abspath(self.file_bag_1), bag_1.filename)
 
+    def test_uncertainty_greater_than_as_array(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        flags = bag_1.uncertainty_greater_than(th=0.5)
+        flags_array = bag_1.uncertainty_greater_than(th=0.5, as_array=True)
+        self.assertEqual(flags_array.shape, (len(flags), 3))
+        self.assertEqual(flags_array.tolist(), flags)
+
+    def test_elevation_window(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        elevation = bag_1.elevation()
+        window = bag_1.elevation(row_range=slice(2, 9), col_range=slice(3, 20))
+        self.assertEqual(window.shape, (7, 17))
+        self.assertTrue(array_equal(window, elevation[2:9, 3:20], equal_nan=True))
+        with self.assertRaises(BAGError):
+            bag_1.uncertainty(col_range=slice(3, 100))
+
+    def test_window_from_bbox(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        meta = bag_1.populate_metadata()
+        x_min = meta.sw[0] + 3 * meta.res_x
+        y_min = meta.sw[1] + 2 * meta.res_y
+        row_range, col_range = bag_1.window_from_bbox(x_min, y_min, x_min + 5 * meta.res_x, y_min + 4 * meta.res_y)
+        self.assertEqual((row_range, col_range), (slice(2, 7), slice(3, 9)))
+        with self.assertRaises(BAGError):
+            bag_1.window_from_bbox(0.0, 0.0, 1.0, 1.0)
+
+    def test_iter_tiles(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        elevation = bag_1.elevation()
+        nr_of_nodes = 0
+        for row_range, col_range, tile in bag_1.iter_tiles(layers=("elevation",), max_memory=256):
+            self.assertTrue(array_equal(tile["elevation"], elevation[row_range, col_range], equal_nan=True))
+            nr_of_nodes += tile["elevation"].size
+        self.assertEqual(nr_of_nodes, elevation.size)
+        with self.assertRaises(BAGError):
+            next(bag_1.iter_tiles(layers=("depth",)))
+
+    def test_elevation_out(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        buffer = empty((10, 30), dtype=float32)
+        window = bag_1.elevation(row_range=slice(2, 9), col_range=slice(3, 20), out=buffer)
+        self.assertIs(window.base, buffer)
+        self.assertTrue(array_equal(window, bag_1.elevation()[2:9, 3:20], equal_nan=True))
+        with self.assertRaises(BAGError):
+            bag_1.elevation(out=buffer)
+        with self.assertRaises(BAGError):
+            bag_1.uncertainty(row_range=slice(0, 2), out=empty((10, 30), dtype=float64))
+
+    def test_has_density(self):
+        self.assertFalse(BAGFile(self.file_bag_0).has_density())
+        self.assertFalse(BAGFile(self.file_bag_1).has_density())
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            tmp_bag = os.path.join(tmp_dir, "bdb_02.bag")
+            shutil.copyfile(self.file_bag_1, tmp_bag)
+            with h5py.File(tmp_bag, "r+") as fid:
+                shape = fid[BAGFile.paths.bag_elevation].shape
+                solution = zeros(shape, dtype=[("shoal_elevation", "<f4"), ("stddev", "<f4"),
+                                               ("num_soundings", "<u4")])
+                solution["num_soundings"] = arange(solution.size, dtype=uint32).reshape(shape)
+                solution["num_soundings"][0, :3] = BAGFile.BAG_NAN
+                fid.create_dataset(BAGFile.paths.bag_elevation_solution, data=solution)
+
+            with BAGFile(tmp_bag) as bag_1:
+                self.assertTrue(bag_1.has_density())
+                self.assertEqual(bag_1.density_shape(), shape)
+                de, valid = bag_1.density_native()
+                self.assertEqual(de.dtype, uint32)
+                self.assertTrue(array_equal(de, solution["num_soundings"]))
+                self.assertEqual(valid.sum(), solution.size - 3)
+                self.assertFalse(valid[0, :3].any())
+                de = bag_1.density()
+                self.assertEqual(de.dtype, float32)
+                self.assertTrue(isnan(de[0, :3]).all())
+                self.assertTrue(array_equal(de[valid], solution["num_soundings"][valid].astype(float32)))
+                self.assertTrue(array_equal(bag_1.density(mask_nan=False, row_range=slice(1, 4), col_range=slice(2, 5)),
+                                            solution["num_soundings"][1:4, 2:5].astype(float32)))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_probe(self):
+        probe = BAGFile.probe(self.file_bag_1)
+        self.assertTrue(probe.is_bag)
+        self.assertEqual(probe.version, "1.5.3")
+        self.assertFalse(probe.is_vr)
+        self.assertEqual(probe.layers, ("elevation", "uncertainty", "tracking_list", "metadata"))
+        probe = BAGFile.probe(self.file_fake_0)
+        self.assertFalse(probe.is_bag)
+        self.assertIsNotNone(probe.error)
+
+    def test_is_vr(self):
+        self.assertFalse(BAGFile.is_vr(self.file_bag_0))
+
+    def test_inventory(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        inventory = bag_1.inventory()
+        self.assertEqual(sorted(inventory), ["BAG_root/elevation", "BAG_root/metadata", "BAG_root/tracking_list",
+                                             "BAG_root/uncertainty"])
+        elevation = inventory["BAG_root/elevation"]
+        self.assertEqual(elevation.shape, bag_1.elevation_shape())
+        self.assertEqual(elevation.nbytes, bag_1.elevation().nbytes)
+        self.assertIn("Minimum Elevation Value", elevation.attrs)
+
+    def test_str_without_reading_grids(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        with mock.patch.object(BAGFile, "elevation", side_effect=AssertionError), \
+                mock.patch.object(BAGFile, "uncertainty", side_effect=AssertionError), \
+                mock.patch.object(BAGFile, "tracking_list", side_effect=AssertionError):
+            description = str(bag_1)
+        self.assertIn("<elevation shape=(15, 26)", description)
+        self.assertIn("<tracking list shape=(2,)", description)
+
+    def test_metadata_tree(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        xml_tree = bag_1.metadata_tree()
+        self.assertIs(bag_1.populate_metadata().xml_tree, xml_tree)
+        self.assertTrue(bag_1.validate_metadata())
+        self.assertIs(bag_1.metadata_tree(), xml_tree)
+        self.assertEqual(bag_1.metadata(as_string=False, as_pretty_xml=False).count(b'\x00'), 0)
+
+    def test_modify_bbox(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            tmp_bag = os.path.join(tmp_dir, "bdb_02.bag")
+            shutil.copyfile(self.file_bag_1, tmp_bag)
+            with BAGFile(tmp_bag, mode="r+") as bag_1:
+                bag_1.modify_bbox(west=-70.5, east=-70.25, south=43.0, north=43.5)
+                self.assertEqual(bag_1[bag_1.paths.bag_metadata].dtype.str, "|S1")
+            with BAGFile(tmp_bag) as bag_1:
+                self.assertEqual(bag_1.populate_metadata().geo_extent(), (-70.5, -70.25, 43.0, 43.5))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_modify_bbox_keeps_meta(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            tmp_bag = os.path.join(tmp_dir, "bdb_02.bag")
+            shutil.copyfile(self.file_bag_1, tmp_bag)
+            with BAGFile(tmp_bag, mode="r+") as bag_1:
+                # the lazily populated fields are read after the edit
+                meta = bag_1.populate_metadata()
+                xml_tree = bag_1.metadata_tree()
+                bag_1.modify_bbox(west=1.0, east=2.0, south=3.0, north=4.0)
+                self.assertNotEqual(meta.lon_min, 1.0)
+                self.assertIs(meta.xml_tree, xml_tree)
+                self.assertIsNot(bag_1.metadata_tree(), xml_tree)
+                self.assertEqual(bag_1.populate_metadata().geo_extent(), (1.0, 2.0, 3.0, 4.0))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
 
 def suite():
     s = unittest.TestSuite()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.cache import ResultCache
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+
+
+class TestBagCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_bag_1 = os.path.join(self.tmp_dir, "bdb_02.bag")
+        shutil.copyfile(os.path.join(Helper.samples_folder(), "bdb_02.bag"), self.file_bag_1)
+        self.cache = ResultCache(path=os.path.join(self.tmp_dir, "results.sqlite"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_get_put(self):
+        identity = self.cache.file_identity(self.file_bag_1)
+        self.assertIsNone(self.cache.get(self.file_bag_1, identity, "answer"))
+        self.cache.put(self.file_bag_1, identity, "answer", (1.0, 2.0))
+        self.assertEqual(self.cache.get(self.file_bag_1, identity, "answer"), (1.0, 2.0))
+        self.assertIsNone(self.cache.get(self.file_bag_1, identity + "x", "answer"))
+
+    def test_identity(self):
+        identity = self.cache.file_identity(self.file_bag_1)
+        with open(self.file_bag_1, "ab") as fod:
+            fod.write(b"\0")
+        self.assertNotEqual(self.cache.file_identity(self.file_bag_1), identity)
+
+    def test_eviction(self):
+        cache = ResultCache(path=os.path.join(self.tmp_dir, "small.sqlite"), max_bytes=2000)
+        for i in range(10):
+            cache.put(self.file_bag_1, "id", "result_%d" % i, b"x" * 500)
+        self.assertLessEqual(cache.size(), 2000)
+        self.assertIsNone(cache.get(self.file_bag_1, "id", "result_0"))
+        self.assertIsNotNone(cache.get(self.file_bag_1, "id", "result_9"))
+
+    def test_bag_results(self):
+        bag_1 = BAGFile(self.file_bag_1, cache=self.cache)
+        min_max = bag_1.elevation_min_max()
+        flags = bag_1.uncertainty_greater_than(th=0.5)
+        bag_1.populate_metadata()
+        bag_1.close()
+        self.assertEqual(len(self.cache), 3)
+
+        bag_2 = BAGFile(self.file_bag_1, cache=self.cache)
+        self.assertEqual(bag_2.elevation_min_max(), min_max)
+        self.assertEqual(bag_2.uncertainty_greater_than(th=0.5), flags)
+        self.assertEqual(bag_2.populate_metadata().rows, bag_1.meta.rows)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_broken_cache(self):
+        bag_1 = BAGFile(self.file_bag_1, cache=self.cache)
+        min_max = bag_1.elevation_min_max()
+        bag_1.close()
+
+        # an unreadable result is computed again
+        with sqlite3.connect(self.cache.path) as conn:
+            conn.execute("UPDATE results SET value = ?", (b"not a pickle",))
+        bag_2 = BAGFile(self.file_bag_1, cache=self.cache)
+        self.assertEqual(bag_2.elevation_min_max(), min_max)
+        bag_2.close()
+
+        # as well as the results of a corrupted database
+        with open(self.cache.path, "wb") as fod:
+            fod.write(b"not a database" * 100)
+        bag_3 = BAGFile(self.file_bag_1, cache=self.cache)
+        self.assertEqual(bag_3.elevation_min_max(), min_max)
+        self.assertEqual(bag_3.populate_metadata().rows, 15)
+        bag_3.close()
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagCache))
+    return s
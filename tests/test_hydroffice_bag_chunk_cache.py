@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+from numpy import arange, array_equal, float32
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+# noinspection PyUnresolvedReferences
+from hyo2.bag.chunk_cache import ChunkCache
+
+
+class TestBagChunkCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bag_path = os.path.join(self.tmp_dir, "chunked.bag")
+        # a row of chunks takes 2 MiB (32 chunks of 64 KiB)
+        self.elevation = arange(512 * 4096, dtype=float32).reshape(512, 4096)
+        with h5py.File(self.bag_path, "w") as fid:
+            fid.create_group(BAGFile.paths.bag_root)
+            fid.create_dataset(BAGFile.paths.bag_elevation, data=self.elevation, chunks=(128, 128),
+                               compression="gzip")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_for_dataset(self):
+        with h5py.File(self.bag_path, "r") as fid:
+            ds = fid[BAGFile.paths.bag_elevation]
+            rows = ChunkCache.for_dataset(ds, access="rows", min_nbytes=0)
+            self.assertEqual(rows.nbytes, 32 * 128 * 128 * 4)
+            self.assertEqual(rows.capacity, 32)
+            self.assertEqual(ChunkCache.for_dataset(ds, access="columns", min_nbytes=0).capacity, 4)
+            self.assertEqual(ChunkCache.for_dataset(ds, access="chunks", min_nbytes=0).capacity, 1)
+            self.assertEqual(ChunkCache.for_dataset(ds, access="rows", max_nbytes=1024 * 1024).capacity, 16)
+            with self.assertRaises(BAGError):
+                ChunkCache.for_dataset(ds, access="diagonal")
+
+    def test_record(self):
+        cache = ChunkCache(shape=(512, 4096), chunks=(128, 128), itemsize=4, nbytes=2 * 128 * 128 * 4)
+        cache.record((slice(0, 1), slice(0, 256)))
+        cache.record((slice(1, 2), slice(0, 256)))
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        cache.record((slice(0, 1), slice(256, 384)))
+        cache.record((slice(0, 1), slice(0, 128)))
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+        self.assertEqual(cache.stats()["nr_of_reads"], 4)
+
+    def test_row_reads(self):
+        with BAGFile(self.bag_path, chunk_cache_access="rows") as bf:
+            for row in range(0, 256, 8):
+                self.assertTrue(array_equal(bf.elevation(mask_nan=False, row_range=slice(row, row + 8)),
+                                            self.elevation[row:row + 8]))
+            ds = bf[bf.paths.bag_elevation]
+            chunk_cache = bf.chunk_cache(bf.paths.bag_elevation)
+            self.assertEqual(ds.id.get_access_plist().get_chunk_cache()[1], chunk_cache.nbytes)
+            self.assertGreaterEqual(chunk_cache.capacity, 32)
+            stats = bf.chunk_cache_stats()[bf.paths.bag_elevation]
+            self.assertEqual(stats["misses"], 2 * 32)
+            self.assertEqual(stats["hits"], 30 * 32)
+
+    def test_explicit_settings(self):
+        with BAGFile(self.bag_path, rdcc_nbytes=128 * 1024, rdcc_nslots=521) as bf:
+            for row in range(0, 256, 8):
+                bf.elevation(row_range=slice(row, row + 8))
+            chunk_cache = bf.chunk_cache(bf.paths.bag_elevation)
+            self.assertEqual((chunk_cache.nbytes, chunk_cache.nslots), (128 * 1024, 521))
+            self.assertEqual(chunk_cache.hits, 0)
+
+        with BAGFile(self.bag_path, chunk_cache_access="chunks") as bf:
+            bf.elevation(row_range=slice(0, 8))
+            self.assertEqual(bf.chunk_cache(bf.paths.bag_elevation).stats()["misses"], 32)
+
+        with self.assertRaises(BAGError):
+            BAGFile(self.bag_path, chunk_cache_access="diagonal")
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagChunkCache))
+    return s
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+from numpy import arange, array_equal, empty, float32, uint32, zeros
+from numpy.random import default_rng
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.chunk_reader import ChunkReader
+
+
+class TestBagChunkReader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bag_path = os.path.join(self.tmp_dir, "chunked.bag")
+
+        rng = default_rng(42)
+        self.elevation = (rng.random((70, 90)) * -100.0).astype(float32)
+        self.elevation[::9, ::4] = BAGFile.BAG_NAN
+        solution = zeros((70, 90), dtype=[("num_hypotheses", uint32), ("num_soundings", uint32)])
+        solution["num_soundings"] = arange(70 * 90).reshape(70, 90)
+
+        with h5py.File(self.bag_path, "w") as fid:
+            fid.create_group(BAGFile.paths.bag_root)
+            fid.create_dataset(BAGFile.paths.bag_elevation, data=self.elevation, chunks=(16, 20),
+                               compression="gzip", shuffle=True)
+            fid.create_dataset(BAGFile.paths.bag_uncertainty, data=self.elevation, chunks=(16, 20),
+                               compression="gzip")
+            fid.create_dataset(BAGFile.paths.bag_elevation_solution, data=solution, chunks=(16, 16),
+                               compression="gzip", shuffle=True)
+            sparse = fid.create_dataset("sparse", shape=(40, 40), chunks=(16, 16), dtype=float32,
+                                        compression="gzip", fillvalue=BAGFile.BAG_NAN)
+            sparse[0:16, 0:16] = 1.0
+            fid.create_dataset("lzf", data=self.elevation, chunks=(16, 20), compression="lzf")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_read(self):
+        with h5py.File(self.bag_path, "r") as fid:
+            for ds_path in (BAGFile.paths.bag_elevation, BAGFile.paths.bag_uncertainty, "lzf"):
+                ds = fid[ds_path]
+                reader = ChunkReader(ds, workers=4)
+                self.assertEqual(reader.supported, ds_path != "lzf")
+                for sel in ((slice(0, 70), slice(0, 90)), (slice(3, 67), slice(19, 41)),
+                            (slice(15, 17), slice(20, 21)), (slice(5, 5), slice(0, 90)),
+                            (slice(0, 70, 3), slice(1, 90, 2))):
+                    self.assertTrue(array_equal(reader.read(sel), ds[sel]))
+
+    def test_read_field(self):
+        with h5py.File(self.bag_path, "r") as fid:
+            ds = fid[BAGFile.paths.bag_elevation_solution]
+            values = ChunkReader(ds, workers=3).read((slice(2, 61), slice(7, 88)), field="num_soundings")
+            self.assertTrue(array_equal(values, ds.fields("num_soundings")[2:61, 7:88]))
+
+    def test_read_unallocated(self):
+        with h5py.File(self.bag_path, "r") as fid:
+            ds = fid["sparse"]
+            self.assertTrue(array_equal(ChunkReader(ds, workers=2).read((slice(0, 40), slice(0, 40))), ds[...]))
+
+    def test_bag_workers(self):
+        with BAGFile(self.bag_path) as bf:
+            self.assertTrue(array_equal(bf.elevation(workers=4), bf.elevation(), equal_nan=True))
+            self.assertTrue(array_equal(bf.uncertainty(row_range=slice(5, 50), workers=4),
+                                        bf.uncertainty(row_range=slice(5, 50)), equal_nan=True))
+            self.assertTrue(array_equal(bf.density(workers=4), bf.density(), equal_nan=True))
+
+            buffer = empty((80, 100), dtype=float32)
+            window = bf.elevation(row_range=slice(10, 60), col_range=slice(5, 85), out=buffer, workers=4)
+            self.assertIs(window.base, buffer)
+            self.assertTrue(array_equal(window, bf.elevation()[10:60, 5:85], equal_nan=True))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagChunkReader))
+    return s
@@ -1,5 +1,6 @@
 import os
 import unittest
+from unittest import mock
 
 # noinspection PyUnresolvedReferences
 from hyo2.bag.helper import Helper
@@ -10,6 +11,18 @@ class TestBagHelper(unittest.TestCase):
     def test_bag_samples_folder(self):
         assert os.path.exists(Helper.samples_folder())
 
+    def test_import_osr(self):
+        # noinspection PyUnresolvedReferences
+        from hyo2.abc2.lib.gdal_aux import GdalAux
+
+        with mock.patch.object(Helper, "_gdal_error_handler_pushed", False), \
+                mock.patch.object(GdalAux, "push_gdal_error_handler") as push:
+            osr = Helper.import_osr()
+            self.assertIs(Helper.import_osr(), osr)
+            self.assertTrue(hasattr(osr, "SpatialReference"))
+            # the error handler is pushed only at the first import
+            push.assert_called_once_with()
+
 
 def suite():
     s = unittest.TestSuite()
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+import unittest
+
+
+class TestBagImports(unittest.TestCase):
+
+    lazy_modules = ("osgeo", "lxml.isoschematron", "dateutil", "sqlite3", "concurrent.futures")
+
+    def loaded_modules(self, statement: str) -> list[str]:
+        code = "import sys\n%s\nprint('\\n'.join(sys.modules))" % statement
+        ret = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        return ret.stdout.splitlines()
+
+    def test_lazy_imports(self):
+        loaded = self.loaded_modules("import hyo2.bag.bag")
+        self.assertIn("hyo2.bag.bag", loaded)
+        for name in self.lazy_modules:
+            self.assertNotIn(name, loaded)
+
+    def test_lazy_imports_with_metadata(self):
+        loaded = self.loaded_modules("import os\n"
+                                     "from hyo2.bag.bag import BAGFile\n"
+                                     "from hyo2.bag.helper import Helper\n"
+                                     "BAGFile(os.path.join(Helper.samples_folder(), 'bdb_02.bag')).layers()")
+        self.assertNotIn("osgeo", loaded)
+        self.assertNotIn("lxml.isoschematron", loaded)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagImports))
+    return s
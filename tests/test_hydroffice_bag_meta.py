@@ -0,0 +1,75 @@
+import os
+import pickle
+import unittest
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+# noinspection PyUnresolvedReferences
+from hyo2.bag.meta import Meta
+
+
+class TestBagMeta(unittest.TestCase):
+
+    def setUp(self):
+        self.file_bag_1 = os.path.join(Helper.samples_folder(), "bdb_02.bag")
+        self.meta_xml = BAGFile(self.file_bag_1).metadata(as_string=False, as_pretty_xml=False)
+
+    def tearDown(self):
+        pass
+
+    def test_fields(self):
+        meta = Meta(meta_xml=self.meta_xml)
+        self.assertEqual((meta.rows, meta.cols), (15, 26))
+        self.assertEqual((meta.res_x, meta.res_y), (4.0, 4.0))
+        self.assertEqual(meta.sw, [614136.0, 4494756.0])
+        self.assertEqual(meta.ne, [614240.0, 4494816.0])
+        self.assertEqual(meta.geo_extent(), (-73.6511, -73.6499, 40.5957, 40.5963))
+        self.assertEqual(meta.date, "2014-02-27T00:00:00Z")
+        self.assertEqual(meta.survey_start_date, "2014-01-18T16:24:30Z")
+        self.assertEqual(meta.unc_type, "productUncert")
+        self.assertEqual(meta.sec_constr, "unclassified")
+
+    def test_lazy_fields(self):
+        meta = Meta(meta_xml=self.meta_xml)
+        self.assertEqual(meta.rows, 15)
+        self.assertEqual(meta.geo_extent(), (-73.6511, -73.6499, 40.5957, 40.5963))
+        self.assertEqual(meta._populated, {"_read_rows_and_cols", "_read_bbox"})
+        meta.populate_all()
+        self.assertEqual(len(meta._populated), 12)
+
+    def test_pickle(self):
+        meta = Meta(meta_xml=self.meta_xml)
+        self.assertEqual(meta.rows, 15)
+        meta = pickle.loads(pickle.dumps(meta))
+        # the parsed fields are kept, while the others are read after unpickling
+        self.assertEqual(meta._populated, {"_read_rows_and_cols"})
+        self.assertEqual((meta.rows, meta.cols), (15, 26))
+        self.assertEqual(meta.sw, [614136.0, 4494756.0])
+        self.assertEqual(meta.date, "2014-02-27T00:00:00Z")
+        self.assertEqual(meta._populated, {"_read_rows_and_cols", "_read_corners_sw_and_ne", "_read_date"})
+
+    def test_fields_not_at_root(self):
+        # the legacy descendant queries still locate the fields when the metadata are not the document root
+        xml = self.meta_xml.split(b"?>", 1)[-1] if self.meta_xml.startswith(b"<?xml") else self.meta_xml
+        meta = Meta(meta_xml=b"<wrapper>" + xml + b"</wrapper>")
+        self.assertEqual((meta.rows, meta.cols), (15, 26))
+        self.assertEqual(meta.geo_extent(), (-73.6511, -73.6499, 40.5957, 40.5963))
+        self.assertEqual(meta.unc_type, "productUncert")
+
+    def test_duplicated_fields(self):
+        # the first node in document order is used, as for the legacy descendant queries
+        root_end = self.meta_xml.index(b">", self.meta_xml.index(b"<gmi:MI_Metadata")) + 1
+        series = b"<gmd:series><gmd:CI_Date><gmd:date><gco:Date>2001-02-03</gco:Date></gmd:date></gmd:CI_Date>" \
+                 b"<gmd:abstract><gco:CharacterString>first</gco:CharacterString></gmd:abstract></gmd:series>"
+        meta = Meta(meta_xml=self.meta_xml[:root_end] + series + self.meta_xml[root_end:])
+        self.assertEqual(meta.date, "2001-02-03T00:00:00Z")
+        self.assertEqual(meta.abstract, "first")
+        self.assertEqual((meta.rows, meta.cols), (15, 26))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagMeta))
+    return s
@@ -0,0 +1,80 @@
+import os
+import unittest
+
+from numpy import array, float32, full, isnan, nan
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+# noinspection PyUnresolvedReferences
+from hyo2.bag.qc import QCCheck, FlagCheck, ElevationMinMax, UncertaintyMinMax, UncertaintyGreaterThan, \
+    UncertaintyHasDepth, DepthHasUncertainty
+
+
+class TestBagQC(unittest.TestCase):
+
+    def setUp(self):
+        self.file_bag_1 = os.path.join(Helper.samples_folder(), "bdb_02.bag")
+        self.tile = {
+            "elevation": array([[-1.0, nan], [-3.0, -4.0]], dtype=float32),
+            "uncertainty": array([[0.5, 0.2], [nan, 1.5]], dtype=float32),
+        }
+
+    def tearDown(self):
+        pass
+
+    def test_min_max(self):
+        check = ElevationMinMax()
+        check.feed(row_range=slice(0, 2), col_range=slice(0, 2), tile=self.tile)
+        self.assertEqual(check.result(), (-4.0, -1.0))
+        self.assertIsInstance(check.result()[0], float32)
+
+        check.reset()
+        check.feed(row_range=slice(0, 2), col_range=slice(0, 2), tile={"elevation": full((2, 2), nan, dtype=float32)})
+        self.assertTrue(all(isnan(value) for value in check.result()))
+
+    def test_flags(self):
+        check = UncertaintyGreaterThan(th=1.0)
+        check.feed(row_range=slice(10, 12), col_range=slice(5, 7), tile=self.tile)
+        rows, cols, values = check.result()
+        self.assertEqual((rows.tolist(), cols.tolist(), values.tolist()), ([11], [6], [1.5]))
+
+        check = UncertaintyHasDepth()
+        check.feed(row_range=slice(0, 2), col_range=slice(0, 2), tile=self.tile)
+        rows, cols, values = check.result()
+        self.assertEqual((rows.tolist(), cols.tolist()), ([0], [1]))
+
+        check = DepthHasUncertainty()
+        check.feed(row_range=slice(0, 2), col_range=slice(0, 2), tile=self.tile)
+        rows, cols, values = check.result()
+        self.assertEqual((rows.tolist(), cols.tolist(), values.tolist()), ([1], [0], [3.0]))
+
+    def test_incomplete_checks(self):
+        class NoResult(QCCheck):
+            def feed(self, row_range, col_range, tile):
+                pass
+
+        class NoValues(FlagCheck):
+            def mask(self, tile):
+                return isnan(tile["elevation"])
+
+        for check_class in (QCCheck, FlagCheck, NoResult, NoValues):
+            with self.assertRaises(TypeError):
+                check_class()
+
+    def test_run_qc(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        results = bag_1.run_qc([ElevationMinMax(), UncertaintyMinMax(), UncertaintyGreaterThan(th=0.5),
+                                UncertaintyHasDepth(), DepthHasUncertainty()])
+        self.assertEqual(results[0], bag_1.elevation_min_max())
+        self.assertEqual(results[1], bag_1.uncertainty_min_max())
+        self.assertEqual(results[2], bag_1.uncertainty_greater_than(th=0.5))
+        self.assertEqual(results[3], bag_1.uncertainty_has_depth())
+        self.assertEqual(results[4], bag_1.depth_has_uncertainty())
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagQC))
+    return s
@@ -0,0 +1,48 @@
+import unittest
+
+from numpy import arange, array, dtype, float32, uint32, zeros
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+# noinspection PyUnresolvedReferences
+from hyo2.bag.refinement_index import RefinementIndex
+
+
+class TestBagRefinementIndex(unittest.TestCase):
+
+    def setUp(self):
+        vr_type = dtype([('index', uint32), ('dimensions_x', uint32), ('dimensions_y', uint32),
+                         ('resolution_x', float32), ('resolution_y', float32),
+                         ('sw_corner_x', float32), ('sw_corner_y', float32)])
+        self.varres_metadata = zeros((2, 2), dtype=vr_type)
+        self.varres_metadata[0, 0] = (0, 2, 3, 0.5, 0.25, 0.1, 0.2)
+        self.varres_metadata[0, 1] = (0xFFFFFFFF, 0, 0, -1.0, -1.0, -1.0, -1.0)
+        self.varres_metadata[1, 0] = (6, 1, 1, 1.0, 1.0, 0.0, 0.0)
+        self.varres_metadata[1, 1] = (7, 4, 2, 0.25, 0.5, 0.3, 0.4)
+        self.idx = RefinementIndex(self.varres_metadata)
+
+    def tearDown(self):
+        pass
+
+    def test_supergrids(self):
+        self.assertEqual(len(self.idx), 3)
+        self.assertEqual(self.idx.nr_of_refinements, 15)
+        self.assertEqual(self.idx.starts.tolist(), [0, 6, 7])
+        self.assertEqual(self.idx.sg_rows.tolist(), [0, 1, 1])
+        self.assertEqual(self.idx.sg_cols.tolist(), [0, 0, 1])
+
+    def test_locate(self):
+        sg_pos, rfn_r, rfn_c = self.idx.locate(arange(15))
+        self.assertEqual(sg_pos.tolist(), [0] * 6 + [1] + [2] * 8)
+        self.assertEqual(rfn_r.tolist(), [0, 0, 1, 1, 2, 2, 0, 0, 0, 0, 0, 1, 1, 1, 1])
+        self.assertEqual(rfn_c.tolist(), [0, 1, 0, 1, 0, 1, 0, 0, 1, 2, 3, 0, 1, 2, 3])
+
+    def test_locate_raise(self):
+        with self.assertRaises(BAGError):
+            self.idx.locate(array([15]))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagRefinementIndex))
+    return s
@@ -0,0 +1,58 @@
+import os
+import unittest
+
+from numpy import arange, array_equal, float32, histogram, isfinite, isnan, nan
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+# noinspection PyUnresolvedReferences
+from hyo2.bag.stats import Statistics
+
+
+class TestBagStats(unittest.TestCase):
+
+    def setUp(self):
+        self.file_bag_1 = os.path.join(Helper.samples_folder(), "bdb_02.bag")
+        self.values = arange(1000, dtype=float32)
+        self.values[::10] = nan
+
+    def tearDown(self):
+        pass
+
+    def test_streaming(self):
+        stats = Statistics(bins=10, hist_range=(0.0, 1000.0))
+        for start in range(0, self.values.size, 77):
+            stats.update(self.values[start:start + 77])
+        valid = self.values[isfinite(self.values)]
+        self.assertEqual(stats.count, valid.size)
+        self.assertEqual((stats.min, stats.max), (1.0, 999.0))
+        self.assertAlmostEqual(stats.mean, float(valid.mean()))
+        self.assertAlmostEqual(stats.std, float(valid.std()), places=3)
+        self.assertTrue(array_equal(stats.histogram[0], histogram(valid, bins=10, range=(0.0, 1000.0))[0]))
+        self.assertAlmostEqual(float(stats.quantiles([0.5])[0]), 500.0)
+
+    def test_empty(self):
+        stats = Statistics()
+        stats.update(self.values[:1])
+        self.assertEqual(stats.count, 0)
+        self.assertTrue(isnan(stats.mean))
+        with self.assertRaises(BAGError):
+            stats.quantiles([0.5])
+        with self.assertRaises(BAGError):
+            Statistics(bins=10)
+
+    def test_bag_statistics(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        stats = bag_1.statistics(layer="uncertainty", bins=4)
+        self.assertEqual((stats.min, stats.max), bag_1.uncertainty_min_max())
+        self.assertEqual(stats.histogram[0].sum(), stats.count)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagStats))
+    return s
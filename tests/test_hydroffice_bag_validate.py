@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+# noinspection PyUnresolvedReferences
+from hyo2.bag.tools.bag_validate import collect_bag_files, validate_bag, validate_batch, write_report
+
+
+class TestBagValidate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_bag_1 = os.path.join(Helper.samples_folder(), "bdb_01.bag")
+        self.file_bag_2 = os.path.join(Helper.samples_folder(), "bdb_02.bag")
+        self.file_fake = os.path.join(Helper.samples_folder(), "fake_00.bag")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_collect_bag_files(self):
+        os.makedirs(os.path.join(self.tmp_dir, "a", "b"))
+        paths = [os.path.join(self.tmp_dir, "a", "x.bag"), os.path.join(self.tmp_dir, "a", "b", "y.BAG"),
+                 os.path.join(self.tmp_dir, "z.bag")]
+        for path in paths + [os.path.join(self.tmp_dir, "a", "notes.txt")]:
+            with open(path, "w") as fod:
+                fod.write("")
+
+        # directories are searched recursively, and only the BAG files are kept
+        self.assertEqual(collect_bag_files([os.path.join(self.tmp_dir, "a")]), sorted(paths[:2]))
+        self.assertEqual(collect_bag_files([os.path.join(self.tmp_dir, "**", "*.bag")]), sorted([paths[0], paths[2]]))
+        # the same file from a directory, a glob pattern and an explicit path is listed once
+        self.assertEqual(collect_bag_files([self.tmp_dir, os.path.join(self.tmp_dir, "*.bag"), paths[2], paths[2]]),
+                         sorted(paths))
+        self.assertEqual(collect_bag_files([os.path.join(self.tmp_dir, "missing_*.bag")]), list())
+
+    def test_validate_bag(self):
+        result = validate_bag(self.file_bag_2)
+        self.assertTrue(result["valid"])
+        self.assertEqual((result["xsd_errors"], result["schematron_errors"], result["error"]), (list(), list(), None))
+
+        result = validate_bag(self.file_fake)
+        self.assertFalse(result["valid"])
+        self.assertIsNotNone(result["error"])
+
+    def test_validate_batch(self):
+        bag_paths = [self.file_bag_2, self.file_fake, self.file_bag_1]
+        serial = validate_batch(bag_paths, jobs=1)
+        parallel = validate_batch(bag_paths, jobs=2)
+        # the results keep the input order
+        self.assertEqual([r["path"] for r in serial], bag_paths)
+        self.assertEqual([r["path"] for r in parallel], bag_paths)
+        for r_serial, r_parallel in zip(serial, parallel):
+            r_serial.pop("seconds")
+            r_parallel.pop("seconds")
+            self.assertEqual(r_serial, r_parallel)
+
+    def test_write_report(self):
+        results = validate_batch([self.file_bag_2, self.file_fake], jobs=1)
+
+        json_path = os.path.join(self.tmp_dir, "report.json")
+        write_report(results, report_path=json_path, elapsed=2.0)
+        with open(json_path) as fid:
+            report = json.load(fid)
+        self.assertEqual(report["summary"]["tool"], "bag_validate")
+        self.assertEqual((report["summary"]["nr_of_files"], report["summary"]["nr_of_valid"]), (2, 1))
+        self.assertEqual(report["summary"]["files_per_second"], 1.0)
+        self.assertEqual([r["path"] for r in report["files"]], [self.file_bag_2, self.file_fake])
+        self.assertEqual([r["valid"] for r in report["files"]], [True, False])
+
+        csv_path = os.path.join(self.tmp_dir, "report.csv")
+        write_report(results, report_path=csv_path, elapsed=2.0)
+        with open(csv_path, newline='') as fid:
+            rows = list(csv.reader(fid))
+        self.assertEqual(rows[0][:4], ["path", "valid", "nr_of_xsd_errors", "nr_of_schematron_errors"])
+        self.assertEqual(rows[1][:4], [self.file_bag_2, "True", "0", "0"])
+        self.assertEqual(rows[2][:2], [self.file_fake, "False"])
+        self.assertNotEqual(rows[2][-1], "")
+        self.assertEqual(rows[3], list())
+        summary = dict((row[0], row[1]) for row in rows[4:])
+        self.assertEqual((summary["# nr_of_files"], summary["# nr_of_valid"]), ("2", "1"))
+        self.assertEqual(summary["# elapsed_seconds"], "2.0")
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagValidate))
+    return s
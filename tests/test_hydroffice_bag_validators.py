@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+# noinspection PyUnresolvedReferences
+from hyo2.bag.validators import ValidatorRegistry
+
+
+class TestBagValidators(unittest.TestCase):
+
+    def setUp(self):
+        self.file_bag_1 = os.path.join(Helper.samples_folder(), "bdb_02.bag")
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        ValidatorRegistry.cache_dir = None
+        ValidatorRegistry.clear()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_shared_validators(self):
+        self.assertIs(ValidatorRegistry.xsd(), ValidatorRegistry.xsd())
+        self.assertIs(ValidatorRegistry.schematron(), ValidatorRegistry.schematron())
+
+    def test_persisted_schematron(self):
+        ValidatorRegistry.clear()
+        ValidatorRegistry.cache_dir = self.tmp_dir
+        ValidatorRegistry.schematron()
+        self.assertEqual(len([f for f in os.listdir(self.tmp_dir) if f.endswith(".xsl")]), 1)
+
+        ValidatorRegistry.clear()
+        self.assertTrue(BAGFile(self.file_bag_1).validate_metadata())
+
+    def test_invalid_metadata(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        xml = bag_1.metadata(as_string=False, as_pretty_xml=True)
+        self.assertFalse(bag_1.validate_metadata(xml.replace(b'codeListValue="eng"', b'codeListValue="fr"', 1)))
+        self.assertEqual(len(bag_1.meta_errors), 1)
+        self.assertIn("languageCode", bag_1.meta_errors[0])
+        self.assertEqual(bag_1.meta_xsd_errors, list())
+        self.assertEqual(bag_1.meta_schematron_errors, bag_1.meta_errors)
+
+    def test_xsd_error_count(self):
+        bag_1 = BAGFile(self.file_bag_1)
+        xml = bag_1.metadata(as_string=False, as_pretty_xml=True)
+        start = xml.index(b'<gco:Decimal>') + len(b'<gco:Decimal>')
+        stop = xml.index(b'</gco:Decimal>', start)
+        xml = xml[:start] + b'abc' + xml[stop:]
+        self.assertEqual(len(ValidatorRegistry.xsd_errors(etree.fromstring(xml))), 1)
+        self.assertFalse(bag_1.validate_metadata(xml))
+        self.assertEqual(len(bag_1.meta_xsd_errors), 1)
+        self.assertIn("'abc' is not a valid value", bag_1.meta_xsd_errors[0])
+        self.assertEqual(len(bag_1.meta_errors), len(bag_1.meta_xsd_errors) + len(bag_1.meta_schematron_errors))
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagValidators))
+    return s
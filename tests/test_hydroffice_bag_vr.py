@@ -0,0 +1,302 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+from numpy import allclose, arange, array, array_equal, concatenate, dtype, empty, flatnonzero, float32, float64, \
+    floor, full, isfinite, isnan, nan, nanmax, nanmin, uint32, zeros
+from numpy.random import default_rng
+
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag import BAGFile
+# noinspection PyUnresolvedReferences
+from hyo2.bag.bag_error import BAGError
+# noinspection PyUnresolvedReferences
+from hyo2.bag.helper import Helper
+# noinspection PyUnresolvedReferences
+from hyo2.bag.vr_grid import VRGrid
+
+
+class TestBagVR(unittest.TestCase):
+
+    vr_metadata_type = dtype([('index', uint32), ('dimensions_x', uint32), ('dimensions_y', uint32),
+                              ('resolution_x', float32), ('resolution_y', float32),
+                              ('sw_corner_x', float32), ('sw_corner_y', float32)])
+    vr_refinements_type = dtype([('depth', float32), ('depth_uncrt', float32)])
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bag_path = os.path.join(self.tmp_dir, "vr.bag")
+        shutil.copyfile(os.path.join(Helper.samples_folder(), "bdb_02.bag"), self.bag_path)
+
+        # a 6x7 VR grid, with some empty supergrids and some BAG nan in the refinements
+        rng = default_rng(0)
+        self.varres_metadata = zeros((6, 7), dtype=self.vr_metadata_type)
+        index = 0
+        for r in range(6):
+            for c in range(7):
+                if rng.random() < 0.25:
+                    self.varres_metadata[r, c] = (0xFFFFFFFF, 0, 0, -1.0, -1.0, -1.0, -1.0)
+                    continue
+                dim_x, dim_y = rng.integers(1, 6), rng.integers(1, 6)
+                self.varres_metadata[r, c] = (index, dim_x, dim_y, 1.0 / dim_x, 1.0 / dim_y, 0.1, 0.2)
+                index += dim_x * dim_y
+        self.refinements = zeros((1, index), dtype=self.vr_refinements_type)
+        self.refinements['depth'][0] = rng.uniform(-30.0, -1.0, index)
+        self.refinements['depth_uncrt'][0] = rng.uniform(0.1, 3.0, index)
+        self.refinements['depth'][0, rng.random(index) < 0.2] = BAGFile.BAG_NAN
+        self.refinements['depth_uncrt'][0, rng.random(index) < 0.2] = BAGFile.BAG_NAN
+
+        with h5py.File(self.bag_path, "r+") as fid:
+            del fid[BAGFile.paths.bag_elevation]
+            del fid[BAGFile.paths.bag_uncertainty]
+            elevation = zeros((6, 7), dtype=float32)
+            fid.create_dataset(BAGFile.paths.bag_elevation, data=elevation)
+            fid.create_dataset(BAGFile.paths.bag_uncertainty, data=elevation)
+            fid.create_dataset(BAGFile.paths.bag_varres_metadata, data=self.varres_metadata)
+            fid.create_dataset(BAGFile.paths.bag_varres_refinements, data=self.refinements, chunks=(1, 16))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def masked_field(self, field: str):
+        values = self.refinements[field][0].copy()
+        values[values == BAGFile.BAG_NAN] = nan
+        return values
+
+    def test_iter_vr_refinements(self):
+        with BAGFile(self.bag_path) as bf:
+            blocks = list(bf.iter_vr_refinements(field="depth_uncrt", block_size=40))
+            # the blocks are aligned to the chunks
+            self.assertTrue(all(rng.start % 16 == 0 for rng, _ in blocks))
+            self.assertTrue(all(values.size <= 32 for _, values in blocks))
+            values = concatenate([values for _, values in blocks])
+            expected = self.masked_field("depth_uncrt")
+            self.assertEqual(values.dtype, float32)
+            self.assertTrue(((values == expected) | (isnan(values) & isnan(expected))).all())
+
+            with self.assertRaises(BAGError):
+                next(bf.iter_vr_refinements(field="depth_uncertainty"))
+
+    def test_vr_min_max(self):
+        with BAGFile(self.bag_path) as bf:
+            bf.vr_block_size = 20
+            depth = self.masked_field("depth")
+            uncertainty = self.masked_field("depth_uncrt")
+            self.assertEqual(bf.vr_elevation_min_max(), (nanmin(depth), nanmax(depth)))
+            self.assertEqual(bf.vr_uncertainty_min_max(), (nanmin(uncertainty), nanmax(uncertainty)))
+            self.assertEqual(bf.vr_depth_min_max(), (-nanmax(depth), -nanmin(depth)))
+
+    def test_vr_summary(self):
+        depth = self.masked_field("depth")
+        uncertainty = self.masked_field("depth_uncrt")
+        with BAGFile(self.bag_path) as bf:
+            bf.vr_block_size = 20
+            summary = bf.vr_summary()
+            self.assertIs(bf.vr_summary(), summary)
+            self.assertEqual(len(summary), int((self.varres_metadata["dimensions_x"] > 0).sum()))
+
+            for pos in range(len(summary)):
+                r, c = summary.sg_rows[pos], summary.sg_cols[pos]
+                start = int(self.varres_metadata["index"][r, c])
+                dims = self.varres_metadata[["dimensions_x", "dimensions_y"]][r, c]
+                stop = start + int(dims[0]) * int(dims[1])
+                sg_depth, sg_uncertainty = depth[start:stop], uncertainty[start:stop]
+                self.assertEqual(summary.nr_of_depths[pos], isfinite(sg_depth).sum())
+                self.assertEqual(summary.nr_of_uncertainties[pos], isfinite(sg_uncertainty).sum())
+                self.assertEqual(summary.nr_of_both[pos], (isfinite(sg_depth) & isfinite(sg_uncertainty)).sum())
+                if isfinite(sg_depth).any():
+                    self.assertEqual(summary.depth_min[pos], nanmin(sg_depth))
+                    self.assertEqual(summary.depth_max[pos], nanmax(sg_depth))
+                else:
+                    self.assertTrue(isnan(summary.depth_min[pos]))
+                if isfinite(sg_uncertainty).any():
+                    self.assertEqual(summary.uncertainty_max[pos], nanmax(sg_uncertainty))
+
+            grid = summary.grid("nr_of_depths")
+            self.assertEqual(grid.shape, (6, 7))
+            self.assertEqual(grid.sum(), isfinite(depth).sum())
+            self.assertTrue(isnan(summary.grid("depth_min")[self.varres_metadata["dimensions_x"] == 0]).all())
+            with self.assertRaises(BAGError):
+                summary.grid("nr_of_soundings")
+
+            positions = summary.window(row_range=slice(1, 3), col_range=slice(2, None))
+            self.assertTrue(((summary.sg_rows[positions] >= 1) & (summary.sg_rows[positions] < 3)).all())
+            self.assertTrue((summary.sg_cols[positions] >= 2).all())
+            with self.assertRaises(BAGError):
+                summary.window(row_range=slice(0, 6, 2))
+
+            # contiguous supergrids are merged in a single range
+            self.assertEqual(summary.refinement_ranges(range(len(summary))), [slice(0, self.refinements.shape[1])])
+            ranges = summary.refinement_ranges([3, 0])
+            self.assertEqual(ranges, [slice(int(summary.starts[0]), int(summary.stops[0])),
+                                      slice(int(summary.starts[3]), int(summary.stops[3]))])
+
+    def test_vr_flags(self):
+        depth = self.masked_field("depth")
+        uncertainty = self.masked_field("depth_uncrt")
+        with BAGFile(self.bag_path) as bf:
+            bf.vr_block_size = 20
+            flags = bf.vr_uncertainty_greater_than(2.0, as_array=True)
+            self.assertEqual(len(flags), (uncertainty > 2.0).sum())
+            self.assertTrue(array_equal(sorted(flags[:, 2]), sorted(uncertainty[uncertainty > 2.0])))
+            self.assertEqual(len(bf.vr_uncertainty_greater_than(10.0, as_array=True)), 0)
+            self.assertEqual(len(bf.vr_depth_has_uncertainty(as_array=True)),
+                             (isfinite(depth) & isnan(uncertainty)).sum())
+            self.assertEqual(len(bf.vr_uncertainty_has_depth(as_array=True)),
+                             (isfinite(uncertainty) & isnan(depth)).sum())
+
+    def binned(self, grid: VRGrid, es, ns, values, method: str):
+        """ Bin the nodes one at a time """
+        expected = full(grid.shape, nan, dtype=float64)
+        nodes = dict()
+        for e, n, v in zip(es, ns, values):
+            r = int(floor((n - grid.y_min) / grid.res_y + 0.5))
+            c = int(floor((e - grid.x_min) / grid.res_x + 0.5))
+            if isnan(v) or not ((0 <= r < grid.shape[0]) and (0 <= c < grid.shape[1])):
+                continue
+            dist2 = (e - (grid.x_min + c * grid.res_x)) ** 2 + (n - (grid.y_min + r * grid.res_y)) ** 2
+            nodes.setdefault((r, c), list()).append((dist2, v))
+        for (r, c), cell in nodes.items():
+            if method == "min":
+                expected[r, c] = min(v for _, v in cell)
+            elif method == "max":
+                expected[r, c] = max(v for _, v in cell)
+            elif method == "mean":
+                expected[r, c] = sum(v for _, v in cell) / len(cell)
+            else:
+                expected[r, c] = min(cell, key=lambda node: node[0])[1]
+        return expected
+
+    def test_vr_flagged_refinements(self):
+        uncertainty = self.masked_field("depth_uncrt")
+        with BAGFile(self.bag_path) as bf:
+            bf.vr_block_size = 20
+            summary = bf.vr_summary()
+            # many non-adjacent candidates, with several of them in each block
+            candidates = zeros(len(summary), dtype=bool)
+            candidates[::2] = True
+            expected = list()
+            for pos in flatnonzero(candidates):
+                expected.extend(i for i in range(summary.starts[pos], summary.stops[pos]) if uncertainty[i] > 1.0)
+
+            for fraction in (1.0, 0.0):
+                # read by blocks, or streamed
+                bf.vr_candidate_fraction = fraction
+                rfn_idx, _, values = bf._vr_flagged_refinements(candidates=candidates,
+                                                                flag=lambda depth, unc: unc > 1.0)
+                self.assertEqual(rfn_idx.tolist(), expected)
+                self.assertTrue(array_equal(values, uncertainty[expected]))
+
+            rfn_idx, _, _ = bf._vr_flagged_refinements(candidates=zeros(len(summary), dtype=bool),
+                                                       flag=lambda depth, unc: unc > 1.0)
+            self.assertEqual(rfn_idx.size, 0)
+
+    def test_vr_grid(self):
+        depth = self.masked_field("depth")
+        with BAGFile(self.bag_path) as bf:
+            bf.populate_metadata()
+            bf.vr_block_size = 20
+            es, ns = bf.vr_refinement_positions()
+            res = bf.meta.res_x / 3.0
+            for method in VRGrid.methods:
+                grid = bf.vr_grid(res_x=res, method=method)
+                self.assertEqual(grid.shape, (18, 21))
+                expected = self.binned(grid, es, ns, depth, method=method)
+                self.assertTrue(allclose(grid.values, expected, equal_nan=True), method)
+                self.assertTrue(isfinite(grid.values).any())
+
+            # a window of supergrids, binned in a preallocated grid
+            buffer = empty((6, 8), dtype=float64)
+            grid = bf.vr_grid(res_x=bf.meta.res_x / 2.0, method="max", field="depth_uncrt",
+                              row_range=slice(1, 4), col_range=slice(3, 7), out=buffer)
+            self.assertIs(grid.values, buffer)
+            self.assertAlmostEqual(grid.x_min, bf.meta.sw[0] + 2.75 * bf.meta.res_x)
+            vr_idx = bf.vr_refinement_index()
+            sg_pos = vr_idx.locate(arange(self.refinements.shape[1]))[0]
+            rows, cols = vr_idx.sg_rows[sg_pos], vr_idx.sg_cols[sg_pos]
+            uncertainty = self.masked_field("depth_uncrt")
+            uncertainty[(rows < 1) | (rows >= 4) | (cols < 3)] = nan
+            self.assertTrue(allclose(buffer, self.binned(grid, es, ns, uncertainty, method="max"), equal_nan=True))
+
+            with self.assertRaises(BAGError):
+                bf.vr_grid(res_x=res, method="median")
+            with self.assertRaises(BAGError):
+                bf.vr_grid(res_x=res, out=empty((3, 3), dtype=float32))
+            with self.assertRaises(BAGError):
+                bf.vr_grid(res_x=res, row_range=slice(0, 6, 2))
+
+    def test_vr_grid_mean(self):
+        # many blocks of nodes in the same cell, accumulated in double precision
+        grid = VRGrid(x_min=0.0, y_min=0.0, res_x=1.0, res_y=1.0, shape=(2, 2), method="mean")
+        rng = default_rng(1)
+        values = rng.uniform(-10001.0, -10000.0, (1000, 10))
+        for block in values:
+            grid.update(es=full(10, 1.2), ns=full(10, -0.3), values=block)
+        self.assertTrue(isnan(grid.values).all())
+        grid.finalize()
+        self.assertEqual(grid.values[0, 1], float32(values.mean()))
+        self.assertEqual(grid.counts[0, 1], values.size)
+        self.assertTrue(isnan(grid.values[1]).all())
+
+    def test_vr_refinement_positions(self):
+        with BAGFile(self.bag_path) as bf:
+            es, ns = bf.vr_refinement_positions()
+            self.assertEqual(es.shape, (self.refinements.shape[1],))
+
+            # the nodes of each supergrid, one at a time
+            sw_x, sw_y, res_x, res_y = bf.meta.sw[0], bf.meta.sw[1], bf.meta.res_x, bf.meta.res_y
+            for r in range(6):
+                for c in range(7):
+                    index, dim_x, dim_y, rfn_res_x, rfn_res_y, corner_x, corner_y = self.varres_metadata[r, c].tolist()
+                    for rfn_r in range(dim_y):
+                        for rfn_c in range(dim_x):
+                            rfn_idx = index + rfn_r * dim_x + rfn_c
+                            self.assertAlmostEqual(es[rfn_idx], sw_x + (c - 0.5) * res_x + corner_x + rfn_c * rfn_res_x)
+                            self.assertAlmostEqual(ns[rfn_idx], sw_y + (r - 0.5) * res_y + corner_y + rfn_r * rfn_res_y)
+
+            subset = array([7, 0, 7, self.refinements.shape[1] - 1])
+            sub_es, sub_ns = bf.vr_refinement_positions(subset)
+            self.assertTrue(array_equal(sub_es, es[subset]))
+            self.assertTrue(array_equal(sub_ns, ns[subset]))
+            lons, lats = bf.vr_refinement_positions(subset, wgs84=True)
+            expected_lons, expected_lats = bf.transform_to_wgs84(es=es[subset], ns=ns[subset])
+            self.assertTrue(array_equal(lons, expected_lons))
+            self.assertTrue(array_equal(lats, expected_lats))
+
+            with self.assertRaises(BAGError):
+                bf.vr_refinement_positions([self.refinements.shape[1]])
+
+    def test_varres_metadata_fields(self):
+        with BAGFile(self.bag_path) as bf:
+            for field in self.vr_metadata_type.names:
+                self.assertTrue(array_equal(bf.varres_metadata_field(field), self.varres_metadata[field]))
+            self.assertTrue(array_equal(bf.varres_metadata_sw_y(), self.varres_metadata["sw_corner_y"]))
+            # the table is read once, but the callers get their own copy
+            dim_x = bf.varres_metadata_dim_x()
+            self.assertIsNot(bf.varres_metadata_dim_x(), dim_x)
+            dim_x[...] = 0
+            self.assertTrue(array_equal(bf.varres_metadata_dim_x(), self.varres_metadata["dimensions_x"]))
+            with self.assertRaises(BAGError):
+                bf.varres_metadata_field("dimensions_z")
+            self.assertEqual(bf.vr_refinement_index().nr_of_refinements, self.refinements.shape[1])
+
+    def test_varres_metadata_write_mode(self):
+        with BAGFile(self.bag_path, mode="r+") as bf:
+            nr_of_refinements = bf.vr_refinement_index().nr_of_refinements
+            table = bf.varres_metadata()
+            table[0, 0] = (0xFFFFFFFF, 0, 0, -1.0, -1.0, -1.0, -1.0)
+            bf[bf.paths.bag_varres_metadata][...] = table
+            # the fields are read at each call, while the index requires an explicit invalidation
+            self.assertEqual(bf.varres_metadata_dim_x()[0, 0], 0)
+            self.assertEqual(bf.vr_refinement_index().nr_of_refinements, nr_of_refinements)
+            bf.invalidate_varres_metadata()
+            removed = int(self.varres_metadata["dimensions_x"][0, 0]) * int(self.varres_metadata["dimensions_y"][0, 0])
+            self.assertEqual(bf.vr_refinement_index().nr_of_refinements, nr_of_refinements - removed)
+
+
+def suite():
+    s = unittest.TestSuite()
+    s.addTests(unittest.TestLoader().loadTestsFromTestCase(TestBagVR))
+    return s